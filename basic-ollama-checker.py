@@ -1,14 +1,208 @@
+"""Checks that Ollama answers, and benchmarks throughput and latency.
+
+Without options it streams one reply, as a quick smoke test:
+
+    python3 basic-ollama-checker.py
+
+With --benchmark it runs a fixed prompt corpus against each model at each
+concurrency level and reports time-to-first-token, tokens/sec and latency
+percentiles, writing the raw samples and summaries to a JSON file:
+
+    python3 basic-ollama-checker.py --benchmark --models llama3.1:8b mistral:7b \\
+        --concurrency 1 4 --repeat 3 --output bench.json --baseline previous.json
+
+Without --host, requests go through the endpoint pool listed under
+"ollama_endpoints" in config.json (or --config), spread across its hosts.
+"""
+import argparse
+import concurrent.futures
+import datetime
+import json
+import platform
+import sys
+import time
+
 import ollama
 
-client = ollama.Client()
+from chat_streaming import StreamAccumulator, response_field
+from endpoint_pool import EndpointPool
+
+DEFAULT_MODEL = 'llama3.1:8b'
+
+BENCHMARK_PROMPTS = [
+    "how are you doing?",
+    "Explain in two sentences what a hash table is.",
+    "Write a Python function that returns the n-th Fibonacci number iteratively.",
+    "Summarize the plot of Romeo and Juliet in one paragraph.",
+    "List five practical tips for writing readable log messages.",
+    "Translate to Spanish: The server restarted after the configuration change.",
+]
+
+SUMMARY_METRICS = ['ttft', 'wall_time', 'eval_tokens_per_sec', 'prompt_eval_tokens_per_sec', 'total_duration']
+
+
+def check(client, model):
+    stream = client.chat(
+        model=model,
+        messages=[{'role': 'user', 'content': 'how are you doing?'}],
+        stream=True
+    )
+
+    for chunk in stream:
+        print(chunk['message']['content'], end='', flush=True)
+
+    print()
+
+
+def percentile(values, pct):
+    """Linear-interpolated percentile of a list of numbers (None for an empty list)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def _seconds(nanoseconds):
+    return nanoseconds / 1e9 if nanoseconds else None
+
+
+def run_sample(client, model, prompt, temperature):
+    """One timed request; durations reported by Ollama are converted from nanoseconds to seconds."""
+    accumulator = StreamAccumulator()
+    sample = {'model': model, 'prompt': prompt}
+    try:
+        last_chunk = None
+        for chunk in client.chat(model=model, messages=[{'role': 'user', 'content': prompt}],
+                                 options={'temperature': temperature}, stream=True):
+            last_chunk = chunk
+            accumulator.append(chunk['message']['content'])
+    except Exception as e:
+        sample['error'] = str(e)
+        return sample
+
+    eval_count = response_field(last_chunk, 'eval_count')
+    eval_duration = _seconds(response_field(last_chunk, 'eval_duration'))
+    prompt_eval_count = response_field(last_chunk, 'prompt_eval_count')
+    prompt_eval_duration = _seconds(response_field(last_chunk, 'prompt_eval_duration'))
+    sample.update({
+        'ttft': accumulator.time_to_first_token,
+        'wall_time': time.monotonic() - accumulator.started_at,
+        'eval_count': eval_count,
+        'eval_duration': eval_duration,
+        'prompt_eval_count': prompt_eval_count,
+        'prompt_eval_duration': prompt_eval_duration,
+        'load_duration': _seconds(response_field(last_chunk, 'load_duration')),
+        'total_duration': _seconds(response_field(last_chunk, 'total_duration')),
+        'eval_tokens_per_sec': eval_count / eval_duration if eval_count and eval_duration else None,
+        'prompt_eval_tokens_per_sec': (prompt_eval_count / prompt_eval_duration
+                                       if prompt_eval_count and prompt_eval_duration else None),
+    })
+    return sample
+
+
+def run_level(client, model, concurrency, prompts, repeat, temperature):
+    work = [p for _ in range(repeat) for p in prompts]
+    started = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(lambda p: run_sample(client, model, p, temperature), work))
+    elapsed = time.monotonic() - started
+    for sample in samples:
+        sample['concurrency'] = concurrency
+    return samples, elapsed
+
+
+def summarize(samples, elapsed):
+    ok = [s for s in samples if 'error' not in s]
+    summary = {
+        'requests': len(samples),
+        'errors': len(samples) - len(ok),
+        'elapsed': elapsed,
+        'aggregate_tokens_per_sec': sum(s['eval_count'] or 0 for s in ok) / elapsed if elapsed else None,
+    }
+    for metric in SUMMARY_METRICS:
+        values = [s[metric] for s in ok if s.get(metric) is not None]
+        summary[metric] = {f"p{p}": percentile(values, p) for p in (50, 95, 99)}
+    return summary
+
+
+def _fmt(value, unit=''):
+    return '-' if value is None else f"{value:.3f}{unit}"
+
+
+def print_summary(key, summary, baseline=None):
+    print(f"{key}: {summary['requests']} requests, {summary['errors']} errors, "
+          f"{_fmt(summary['aggregate_tokens_per_sec'])} tok/s aggregate")
+    for metric in SUMMARY_METRICS:
+        row = summary[metric]
+        line = f"    {metric:<28} p50 {_fmt(row['p50'])}  p95 {_fmt(row['p95'])}  p99 {_fmt(row['p99'])}"
+        previous = (baseline or {}).get(metric, {}).get('p50')
+        if previous and row['p50'] is not None:
+            line += f"  (p50 {100.0 * (row['p50'] - previous) / previous:+.1f}% vs baseline)"
+        print(line)
+
+
+def benchmark(client, args):
+    prompts = BENCHMARK_PROMPTS
+    if args.corpus:
+        with open(args.corpus, 'r', encoding='utf-8') as f:
+            prompts = [line.strip() for line in f if line.strip()]
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get('summaries', {})
+
+    report = {
+        'started_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'host': getattr(client, 'hosts', None) or args.host,
+        'machine': platform.node(),
+        'temperature': args.temperature,
+        'repeat': args.repeat,
+        'prompts': prompts,
+        'summaries': {},
+        'samples': [],
+    }
+    for model in args.models:
+        if not args.no_warmup:
+            # Keep model loading out of the measurements; load time is still reported per sample.
+            run_sample(client, model, prompts[0], args.temperature)
+        for concurrency in args.concurrency:
+            samples, elapsed = run_level(client, model, concurrency, prompts, args.repeat, args.temperature)
+            key = f"{model}@{concurrency}"
+            report['summaries'][key] = summarize(samples, elapsed)
+            report['samples'].extend(samples)
+            print_summary(key, report['summaries'][key], baseline.get(key))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=4)
+        print(f"Results written to {args.output}")
+    return 1 if any(s['errors'] for s in report['summaries'].values()) else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that Ollama answers, or benchmark models.")
+    parser.add_argument('--benchmark', action='store_true', help="run the benchmark instead of a single check")
+    parser.add_argument('--models', nargs='+', default=[DEFAULT_MODEL], help="models to check or benchmark")
+    parser.add_argument('--concurrency', nargs='+', type=int, default=[1], help="concurrency levels to test")
+    parser.add_argument('--repeat', type=int, default=1, help="times the corpus is run per level")
+    parser.add_argument('--temperature', type=float, default=0.0)
+    parser.add_argument('--corpus', help="text file with one prompt per line (default: built-in corpus)")
+    parser.add_argument('--output', help="write samples and summaries to this JSON file")
+    parser.add_argument('--baseline', help="earlier --output file to compare p50 values against")
+    parser.add_argument('--no-warmup', action='store_true', help="include model load time in the first samples")
+    parser.add_argument('--host', default=None, help="Ollama host (default: the config's endpoint pool, else OLLAMA_HOST or localhost)")
+    parser.add_argument('--config', default="config.json", help="config file with the \"ollama_endpoints\" pool")
+    args = parser.parse_args(argv)
 
-stream = client.chat(
-    model='llama3.1:8b',
-    messages=[{'role': 'user', 'content': 'how are you doing?'}],
-    stream=True
-)
+    client = ollama.Client(host=args.host) if args.host else EndpointPool.from_config(args.config).start()
+    if not args.benchmark:
+        check(client, args.models[0])
+        return 0
+    return benchmark(client, args)
 
-for chunk in stream:
-    print(chunk['message']['content'], end='', flush=True)
 
-print()
+if __name__ == '__main__':
+    sys.exit(main())
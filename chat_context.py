@@ -0,0 +1,174 @@
+import functools
+import threading
+
+# Ollama loads models with a 2048-token context window unless num_ctx says otherwise.
+DEFAULT_CONTEXT_TOKENS = 2048
+# Tokens kept free in the window for the model's reply.
+RESPONSE_RESERVE_TOKENS = 512
+# Rough per-message cost of the chat template (role markers, separators).
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_INSTRUCTIONS = (
+    "You maintain a running summary of a conversation between a user and an AI assistant. "
+    "Merge the new turns into the existing summary. Keep facts, decisions, names, numbers, "
+    "code identifiers and open questions; drop pleasantries. Reply with the updated summary only."
+)
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+
+@functools.lru_cache(maxsize=4096)
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token for English text and code)."""
+    if not text:
+        return 0
+    return max(1, (len(text) + 3) // 4)
+
+
+def estimate_message_tokens(message):
+    return estimate_tokens(message.get('content', '')) + MESSAGE_OVERHEAD_TOKENS
+
+
+class ContextBudget:
+    """Keeps the messages sent to a model inside its context window.
+
+    Each model has a token budget (its num_ctx minus a reserve for the reply).
+    System messages and the newest message are always kept, as are any indexes
+    passed in as pinned; the remaining history is kept newest first until the
+    budget runs out, and everything older is dropped.
+    """
+
+    def __init__(self, budgets=None, default_budget=DEFAULT_CONTEXT_TOKENS, reserve=RESPONSE_RESERVE_TOKENS):
+        self.budgets = dict(budgets or {})
+        self.default_budget = default_budget
+        self.reserve = reserve
+
+    def context_size(self, model):
+        return self.budgets.get(model, self.default_budget)
+
+    def set_context_size(self, model, tokens):
+        self.budgets[model] = int(tokens)
+
+    def budget_for(self, model):
+        return max(0, self.context_size(model) - self.reserve)
+
+    def estimate(self, messages):
+        return sum(estimate_message_tokens(m) for m in messages)
+
+    def fit(self, messages, model, pinned=()):
+        """Returns (messages_to_send, estimated_tokens, dropped_count)."""
+        if not messages:
+            return [], 0, 0
+        budget = self.budget_for(model)
+        costs = [estimate_message_tokens(m) for m in messages]
+        keep = {i for i, m in enumerate(messages) if m.get('role') == 'system'}
+        keep.add(len(messages) - 1)
+        keep.update(i for i in pinned if 0 <= i < len(messages))
+        used = sum(costs[i] for i in keep)
+
+        for i in range(len(messages) - 1, -1, -1):
+            if i in keep:
+                continue
+            if used + costs[i] > budget:
+                break
+            keep.add(i)
+            used += costs[i]
+
+        fitted = [m for i, m in enumerate(messages) if i in keep]
+        return fitted, used, len(messages) - len(fitted)
+
+
+class ConversationCompactor:
+    """Folds old conversation turns into a rolling summary produced by a small model.
+
+    Once the unsummarized part of the history grows past threshold_tokens, the
+    oldest turns (all but the keep_recent newest) are summarized on a background
+    thread. The previous summary is passed along with only the new turns, so the
+    summary is updated incrementally instead of being regenerated from scratch.
+    The history list itself is never modified; compacted() builds the messages to
+    send from the summary plus the turns it does not cover yet.
+    """
+
+    def __init__(self, chat, threshold_tokens=1500, keep_recent=4):
+        self.chat = chat
+        self.threshold_tokens = threshold_tokens
+        self.keep_recent = keep_recent
+        self.summary = ""
+        self.summarized_count = 0
+        self.epoch = 0
+        self._running = False
+        self._lock = threading.Lock()
+
+    def compacted(self, history):
+        messages = []
+        if self.summary:
+            messages.append({'role': 'system', 'content': SUMMARY_PREFIX + self.summary})
+        messages.extend(history[self.summarized_count:])
+        return messages
+
+    def needs_compaction(self, history):
+        pending = history[self.summarized_count:]
+        if len(pending) <= self.keep_recent:
+            return False
+        return sum(estimate_message_tokens(m) for m in pending) > self.threshold_tokens
+
+    def start(self, history, model, on_done):
+        """Starts a background summarization if one is due; on_done(result) is called from the worker thread.
+
+        The result must be handed back to apply() on the thread that owns the history.
+        """
+        with self._lock:
+            if self._running or not self.needs_compaction(history):
+                return False
+            self._running = True
+        job = {
+            'epoch': self.epoch,
+            'start': self.summarized_count,
+            'end': len(history) - self.keep_recent,
+            'previous': self.summary,
+        }
+        turns = list(history[job['start']:job['end']])
+        threading.Thread(target=self._run, args=(job, turns, model, on_done), daemon=True).start()
+        return True
+
+    def _run(self, job, turns, model, on_done):
+        try:
+            job['summary'] = self._summarize(job['previous'], turns, model)
+        except Exception as e:
+            job['error'] = str(e)
+        finally:
+            with self._lock:
+                self._running = False
+        on_done(job)
+
+    def _summarize(self, previous, turns, model):
+        transcript = "\n\n".join(f"{m['role'].capitalize()}: {m['content']}" for m in turns)
+        content = f"Existing summary:\n{previous or '(none)'}\n\nNew turns:\n{transcript}"
+        response = self.chat(
+            model=model,
+            messages=[{'role': 'system', 'content': SUMMARY_INSTRUCTIONS}, {'role': 'user', 'content': content}],
+            options={'temperature': 0},
+            stream=False,
+        )
+        return response['message']['content'].strip()
+
+    def apply(self, result):
+        """Installs a finished summary; stale results (history cleared or reloaded meanwhile) are ignored."""
+        if 'error' in result or result['epoch'] != self.epoch or result['start'] != self.summarized_count:
+            return False
+        self.summary = result['summary']
+        self.summarized_count = result['end']
+        return True
+
+    def reset(self):
+        self.epoch += 1
+        self.summary = ""
+        self.summarized_count = 0
+
+    def to_dict(self):
+        return {'summary': self.summary, 'summarized_count': self.summarized_count}
+
+    def load(self, data):
+        self.reset()
+        if data:
+            self.summary = data.get('summary', "")
+            self.summarized_count = data.get('summarized_count', 0)
@@ -0,0 +1,177 @@
+import asyncio
+import contextlib
+import inspect
+import threading
+
+import ollama
+
+from stream_cassette import cassette_client
+
+# Replies streamed at the same time across all sessions; further requests wait for a free slot.
+MAX_CONCURRENT_STREAMS = 4
+
+
+def async_chat_client(pool=None, **client_kwargs):
+    """An ollama.AsyncClient, or the blocking cassette client when the environment asks for recording or replay.
+
+    With an EndpointPool, chats are routed across its hosts instead.
+    """
+    client = pool if pool is not None else ollama.Client(**client_kwargs)
+    wrapped = cassette_client(client)
+    if wrapped is not client:
+        return wrapped
+    return pool.async_client() if pool is not None else ollama.AsyncClient(**client_kwargs)
+
+
+async def chat_stream(client, **request):
+    """Streams a chat reply as an async iterator from either an AsyncClient or a blocking client.
+
+    Blocking clients (the cassette recorder and replayer) are stepped through
+    in the loop's executor, so they never stall the other sessions' streams.
+    """
+    if inspect.iscoroutinefunction(client.chat):
+        async for chunk in await client.chat(stream=True, **request):
+            yield chunk
+        return
+    loop = asyncio.get_running_loop()
+    stream = iter(await loop.run_in_executor(None, lambda: client.chat(stream=True, **request)))
+    end = object()
+    try:
+        while (chunk := await loop.run_in_executor(None, next, stream, end)) is not end:
+            yield chunk
+    finally:
+        # Still running in the executor if the request was cancelled mid-chunk.
+        with contextlib.suppress(ValueError):
+            close = getattr(stream, 'close', None)
+            if close is not None:
+                close()
+
+
+class _StreamLimit:
+    """An asyncio semaphore whose size can be changed while it is held."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.waiting = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            self.waiting += 1
+            try:
+                await self._condition.wait_for(lambda: self.active < self.limit)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+
+    async def __aexit__(self, *exc_info):
+        async with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+    async def resize(self, limit):
+        async with self._condition:
+            self.limit = limit
+            self._condition.notify_all()
+
+
+class ChatTask:
+    """Handle on a request submitted to a ChatEngine; cancel() and wait() may be called from any thread."""
+
+    def __init__(self, engine, session_id, on_done=None):
+        self.engine = engine
+        self.session_id = session_id
+        self.on_done = on_done
+        self._task = None
+        self._finished = threading.Event()
+
+    @property
+    def done(self):
+        return self._finished.is_set()
+
+    def cancel(self):
+        # Scheduled after the task is created, so it always finds it.
+        self.engine._loop.call_soon_threadsafe(self._cancel_on_loop)
+
+    def _cancel_on_loop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def wait(self, timeout=None):
+        """Blocks until the request has finished unwinding; returns False on timeout."""
+        return self._finished.wait(timeout)
+
+
+class ChatEngine:
+    """Runs the chat requests of any number of sessions on one asyncio event loop thread.
+
+    Each request is a coroutine function work(client) that streams its reply
+    through the shared client and hands tokens to its session, typically by
+    putting them on that GUI's queue tagged with the session. At most
+    max_concurrent requests stream at once; the others wait in submission
+    order. Cancelling a request cancels its task, which closes the HTTP stream
+    so Ollama stops generating.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT_STREAMS, client=None):
+        self.client = client if client is not None else async_chat_client()
+        self._limit = _StreamLimit(max(1, int(max_concurrent)))
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="chat-engine", daemon=True)
+        self._thread.start()
+
+    @property
+    def max_concurrent(self):
+        return self._limit.limit
+
+    @property
+    def active_count(self):
+        return self._limit.active
+
+    @property
+    def waiting_count(self):
+        return self._limit.waiting
+
+    def set_max_concurrent(self, limit):
+        asyncio.run_coroutine_threadsafe(self._limit.resize(max(1, int(limit))), self._loop)
+
+    def submit(self, session_id, work, on_done=None):
+        """Schedules work(client) for session_id and returns its ChatTask.
+
+        on_done() is called on the loop thread once the request has finished in
+        any way, including being cancelled before work() ever started.
+        """
+        task = ChatTask(self, session_id, on_done)
+        self._loop.call_soon_threadsafe(self._start, task, work)
+        return task
+
+    def _start(self, task, work):
+        task._task = self._loop.create_task(self._run(work))
+        task._task.add_done_callback(lambda t: self._finish(task, t))
+
+    @staticmethod
+    def _finish(task, asyncio_task):
+        if not asyncio_task.cancelled() and asyncio_task.exception() is not None:
+            print(f"Warning: Chat request for session {task.session_id} failed: {asyncio_task.exception()}")
+        task._finished.set()
+        if task.on_done is not None:
+            task.on_done()
+
+    async def _run(self, work):
+        async with self._limit:
+            return await work(self.client)
+
+    def shutdown(self, timeout=2.0):
+        """Cancels whatever is still running and stops the loop thread."""
+        if self._loop.is_closed():
+            return
+
+        def stop():
+            for task in asyncio.all_tasks(self._loop):
+                task.cancel()
+            self._loop.call_soon(self._loop.stop)
+        self._loop.call_soon_threadsafe(stop)
+        self._thread.join(timeout)
+        if not self._thread.is_alive():
+            self._loop.close()
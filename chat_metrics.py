@@ -0,0 +1,197 @@
+import collections
+import json
+import os
+import queue
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+
+from chat_streaming import response_field
+
+METRICS_FILE = "metrics.jsonl"
+PROMETHEUS_METRICS_FILE = "metrics.prom"
+METRICS_MAX_BYTES = 10 * 1024 * 1024
+
+# Durations reported by Ollama in the final chunk, in nanoseconds.
+SERVER_DURATIONS = ['total_duration', 'load_duration', 'prompt_eval_duration', 'eval_duration']
+SERVER_COUNTS = ['prompt_eval_count', 'eval_count']
+
+
+def request_metrics(model, final_chunk, stream_stats=None, peak_render_lag=None):
+    """Flat record of one request: server-side timings from the final chunk plus client-side timings."""
+    metrics = {'timestamp': time.time(), 'model': model}
+    for name in SERVER_DURATIONS:
+        nanoseconds = response_field(final_chunk, name)
+        metrics[name] = nanoseconds / 1e9 if nanoseconds is not None else None
+    for name in SERVER_COUNTS:
+        metrics[name] = response_field(final_chunk, name)
+    metrics['eval_tokens_per_sec'] = (metrics['eval_count'] / metrics['eval_duration']
+                                      if metrics['eval_count'] and metrics['eval_duration'] else None)
+    stream_stats = stream_stats or {}
+    metrics['time_to_first_token'] = stream_stats.get('time_to_first_token')
+    metrics['client_total_time'] = stream_stats.get('total_time')
+    metrics['peak_render_lag'] = peak_render_lag
+    return metrics
+
+
+def prometheus_label(value):
+    """A label value escaped for the Prometheus text format (backslash, double quote and newline)."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRecorder:
+    """Appends per-request metrics to a rolling JSONL file or keeps a Prometheus text file up to date.
+
+    record() only queues the metrics; a background thread writes them, taking
+    everything queued at once, so the UI thread never waits on the disk.
+    JSONL files are rotated to <path>.1 once they pass max_bytes. The Prometheus
+    format is meant for node_exporter's textfile collector: counters are kept
+    in memory and the whole file is rewritten atomically once per batch.
+    """
+
+    def __init__(self, path=METRICS_FILE, fmt='jsonl', max_bytes=METRICS_MAX_BYTES):
+        self.path = path
+        self.fmt = fmt
+        self.max_bytes = max_bytes
+        self._queue = queue.Queue()
+        self._thread = None
+        self._totals = collections.defaultdict(lambda: collections.defaultdict(float))
+        self._last = {}
+
+    def record(self, metrics):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+            self._thread.start()
+        self._queue.put(metrics)
+
+    def close(self, timeout=5.0):
+        """Writes whatever is still queued and stops the writer thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            try:
+                while True:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            closing = None in batch
+            batch = [metrics for metrics in batch if metrics is not None]
+            if batch:
+                self._write(batch)
+            if closing:
+                return
+
+    def _write(self, batch):
+        try:
+            if self.fmt == 'prometheus':
+                self._update_prometheus(batch)
+            else:
+                self._append_jsonl(batch)
+        except OSError as e:
+            print(f"Warning: Could not write metrics to {self.path}: {e}")
+
+    def _append_jsonl(self, batch):
+        if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+            os.replace(self.path, self.path + ".1")
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write("".join(json.dumps(metrics) + "\n" for metrics in batch))
+
+    def _update_prometheus(self, batch):
+        for metrics in batch:
+            totals = self._totals[metrics['model']]
+            totals['requests'] += 1
+            for name in SERVER_DURATIONS + ['time_to_first_token']:
+                if metrics.get(name) is not None:
+                    totals[f"{name}_sum"] += metrics[name]
+                    totals[f"{name}_count"] += 1
+            for name in SERVER_COUNTS:
+                totals[name] += metrics.get(name) or 0
+            self._last[metrics['model']] = metrics
+
+        lines = []
+
+        def metric(name, kind, help_text, values):
+            lines.append(f"# HELP ollama_chat_{name} {help_text}")
+            lines.append(f"# TYPE ollama_chat_{name} {kind}")
+            for model, value in values:
+                if value is not None:
+                    lines.append(f'ollama_chat_{name}{{model="{prometheus_label(model)}"}} {value}')
+
+        models = sorted(self._totals)
+        metric('requests_total', 'counter', "Completed chat requests.",
+               [(m, self._totals[m]['requests']) for m in models])
+        metric('prompt_tokens_total', 'counter', "Prompt tokens evaluated.",
+               [(m, self._totals[m]['prompt_eval_count']) for m in models])
+        metric('generated_tokens_total', 'counter', "Tokens generated.",
+               [(m, self._totals[m]['eval_count']) for m in models])
+        for name in SERVER_DURATIONS + ['time_to_first_token']:
+            base = name.replace('_duration', '') + '_seconds'
+            lines.append(f"# HELP ollama_chat_{base} {name.replace('_', ' ').capitalize()} in seconds.")
+            lines.append(f"# TYPE ollama_chat_{base} summary")
+            for m in models:
+                label = prometheus_label(m)
+                lines.append(f'ollama_chat_{base}_sum{{model="{label}"}} {self._totals[m][f"{name}_sum"]}')
+                lines.append(f'ollama_chat_{base}_count{{model="{label}"}} {self._totals[m][f"{name}_count"]}')
+        metric('last_eval_tokens_per_second', 'gauge', "Generation speed of the latest request.",
+               [(m, self._last[m].get('eval_tokens_per_sec')) for m in models])
+        metric('last_peak_render_lag_tokens', 'gauge', "Peak render lag of the latest request.",
+               [(m, self._last[m].get('peak_render_lag')) for m in models])
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, self.path)
+
+
+class MetricsPanel(ttk.Frame):
+    """Collapsible panel showing where the time of the latest request went."""
+
+    FIELDS = [
+        ('model', "Model", "{}"),
+        ('time_to_first_token', "First token", "{:.2f} s"),
+        ('load_duration', "Model load", "{:.2f} s"),
+        ('prompt_eval_count', "Prompt tokens", "{}"),
+        ('prompt_eval_duration', "Prompt eval", "{:.2f} s"),
+        ('eval_count', "Generated tokens", "{}"),
+        ('eval_duration', "Generation", "{:.2f} s"),
+        ('eval_tokens_per_sec', "Speed", "{:.1f} tok/s"),
+        ('total_duration', "Server total", "{:.2f} s"),
+        ('client_total_time', "Client total", "{:.2f} s"),
+        ('peak_render_lag', "Peak render lag", "{} tokens"),
+    ]
+
+    def __init__(self, parent, expanded=False):
+        super().__init__(parent)
+        self.expanded = tk.BooleanVar(self, value=expanded)
+        self.toggle_button = ttk.Button(self, width=8, command=self.toggle)
+        self.toggle_button.pack(side=tk.TOP, anchor=tk.NE)
+        self.body = ttk.LabelFrame(self, text="Last Request", padding="5")
+        self.values = {}
+        for row, (key, label, _) in enumerate(self.FIELDS):
+            ttk.Label(self.body, text=f"{label}:").grid(row=row, column=0, sticky=tk.W)
+            self.values[key] = ttk.Label(self.body, text="-", width=12, anchor=tk.E)
+            self.values[key].grid(row=row, column=1, sticky=tk.E)
+        self._apply_expanded()
+
+    def toggle(self):
+        self.expanded.set(not self.expanded.get())
+        self._apply_expanded()
+
+    def _apply_expanded(self):
+        if self.expanded.get():
+            self.body.pack(side=tk.TOP, fill=tk.Y, pady=(5, 0))
+            self.toggle_button.config(text="Stats ▾")
+        else:
+            self.body.pack_forget()
+            self.toggle_button.config(text="Stats ▸")
+
+    def show(self, metrics):
+        for key, _, fmt in self.FIELDS:
+            value = metrics.get(key)
+            self.values[key].config(text="-" if value is None else fmt.format(value))
@@ -0,0 +1,209 @@
+import collections
+import time
+import tkinter as tk
+
+# Messages rendered when a transcript is shown, and added each time the view reaches the top.
+TRANSCRIPT_PAGE_SIZE = 50
+
+
+class TokenRenderBuffer:
+    """Coalesces streamed tokens so the Tk loop renders them in frame-sized batches.
+
+    Worker threads keep pushing ('token', (text, received_at)) items into a
+    response queue; the GUI moves them in here with put(), passing received_at
+    as now, and then, once per frame, asks for the work to do with next_frame().
+    The token rate is measured from those arrival times, not from when the Tk
+    thread got round to draining the queue, which bunches a whole tick together.
+    Consecutive tokens are merged into a single text run so each frame costs
+    one Text.insert() instead of one per token, and the amount of text and
+    number of control events handled per frame are capped.
+    """
+
+    def __init__(self, max_chars_per_frame=8192, max_events_per_frame=50,
+                 min_interval_ms=16, max_interval_ms=100, target_tokens_per_frame=8):
+        self.max_chars_per_frame = max_chars_per_frame
+        self.max_events_per_frame = max_events_per_frame
+        self.min_interval_ms = min_interval_ms
+        self.max_interval_ms = max_interval_ms
+        self.target_tokens_per_frame = target_tokens_per_frame
+
+        # Each entry is either a list of token strings (a text run) or a (task_type, data) event.
+        self._items = collections.deque()
+        self._pending_chars = 0
+
+        self.tokens_received = 0
+        self.tokens_rendered = 0
+        self.peak_lag = 0
+        self._token_rate = 0.0
+        self._last_token_time = None
+
+    # --- Producer side (called from the Tk thread while draining the response queue) ---
+
+    def put(self, task_type, data, now=None):
+        if task_type != 'token':
+            self._items.append((task_type, data))
+            return
+        now = time.monotonic() if now is None else now
+        if self._items and isinstance(self._items[-1], list):
+            self._items[-1].append(data)
+        else:
+            self._items.append([data])
+        self._pending_chars += len(data)
+        self.tokens_received += 1
+        self._update_rate(now)
+        self.peak_lag = max(self.peak_lag, self.lag)
+
+    def _update_rate(self, now):
+        if self._last_token_time is not None:
+            gap = now - self._last_token_time
+            instant_rate = 1.0 / gap if gap > 0 else 1000.0
+            # Exponential moving average keeps the interval from jittering on bursty streams.
+            self._token_rate = 0.8 * self._token_rate + 0.2 * min(instant_rate, 1000.0)
+        self._last_token_time = now
+
+    # --- Consumer side (called once per Tk frame) ---
+
+    def next_frame(self):
+        """Returns the work for one frame as a list of ('text', str) and (task_type, data) items."""
+        frame = []
+        chars_left = self.max_chars_per_frame
+        events_left = self.max_events_per_frame
+        while self._items and chars_left > 0 and events_left > 0:
+            item = self._items[0]
+            if isinstance(item, tuple):
+                frame.append(self._items.popleft())
+                events_left -= 1
+                continue
+            count = size = 0
+            for token in item:
+                if count and size + len(token) > chars_left:
+                    break
+                size += len(token)
+                count += 1
+            text = ''.join(item[:count])
+            del item[:count]
+            self._pending_chars -= size
+            self.tokens_rendered += count
+            chars_left -= size
+            if frame and frame[-1][0] == 'text':
+                frame[-1] = ('text', frame[-1][1] + text)
+            else:
+                frame.append(('text', text))
+            if item:
+                break
+            self._items.popleft()
+        return frame
+
+    def next_interval_ms(self, now=None):
+        """Poll interval for the next frame, adapted to the incoming token rate."""
+        if self._items:
+            return self.min_interval_ms
+        now = time.monotonic() if now is None else now
+        if self._last_token_time is None or now - self._last_token_time > 1.0 or self._token_rate <= 0:
+            return self.max_interval_ms
+        interval = 1000.0 * self.target_tokens_per_frame / self._token_rate
+        return int(max(self.min_interval_ms, min(self.max_interval_ms, interval)))
+
+    # --- Stats ---
+
+    @property
+    def lag(self):
+        """Tokens received from the model but not yet displayed."""
+        return self.tokens_received - self.tokens_rendered
+
+    @property
+    def pending_chars(self):
+        return self._pending_chars
+
+    @property
+    def token_rate(self):
+        return self._token_rate
+
+    def has_pending(self):
+        return bool(self._items)
+
+    def reset_peak_lag(self):
+        self.peak_lag = self.lag
+
+
+class TranscriptPager:
+    """Shows a long conversation in a Text widget by rendering only its most recent messages.
+
+    The full history stays in the messages list (plain role/content dicts); the
+    widget holds just the last page_size messages plus whatever is streamed in
+    afterwards. When the user scrolls to the top, the previous page is inserted
+    above the current view without moving it.
+
+    insert_message(index, message) must insert one message at index (a mark
+    that advances as text is inserted there).
+    """
+
+    def __init__(self, text_widget, insert_message, page_size=TRANSCRIPT_PAGE_SIZE, scrollbar=None):
+        self.text = text_widget
+        self.insert_message = insert_message
+        self.page_size = page_size
+        self.messages = []
+        self.first_rendered = 0
+        self._load_scheduled = False
+        self._scrollbar = scrollbar or getattr(text_widget, 'vbar', None)
+        self.text.config(yscrollcommand=self._on_yscroll)
+
+    @property
+    def hidden_count(self):
+        """Messages kept in history but not rendered yet."""
+        return self.first_rendered
+
+    def show(self, messages):
+        """Replaces the widget contents with the last page of messages."""
+        self.messages = messages
+        self.first_rendered = max(0, len(messages) - self.page_size)
+        state = self.text.cget('state')
+        self.text.config(state='normal')
+        self.text.delete("1.0", tk.END)
+        for message in messages[self.first_rendered:]:
+            self.insert_message(tk.END, message)
+        self.text.config(state=state)
+        self.text.see(tk.END)
+
+    def reveal(self, index):
+        """Scrolls message index to the top of the view, rendering it and everything after it if needed."""
+        if not 0 <= index < len(self.messages):
+            return
+        self.first_rendered = min(index, self.first_rendered)
+        state = self.text.cget('state')
+        self.text.config(state='normal')
+        self.text.delete("1.0", tk.END)
+        for number, message in enumerate(self.messages[self.first_rendered:], self.first_rendered):
+            if number == index:
+                self.text.mark_set('transcript_reveal', "end-1c")
+                self.text.mark_gravity('transcript_reveal', tk.LEFT)
+            self.insert_message(tk.END, message)
+        self.text.config(state=state)
+        self.text.yview('transcript_reveal')
+        self.text.mark_unset('transcript_reveal')
+
+    def load_older(self):
+        """Inserts the page before the first rendered message at the top, keeping the view in place."""
+        self._load_scheduled = False
+        if not self.first_rendered or self.text.yview()[0] > 0:
+            return
+        start = max(0, self.first_rendered - self.page_size)
+        state = self.text.cget('state')
+        self.text.config(state='normal')
+        self.text.mark_set('transcript_page', "1.0")
+        self.text.mark_gravity('transcript_page', tk.RIGHT)
+        for message in self.messages[start:self.first_rendered]:
+            self.insert_message('transcript_page', message)
+        inserted_lines = int(self.text.index('transcript_page').split('.')[0]) - 1
+        self.text.mark_unset('transcript_page')
+        self.text.config(state=state)
+        self.text.yview(f"{inserted_lines + 1}.0")
+        self.first_rendered = start
+
+    def _on_yscroll(self, first, last):
+        if self._scrollbar is not None:
+            self._scrollbar.set(first, last)
+        if float(first) <= 0.0 and self.first_rendered and not self._load_scheduled:
+            # Defer the insert: yscrollcommand fires in the middle of widget updates.
+            self._load_scheduled = True
+            self.text.after_idle(self.load_older)
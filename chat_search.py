@@ -0,0 +1,311 @@
+import glob
+import hashlib
+import json
+import os
+import queue
+import threading
+import tkinter as tk
+from tkinter import filedialog, ttk
+
+import numpy as np
+import ollama
+
+from log_rag import DEFAULT_EMBEDDING_MODEL, EMBED_BATCH_SIZE, embed_texts
+
+CHAT_INDEX_DIR = "chat_index"
+CHAT_SEARCH_TOP_K = 50
+# Newly embedded chats are made searchable in groups of this many files.
+PUBLISH_EVERY_FILES = 50
+# Characters of a message that are embedded, and shown in the result list.
+EMBED_MESSAGE_CHARS = 2000
+PREVIEW_CHARS = 160
+
+
+_store_locks = {}
+_store_locks_lock = threading.Lock()
+
+
+def _store_lock(store_dir):
+    """One lock per index directory, shared by every ChatIndex that writes there."""
+    with _store_locks_lock:
+        return _store_locks.setdefault(os.path.abspath(store_dir), threading.Lock())
+
+
+def _file_sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class ChatIndex:
+    """Embeddings of every message of the chats saved in a directory, for semantic search.
+
+    update() is incremental: files whose size and mtime are unchanged are
+    skipped, files whose content hash is unchanged only have their mtime
+    refreshed, and only new or edited chats are embedded again. The store is
+    two files under CHAT_INDEX_DIR: a float32 matrix of unit vectors (.npz) and
+    a JSON list of (file, message index, role, preview) rows aligned with it.
+    Indexes over the same store directory take turns: each update() starts from
+    what the previous one saved, so two never write the store files at once.
+    """
+
+    def __init__(self, chats_dir, model=DEFAULT_EMBEDDING_MODEL, client=ollama, store_dir=CHAT_INDEX_DIR):
+        self.chats_dir = chats_dir
+        self.model = model
+        self.client = client
+        self.store_dir = store_dir
+        self.files = {}
+        # Replaced as a whole so searches on other threads always see matching vectors and rows.
+        self._data = (np.zeros((0, 0), dtype=np.float32), [])
+        self._lock = _store_lock(store_dir)
+        with self._lock:
+            self._load()
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.store_dir, "vectors.npz")
+
+    @property
+    def _metadata_path(self):
+        return os.path.join(self.store_dir, "metadata.json")
+
+    @property
+    def message_count(self):
+        return len(self._data[1])
+
+    def _load(self):
+        try:
+            with open(self._metadata_path, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+            with np.load(self._vectors_path) as data:
+                vectors = data['vectors']
+        except (OSError, ValueError, KeyError):
+            return
+        if metadata.get('model') != self.model or len(metadata.get('rows', [])) != len(vectors):
+            return  # Built with another embedding model: start over.
+        self.files = metadata['files']
+        paths = metadata['paths']
+        self._data = (vectors, [(paths[f], m, role, preview) for f, m, role, preview in metadata['rows']])
+
+    def _save(self):
+        vectors, rows = self._data
+        paths = sorted({row[0] for row in rows} | set(self.files))
+        path_ids = {path: i for i, path in enumerate(paths)}
+        metadata = {'model': self.model, 'files': self.files, 'paths': paths,
+                    'rows': [[path_ids[path], m, role, preview] for path, m, role, preview in rows]}
+        os.makedirs(self.store_dir, exist_ok=True)
+        with open(self._vectors_path + ".tmp", 'wb') as f:
+            np.savez(f, vectors=vectors)
+        with open(self._metadata_path + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False)
+        os.replace(self._vectors_path + ".tmp", self._vectors_path)
+        os.replace(self._metadata_path + ".tmp", self._metadata_path)
+
+    def update(self, on_progress=None, cancelled=None):
+        """Brings the index in line with the chats directory; returns the number of files (re)embedded."""
+        with self._lock:
+            # Another index may have saved to the store since this one loaded it.
+            self._load()
+            paths = sorted(os.path.abspath(p) for p in glob.glob(os.path.join(self.chats_dir, "*.json")))
+            changed = []
+            for path in paths:
+                status = os.stat(path)
+                known = self.files.get(path)
+                if known and known['size'] == status.st_size and known['mtime'] == status.st_mtime:
+                    continue
+                digest = _file_sha256(path)
+                if known and known['sha256'] == digest:
+                    known['mtime'] = status.st_mtime
+                    continue
+                changed.append((path, {'size': status.st_size, 'mtime': status.st_mtime, 'sha256': digest}))
+            chats_dir = os.path.abspath(self.chats_dir)
+            removed = {p for p in self.files if os.path.dirname(p) == chats_dir} - set(paths)
+            stale = removed | {path for path, _ in changed}
+
+            vectors, rows = self._data
+            keep = [i for i, row in enumerate(rows) if row[0] not in stale]
+            vectors, rows = vectors[keep] if len(vectors) else vectors, [rows[i] for i in keep]
+            for path in removed:
+                del self.files[path]
+            self._data = (vectors, rows)
+
+            pending_rows, pending_vectors = [], []
+            for done, (path, info) in enumerate(changed, 1):
+                if cancelled is not None and cancelled.is_set():
+                    break
+                new_rows, new_vectors = self._embed_chat(path)
+                if new_rows:
+                    pending_rows.extend(new_rows)
+                    pending_vectors.append(new_vectors)
+                self.files[path] = info
+                if pending_vectors and (done % PUBLISH_EVERY_FILES == 0 or done == len(changed)):
+                    vectors = np.vstack(([vectors] if len(vectors) else []) + pending_vectors)
+                    rows = rows + pending_rows
+                    self._data = (vectors, rows)
+                    pending_rows, pending_vectors = [], []
+                if on_progress:
+                    on_progress(done, len(changed))
+            if pending_vectors:
+                # Cancelled part-way: keep what was embedded.
+                self._data = (np.vstack(([vectors] if len(vectors) else []) + pending_vectors), rows + pending_rows)
+            if changed or removed:
+                self._save()
+            return len(changed)
+
+    def _embed_chat(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                history = json.load(f).get("conversation_history", [])
+        except (OSError, ValueError, AttributeError):
+            return [], None
+        rows = []
+        texts = []
+        for number, message in enumerate(history):
+            content = (message.get('content') or "").strip()
+            if content:
+                rows.append((path, number, message.get('role', ''), " ".join(content[:PREVIEW_CHARS].split())))
+                texts.append(content[:EMBED_MESSAGE_CHARS])
+        if not texts:
+            return [], None
+        batches = [embed_texts(self.client, self.model, texts[i:i + EMBED_BATCH_SIZE])
+                   for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+        return rows, np.vstack(batches)
+
+    def search(self, query, top_k=CHAT_SEARCH_TOP_K):
+        """Messages most similar to query, best first, as dicts with path, message_index, role, preview and score."""
+        vectors, rows = self._data
+        if not rows:
+            return []
+        scores = vectors @ embed_texts(self.client, self.model, [query])[0]
+        count = min(top_k, len(rows))
+        best = np.argpartition(-scores, count - 1)[:count]
+        best = best[np.argsort(-scores[best])]
+        return [{'path': rows[i][0], 'message_index': rows[i][1], 'role': rows[i][2], 'preview': rows[i][3],
+                 'score': float(scores[i])} for i in best]
+
+
+class ChatSearchDialog(tk.Toplevel):
+    """Finds messages in saved chats by meaning and opens the chosen one.
+
+    The directory is indexed in the background when the dialog opens; searches
+    cover whatever has been indexed so far. on_open(path, message_index) is
+    called for the hit the user double-clicks.
+    """
+
+    def __init__(self, parent, chats_dir, on_open, model=DEFAULT_EMBEDDING_MODEL, client=ollama):
+        super().__init__(parent)
+        self.title("Search Saved Chats")
+        self.geometry("800x450")
+        self.on_open = on_open
+        self.model = model
+        self.client = client
+        self.chats_dir = tk.StringVar(self, value=chats_dir)
+        self.query = tk.StringVar(self)
+        self.index = None
+        self.hits = []
+        self._cancel = threading.Event()
+        self._events = queue.Queue()
+        self._poll_job = None
+
+        dir_row = ttk.Frame(self, padding="5")
+        dir_row.pack(fill=tk.X)
+        ttk.Label(dir_row, text="Chats folder:").pack(side=tk.LEFT)
+        ttk.Label(dir_row, textvariable=self.chats_dir, font=("Arial", 8)).pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 5))
+        ttk.Button(dir_row, text="Change...", command=self.choose_directory).pack(side=tk.RIGHT)
+
+        query_row = ttk.Frame(self, padding="5")
+        query_row.pack(fill=tk.X)
+        query_entry = ttk.Entry(query_row, textvariable=self.query)
+        query_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5))
+        query_entry.bind("<Return>", lambda event: self.search())
+        query_entry.focus_set()
+        ttk.Button(query_row, text="Search", command=self.search).pack(side=tk.RIGHT)
+
+        self.results = ttk.Treeview(self, columns=("score", "chat", "role", "preview"), show="headings")
+        for column, heading, width in (("score", "Score", 60), ("chat", "Chat", 180), ("role", "Role", 70), ("preview", "Message", 470)):
+            self.results.heading(column, text=heading)
+            self.results.column(column, width=width, stretch=column == "preview")
+        self.results.pack(fill=tk.BOTH, expand=True, padx=5)
+        self.results.bind("<Double-1>", self.open_selected)
+        self.results.bind("<Return>", self.open_selected)
+
+        self.status_label = ttk.Label(self, text="", anchor=tk.W)
+        self.status_label.pack(fill=tk.X, padx=5, pady=(2, 5))
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self.start_indexing()
+        self._poll_events()
+
+    def choose_directory(self):
+        directory = filedialog.askdirectory(parent=self, initialdir=self.chats_dir.get(), title="Chats Folder")
+        if directory:
+            self.chats_dir.set(directory)
+            self.start_indexing()
+
+    def start_indexing(self):
+        self._cancel.set()
+        self._cancel = threading.Event()
+        cancelled = self._cancel
+        chats_dir = self.chats_dir.get()
+        self.status_label.config(text="Checking for new or changed chats...")
+
+        def run():
+            try:
+                index = ChatIndex(chats_dir, self.model, self.client)
+                self.index = index
+                updated = index.update(lambda done, total: self._report(cancelled, f"Indexing chats: {done}/{total}..."), cancelled)
+                self._report(cancelled, f"{index.message_count} messages in {len(index.files)} chats indexed ({updated} updated).")
+            except Exception as e:
+                self._report(cancelled, f"Indexing failed: {e}")
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _report(self, cancelled, text):
+        if not cancelled.is_set():
+            self._events.put(('status', text))
+
+    def _poll_events(self):
+        # Worker threads never touch Tk; they leave their results here.
+        try:
+            while True:
+                kind, data = self._events.get_nowait()
+                if kind == 'hits':
+                    self._show_hits(data)
+                else:
+                    self.status_label.config(text=data)
+        except queue.Empty:
+            pass
+        self._poll_job = self.after(100, self._poll_events)
+
+    def search(self):
+        query = self.query.get().strip()
+        if not query or self.index is None:
+            return
+        index = self.index
+        self.status_label.config(text="Searching...")
+
+        def run():
+            try:
+                self._events.put(('hits', index.search(query)))
+            except Exception as e:
+                self._events.put(('status', f"Search failed: {e}"))
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _show_hits(self, hits):
+        self.hits = hits
+        self.results.delete(*self.results.get_children())
+        for number, hit in enumerate(hits):
+            self.results.insert("", tk.END, iid=str(number), values=(
+                f"{hit['score']:.3f}", os.path.basename(hit['path']), hit['role'], hit['preview']))
+        self.status_label.config(text=f"{len(hits)} matching messages.")
+
+    def open_selected(self, event=None):
+        selection = self.results.selection()
+        if selection:
+            hit = self.hits[int(selection[0])]
+            self.on_open(hit['path'], hit['message_index'])
+
+    def close(self):
+        self._cancel.set()
+        if self._poll_job is not None:
+            self.after_cancel(self._poll_job)
+        self.destroy()
@@ -0,0 +1,82 @@
+import time
+
+
+def response_field(obj, name, default=None):
+    """Reads a field from either a plain dict or one of the ollama client's response objects."""
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    value = getattr(obj, name, None)
+    if value is None:
+        try:
+            value = obj[name]
+        except (KeyError, TypeError):
+            value = None
+    return default if value is None else value
+
+
+class StreamAccumulator:
+    """Collects streamed response chunks without repeated string concatenation.
+
+    Chunks are kept in a list and only joined when the text is asked for, so
+    building a long reply is linear instead of quadratic. Every chunk's arrival
+    time is recorded as well, which gives time-to-first-token and inter-token
+    latency for each reply for free.
+    """
+
+    def __init__(self, started_at=None):
+        self.started_at = time.monotonic() if started_at is None else started_at
+        self._chunks = []
+        self._timestamps = []
+        self._length = 0
+
+    def append(self, chunk, now=None):
+        if not chunk:
+            return
+        self._chunks.append(chunk)
+        self._timestamps.append(time.monotonic() if now is None else now)
+        self._length += len(chunk)
+
+    def text(self):
+        """The text received so far."""
+        if len(self._chunks) > 1:
+            # Collapse the joined text back into one chunk so repeated calls stay cheap.
+            joined = ''.join(self._chunks)
+            self._chunks = [joined]
+            return joined
+        return self._chunks[0] if self._chunks else ''
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def chunk_count(self):
+        return len(self._timestamps)
+
+    @property
+    def timestamps(self):
+        return list(self._timestamps)
+
+    @property
+    def time_to_first_token(self):
+        if not self._timestamps:
+            return None
+        return self._timestamps[0] - self.started_at
+
+    def inter_token_latencies(self):
+        ts = self._timestamps
+        return [b - a for a, b in zip(ts, ts[1:])]
+
+    def stats(self):
+        """Summary timings in seconds; latencies are None when not enough chunks arrived."""
+        gaps = self.inter_token_latencies()
+        elapsed = (self._timestamps[-1] - self.started_at) if self._timestamps else None
+        return {
+            'chunks': self.chunk_count,
+            'chars': self._length,
+            'time_to_first_token': self.time_to_first_token,
+            'mean_inter_token_latency': sum(gaps) / len(gaps) if gaps else None,
+            'max_inter_token_latency': max(gaps) if gaps else None,
+            'total_time': elapsed,
+        }
@@ -0,0 +1,367 @@
+"""Spreads Ollama requests over several hosts.
+
+The hosts come from the "ollama_endpoints" list in config.json; without it
+the pool holds just the default host (OLLAMA_HOST or localhost):
+
+    {"ollama_endpoints": ["http://gpu-box-1:11434", "http://gpu-box-2:11434"]}
+
+An EndpointPool has the same chat/list/ps/show/generate/embed/embeddings
+methods as ollama.Client, so it can be handed to anything that takes a client.
+"""
+import json
+import threading
+import time
+
+import ollama
+
+from chat_streaming import response_field
+
+ENDPOINTS_CONFIG_KEY = "ollama_endpoints"
+HEALTH_CHECK_INTERVAL_SECONDS = 15.0
+HEALTH_CHECK_TIMEOUT_SECONDS = 3.0
+# Routing cost of a host that has to load the model first, in outstanding requests.
+COLD_START_PENALTY = 2
+
+
+def read_endpoints(config_path):
+    """Hosts listed under ENDPOINTS_CONFIG_KEY in a JSON config file (empty if there are none)."""
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        return []
+    return [host for host in config.get(ENDPOINTS_CONFIG_KEY, []) if host]
+
+
+def _model_names(response):
+    names = set()
+    for m in response_field(response, 'models', []) or []:
+        name = response_field(m, 'model') or response_field(m, 'name')
+        if isinstance(name, str):
+            names.add(name)
+    return names
+
+
+def _is_connection_error(error):
+    # A ResponseError means the host answered; anything else means it could not be reached.
+    return not isinstance(error, ollama.ResponseError)
+
+
+class Endpoint:
+    """One Ollama host and what the pool knows about it."""
+
+    def __init__(self, host):
+        self.host = host
+        self.client = ollama.Client(host=host)
+        self.probe = ollama.Client(host=host, timeout=HEALTH_CHECK_TIMEOUT_SECONDS)
+        self._async_client = None
+        self.healthy = True
+        self.outstanding = 0
+        self.served = 0
+        self.installed = None  # Unknown until the first health check.
+        self.loaded = set()
+        self.last_error = None
+        self.checked_at = 0.0
+
+    @property
+    def name(self):
+        return self.host or "default"
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            self._async_client = ollama.AsyncClient(host=self.host)
+        return self._async_client
+
+    def has_model(self, model):
+        """True or False once the host's model list is known, None before."""
+        return None if self.installed is None else model in self.installed
+
+
+class EndpointPool:
+    """Routes each request to the host with the fewest requests in flight, preferring hosts with the model loaded.
+
+    Loading a model costs about COLD_START_PENALTY requests' worth of waiting,
+    so an idle host without the model still wins over a busy one that has it.
+    Hosts known not to have the model and hosts that failed their last check
+    are tried last. A streamed chat fails over to the next host when its host
+    errors before the first chunk arrives; after that the error is the
+    caller's. start() polls /api/tags and /api/ps on every host every
+    HEALTH_CHECK_INTERVAL_SECONDS to keep this picture current.
+    """
+
+    def __init__(self, hosts=None, interval=HEALTH_CHECK_INTERVAL_SECONDS):
+        self.hosts = list(hosts or [])
+        self.endpoints = [Endpoint(host) for host in self.hosts or [None]]
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_config(cls, config_path):
+        return cls(read_endpoints(config_path))
+
+    def start(self):
+        """Starts the background health checks; a pool of one host has nothing to choose, so it skips them."""
+        if len(self.endpoints) > 1 and self._thread is None:
+            self._thread = threading.Thread(target=self._check_loop, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _check_loop(self):
+        while True:
+            self.check_all()
+            if self._stop.wait(self.interval):
+                return
+
+    def check_all(self):
+        for endpoint in self.endpoints:
+            self.check(endpoint)
+
+    def check(self, endpoint):
+        """Refreshes one host's health and its installed and loaded models."""
+        try:
+            installed = _model_names(endpoint.probe.list())
+            loaded = _model_names(endpoint.probe.ps())
+        except Exception as e:
+            with self._lock:
+                endpoint.healthy = False
+                endpoint.last_error = e
+                endpoint.checked_at = time.time()
+            return False
+        with self._lock:
+            endpoint.healthy = True
+            endpoint.installed = installed
+            endpoint.loaded = loaded
+            endpoint.last_error = None
+            endpoint.checked_at = time.time()
+        return True
+
+    def status(self):
+        """One dict per host with its health, load and models, for display."""
+        with self._lock:
+            return [{'host': e.name, 'healthy': e.healthy, 'outstanding': e.outstanding, 'served': e.served,
+                     'loaded': sorted(e.loaded), 'installed': None if e.installed is None else sorted(e.installed),
+                     'error': str(e.last_error) if e.last_error else None} for e in self.endpoints]
+
+    def route(self, model=None):
+        """Endpoints in the order a request for model should try them."""
+        with self._lock:
+            def cost(endpoint):
+                has_model = endpoint.has_model(model) if model else None
+                load_cost = 0 if not model or model in endpoint.loaded else COLD_START_PENALTY
+                return (not endpoint.healthy, has_model is False, endpoint.outstanding + load_cost, endpoint.served)
+            return sorted(self.endpoints, key=cost)
+
+    def plan(self, models):
+        """Splits models into per-host groups, as (endpoint, [models]) pairs, for running several at once.
+
+        A model goes to a host that has it loaded if there is one, else to the
+        host with the fewest models planned so far among those that have it.
+        Within a group, models that are already loaded come first, so running a
+        group in order swaps as few models in and out of VRAM as possible.
+        """
+        groups = {endpoint: [] for endpoint in self.endpoints}
+        with self._lock:
+            for model in models:
+                candidates = [e for e in self.endpoints if e.healthy and e.has_model(model) is not False]
+                candidates = candidates or [e for e in self.endpoints if e.has_model(model) is not False] or self.endpoints
+                groups[min(candidates, key=lambda e: (model not in e.loaded, len(groups[e]), e.outstanding))].append(model)
+            return [(endpoint, sorted(group, key=lambda m: m not in endpoint.loaded))
+                    for endpoint, group in groups.items() if group]
+
+    def _begin(self, endpoint):
+        with self._lock:
+            endpoint.outstanding += 1
+
+    def _end(self, endpoint, model=None, error=None, cancelled=False):
+        """Settles a request started with _begin(); a cancelled one says nothing about the host."""
+        with self._lock:
+            endpoint.outstanding -= 1
+            if cancelled:
+                return
+            if error is None:
+                endpoint.served += 1
+                endpoint.healthy = True
+                if model:
+                    # Serving a request leaves the model resident on that host.
+                    endpoint.loaded.add(model)
+            elif _is_connection_error(error):
+                endpoint.healthy = False
+                endpoint.last_error = error
+            elif model and getattr(error, 'status_code', None) == 404 and endpoint.installed is not None:
+                endpoint.installed.discard(model)
+
+    def _call(self, method, model=None, **kwargs):
+        """A non-streaming request, retried on the next host when one fails."""
+        error = None
+        for endpoint in self.route(model):
+            self._begin(endpoint)
+            try:
+                if model is not None:
+                    kwargs['model'] = model
+                result = getattr(endpoint.client, method)(**kwargs)
+            except Exception as e:
+                self._end(endpoint, model, e)
+                error = e
+                continue
+            self._end(endpoint, model)
+            return result
+        raise error
+
+    def chat(self, model='', messages=None, stream=False, **kwargs):
+        if not stream:
+            return self._call('chat', model, messages=messages, **kwargs)
+        return self._stream_chat(model, messages, kwargs)
+
+    def _stream_chat(self, model, messages, kwargs):
+        error = None
+        for endpoint in self.route(model):
+            self._begin(endpoint)
+            try:
+                stream = endpoint.client.chat(model=model, messages=messages, stream=True, **kwargs)
+                first = next(stream, None)
+            except Exception as e:
+                self._end(endpoint, model, e)
+                error = e
+                continue
+            break
+        else:
+            raise error
+        error = None
+        try:
+            if first is not None:
+                yield first
+            yield from stream
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            stream.close()
+            self._end(endpoint, model, error)
+
+    def generate(self, model='', **kwargs):
+        if kwargs.get('keep_alive') == 0:
+            return self._unload(model, **kwargs)
+        return self._call('generate', model, **kwargs)
+
+    def _unload(self, model, **kwargs):
+        # Every host that has the model resident should let go of it, not just the best one.
+        with self._lock:
+            endpoints = [e for e in self.endpoints if model in e.loaded] or list(self.endpoints)
+        result = None
+        for endpoint in endpoints:
+            try:
+                result = endpoint.client.generate(model=model, **kwargs)
+            except Exception as e:
+                print(f"Warning: Could not unload model {model} on {endpoint.name}: {e}")
+            with self._lock:
+                endpoint.loaded.discard(model)
+        return result
+
+    def embed(self, model='', **kwargs):
+        return self._call('embed', model, **kwargs)
+
+    def embeddings(self, model='', **kwargs):
+        return self._call('embeddings', model, **kwargs)
+
+    def show(self, model):
+        return self._call('show', model)
+
+    def list(self):
+        """Models installed on any reachable host."""
+        return self._merged('list')
+
+    def ps(self):
+        """Models loaded on any reachable host."""
+        return self._merged('ps')
+
+    def _merged(self, method):
+        models = {}
+        error = None
+        for endpoint in self.endpoints:
+            try:
+                response = getattr(endpoint.client, method)()
+            except Exception as e:
+                self._mark_unreachable(endpoint, e)
+                error = e
+                continue
+            for m in response_field(response, 'models', []) or []:
+                name = response_field(m, 'model') or response_field(m, 'name')
+                models.setdefault(name, m)
+        if not models and error is not None:
+            raise error
+        return {'models': list(models.values())}
+
+    def _mark_unreachable(self, endpoint, error):
+        with self._lock:
+            endpoint.healthy = False
+            endpoint.last_error = error
+
+    def async_client(self):
+        """A view of the pool with an async chat(), for the chat engine's event loop."""
+        return AsyncPoolClient(self)
+
+
+class AsyncPoolClient:
+    """The pool's streaming chat through each host's ollama.AsyncClient, with the same routing and failover.
+
+    A client pinned to an endpoint tries that host first and only then the others.
+    """
+
+    def __init__(self, pool, endpoint=None):
+        self.pool = pool
+        self.endpoint = endpoint
+
+    def pinned(self, endpoint):
+        return AsyncPoolClient(self.pool, endpoint)
+
+    async def chat(self, model='', messages=None, stream=False, **kwargs):
+        if not stream:
+            raise ValueError("AsyncPoolClient only streams; use the pool itself for plain requests.")
+        return self._stream_chat(model, messages, kwargs)
+
+    async def _stream_chat(self, model, messages, kwargs):
+        pool = self.pool
+        error = None
+        endpoints = pool.route(model)
+        if self.endpoint is not None:
+            endpoints = [self.endpoint] + [e for e in endpoints if e is not self.endpoint]
+        for endpoint in endpoints:
+            pool._begin(endpoint)
+            stream = None
+            try:
+                stream = await endpoint.async_client.chat(model=model, messages=messages, stream=True, **kwargs)
+                first = await anext(stream, None)
+            except BaseException as e:
+                # Also on cancellation (Stop, a closed tab) before the first chunk, or the host stays "busy" for good.
+                if stream is not None:
+                    await stream.aclose()
+                if not isinstance(e, Exception):
+                    pool._end(endpoint, model, cancelled=True)
+                    raise
+                pool._end(endpoint, model, e)
+                error = e
+                continue
+            break
+        else:
+            raise error
+        error = None
+        cancelled = False
+        try:
+            if first is not None:
+                yield first
+            async for chunk in stream:
+                yield chunk
+        except BaseException as e:
+            # Cancelled or closed by the caller mid-stream: that says nothing about the host either.
+            error = e if isinstance(e, Exception) else None
+            cancelled = error is None
+            raise
+        finally:
+            await stream.aclose()
+            pool._end(endpoint, model, error, cancelled=cancelled)
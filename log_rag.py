@@ -0,0 +1,184 @@
+import hashlib
+import mmap
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import ollama
+
+from chat_context import estimate_tokens
+from chat_streaming import response_field
+
+LOG_EMBEDDINGS_DIR = "log_embeddings"
+DEFAULT_EMBEDDING_MODEL = "nomic-embed-text:latest"
+# About 400 tokens per chunk; chunks always end at a line break.
+CHUNK_BYTES = 1600
+EMBED_BATCH_SIZE = 32
+CHECKPOINT_SECONDS = 30.0
+RAG_TOP_K = 8
+RAG_MAX_TOKENS = 1024
+LOG_CONTEXT_PREFIX = "Relevant excerpts from the log file {name} (most relevant first):"
+
+
+def file_digest(path, chunk_size=8 * 1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def embed_texts(client, model, texts):
+    """Unit-length embeddings of texts as a float32 array, one row per text."""
+    if hasattr(client, 'embed'):
+        vectors = response_field(client.embed(model=model, input=texts), 'embeddings')
+    else:
+        # Older clients only have the one-text-per-call endpoint.
+        vectors = [response_field(client.embeddings(model=model, prompt=t), 'embedding') for t in texts]
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def chunk_spans(mm, size, chunk_bytes=CHUNK_BYTES):
+    """(start, end) byte ranges of about chunk_bytes each, cut after a newline where there is one."""
+    spans = []
+    position = 0
+    while position < size:
+        end = min(size, position + chunk_bytes)
+        if end < size:
+            newline = mm.rfind(b'\n', position, end)
+            end = newline + 1 if newline >= 0 else end
+        spans.append((position, end))
+        position = end
+    return np.array(spans, dtype=np.int64).reshape(-1, 2)
+
+
+class LogEmbeddingIndex:
+    """Embeddings of a log file's chunks, used to pick the parts relevant to a question.
+
+    build() runs on a background thread: the file is split into line-aligned
+    chunks that are embedded EMBED_BATCH_SIZE at a time through the Ollama
+    embeddings API. Vectors are unit length, so a dot product is the cosine
+    similarity. They are saved under LOG_EMBEDDINGS_DIR, keyed by the file's
+    SHA-256 and the embedding model, with a checkpoint every CHECKPOINT_SECONDS
+    so an interrupted build resumes where it stopped. search() may be called
+    while the build is running and uses the chunks embedded so far.
+    """
+
+    def __init__(self, path, model=DEFAULT_EMBEDDING_MODEL, client=ollama, cache_dir=LOG_EMBEDDINGS_DIR):
+        self.path = path
+        self.model = model
+        self.client = client
+        self.cache_dir = cache_dir
+        self.spans = np.zeros((0, 2), dtype=np.int64)
+        self.vectors = None
+        self.embedded = 0
+        self.error = None
+        self._cancel = threading.Event()
+        self._cache_path = None
+
+    @property
+    def total(self):
+        return len(self.spans)
+
+    @property
+    def ready(self):
+        return self.total > 0 and self.embedded == self.total
+
+    def start(self, on_progress=None):
+        """Builds the index on a background thread; on_progress(index) is called after every batch and at the end."""
+        threading.Thread(target=self.build, args=(on_progress,), daemon=True).start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def build(self, on_progress=None):
+        try:
+            safe_model = re.sub(r'[^\w.-]', '_', self.model)
+            self._cache_path = os.path.join(self.cache_dir, f"{file_digest(self.path)}.{safe_model}.npz")
+            with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                spans = chunk_spans(mm, len(mm))
+                vectors, embedded = self._load_checkpoint(spans)
+                self.spans, self.vectors, self.embedded = spans, vectors, embedded
+                last_checkpoint = time.monotonic()
+                while self.embedded < self.total and not self._cancel.is_set():
+                    batch = spans[self.embedded:self.embedded + EMBED_BATCH_SIZE]
+                    texts = [mm[start:end].decode('utf-8', errors='replace') for start, end in batch]
+                    batch_vectors = embed_texts(self.client, self.model, texts)
+                    if self.vectors is None:
+                        self.vectors = np.zeros((self.total, batch_vectors.shape[1]), dtype=np.float32)
+                    self.vectors[self.embedded:self.embedded + len(batch)] = batch_vectors
+                    self.embedded += len(batch)
+                    if time.monotonic() - last_checkpoint > CHECKPOINT_SECONDS:
+                        self._save_checkpoint()
+                        last_checkpoint = time.monotonic()
+                    if on_progress:
+                        on_progress(self)
+            self._save_checkpoint()
+        except Exception as e:
+            self.error = e
+        if on_progress:
+            on_progress(self)
+
+    def _load_checkpoint(self, spans):
+        try:
+            with np.load(self._cache_path) as data:
+                if data['spans'].shape != spans.shape or not np.array_equal(data['spans'], spans):
+                    return None, 0
+                done = data['vectors']
+        except (OSError, ValueError, KeyError):
+            return None, 0
+        if not len(done):
+            return None, 0
+        vectors = np.zeros((len(spans), done.shape[1]), dtype=np.float32)
+        vectors[:len(done)] = done
+        return vectors, len(done)
+
+    def _save_checkpoint(self):
+        if self.vectors is None or self._cache_path is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self._cache_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, spans=self.spans, vectors=self.vectors[:self.embedded])
+        os.replace(tmp_path, self._cache_path)
+
+    def search(self, question, max_tokens=RAG_MAX_TOKENS, top_k=RAG_TOP_K):
+        """The chunks most similar to question, best first, as (score, text) pairs fitting in max_tokens."""
+        embedded, vectors = self.embedded, self.vectors
+        if not embedded or vectors is None:
+            return []
+        query = embed_texts(self.client, self.model, [question])[0]
+        scores = vectors[:embedded] @ query
+        best = np.argsort(-scores)[:top_k]
+        results = []
+        used = 0
+        with open(self.path, 'rb') as f:
+            for i in best:
+                start, end = self.spans[i]
+                f.seek(int(start))
+                text = f.read(int(end - start)).decode('utf-8', errors='replace').strip()
+                cost = estimate_tokens(text)
+                if used + cost > max_tokens:
+                    # Keep the start of a chunk that does not fit whole, if a useful part of it does.
+                    remaining = max_tokens - used
+                    if remaining < 64:
+                        continue
+                    text = text[:remaining * 4]
+                    cost = estimate_tokens(text)
+                used += cost
+                results.append((float(scores[i]), text))
+        return results
+
+    def context_message(self, question, max_tokens=RAG_MAX_TOKENS):
+        """A system message with the excerpts relevant to question, or None if there are none yet."""
+        excerpts = self.search(question, max_tokens)
+        if not excerpts:
+            return None
+        parts = [LOG_CONTEXT_PREFIX.format(name=os.path.basename(self.path))]
+        parts.extend(f"--- excerpt {n} ---\n{text}" for n, (_, text) in enumerate(excerpts, 1))
+        return {'role': 'system', 'content': "\n\n".join(parts)}
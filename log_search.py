@@ -0,0 +1,374 @@
+import json
+import mmap
+import os
+import queue
+import re
+import threading
+import tkinter as tk
+from tkinter import ttk
+
+from log_viewer import tail_digest
+
+SEARCH_CHUNK_BYTES = 4 * 1024 * 1024
+MAX_SEARCH_RESULTS = 5000
+MAX_RESULT_LINE_CHARS = 300
+SEARCH_DEBOUNCE_MS = 300
+SEARCH_POLL_MS = 50
+
+TOKEN_INDEX_SUFFIX = ".tokenidx"
+TOKEN_INDEX_VERSION = 1
+TOKEN_INDEX_BLOCK_BYTES = 256 * 1024
+
+LEVELS = ["Any", "DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+LEVEL_RANKS = {b'DEBUG': 1, b'INFO': 2, b'WARN': 3, b'WARNING': 3, b'ERROR': 4, b'CRITICAL': 5, b'FATAL': 5}
+LEVEL_PATTERN = re.compile(rb'\b(DEBUG|INFO|WARNING|WARN|ERROR|CRITICAL|FATAL)\b')
+TIMESTAMP_PATTERN = re.compile(rb'(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}(?::\d{2})?)')
+TOKEN_PATTERN = re.compile(rb'\w+')
+
+
+class LogQuery:
+    """What to look for: a substring or regex, a minimum level, and a timestamp range.
+
+    Timestamps are compared as text against the first 'YYYY-MM-DD HH:MM[:SS]'
+    in the line, so 'since' and 'until' may be any prefix of that form
+    ('2024-05-01', '2024-05-01 13:30'); 'until' includes everything it prefixes.
+    """
+
+    def __init__(self, text="", regex=False, case_sensitive=False, min_level="Any", since="", until=""):
+        self.text = text
+        self.regex = regex
+        self.case_sensitive = case_sensitive
+        self.min_rank = LEVEL_RANKS.get(min_level.encode('ascii'), 0)
+        self.since = since.replace('T', ' ')
+        self.until = until.replace('T', ' ')
+        flags = re.MULTILINE | (0 if case_sensitive else re.IGNORECASE)
+        source = text.encode('utf-8') if regex else re.escape(text.encode('utf-8'))
+        if not text and self.min_rank:
+            # Filters only: look for the accepted level names instead of visiting every line.
+            source = rb'\b(' + b'|'.join(name for name, rank in LEVEL_RANKS.items() if rank >= self.min_rank) + rb')\b'
+            flags = 0
+        elif not text:
+            source = rb'^'
+        self.pattern = re.compile(source, flags)
+
+    @property
+    def is_empty(self):
+        return not (self.text or self.min_rank or self.since or self.until)
+
+    def accepts(self, line):
+        if self.min_rank:
+            level = LEVEL_PATTERN.search(line)
+            if not level or LEVEL_RANKS[level.group(1)] < self.min_rank:
+                return False
+        if self.since or self.until:
+            stamp = TIMESTAMP_PATTERN.search(line)
+            if not stamp:
+                return False
+            stamp = (stamp.group(1) + b' ' + stamp.group(2)).decode('ascii')
+            if self.since and stamp < self.since:
+                return False
+            if self.until and stamp[:len(self.until)] > self.until:
+                return False
+        return True
+
+    def literal_tokens(self):
+        """Lower-cased word fragments every match must contain, for narrowing a search with a token index."""
+        if self.regex or not self.text:
+            return []
+        # Shorter fragments occur in too many words to narrow anything down.
+        return [token for token in TOKEN_PATTERN.findall(self.text.lower().encode('utf-8')) if len(token) >= 3]
+
+
+class TokenIndex:
+    """Which blocks of a log contain which words, so repeated searches only scan candidate blocks.
+
+    The file is split into blocks of about TOKEN_INDEX_BLOCK_BYTES ending at a
+    newline, and each lower-cased word maps to the blocks it occurs in. A query
+    fragment matches every indexed word containing it, so partial words work.
+    The index is saved next to the log (<file>.tokenidx) and extended when the
+    log has grown since.
+    """
+
+    def __init__(self, size=0, blocks=None, postings=None):
+        self.size = size
+        self.blocks = blocks or []
+        self.postings = postings or {}
+        self.lock = threading.Lock()
+        self._vocabulary = None
+
+    @classmethod
+    def load(cls, path, mm):
+        try:
+            with open(path + TOKEN_INDEX_SUFFIX, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        size = data.get('size', -1)
+        if data.get('version') != TOKEN_INDEX_VERSION or not 0 < size <= len(mm) or data.get('check') != tail_digest(mm, size):
+            return None
+        postings = {token.encode('latin-1'): blocks for token, blocks in data['postings'].items()}
+        return cls(size, [tuple(block) for block in data['blocks']], postings)
+
+    def save(self, path, mm):
+        data = {'version': TOKEN_INDEX_VERSION, 'size': self.size, 'check': tail_digest(mm, self.size),
+                'blocks': self.blocks,
+                'postings': {token.decode('latin-1'): blocks for token, blocks in self.postings.items()}}
+        tmp_path = path + TOKEN_INDEX_SUFFIX + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(tmp_path, path + TOKEN_INDEX_SUFFIX)
+        except OSError as e:
+            print(f"Warning: Could not save the search index of {path}: {e}")
+
+    def extend(self, mm, end, cancelled, on_progress=None):
+        """Indexes the blocks between the indexed size and end; returns False if cancelled."""
+        position = self.size
+        while position < end:
+            if cancelled.is_set():
+                return False
+            block_end = mm.find(b'\n', min(end, position + TOKEN_INDEX_BLOCK_BYTES) - 1, end)
+            block_end = end if block_end < 0 else block_end + 1
+            block_id = len(self.blocks)
+            for token in set(TOKEN_PATTERN.findall(mm[position:block_end].lower())):
+                self.postings.setdefault(token, []).append(block_id)
+            self.blocks.append((position, block_end))
+            position = self.size = block_end
+            if on_progress:
+                on_progress(position)
+        self._vocabulary = None
+        return True
+
+    def candidate_blocks(self, fragments):
+        """Blocks that may contain all fragments, or None when the index cannot narrow the search."""
+        if not fragments:
+            return None
+        if self._vocabulary is None:
+            self._vocabulary = b"\n".join(self.postings) + b"\n"
+        candidates = None
+        for fragment in fragments:
+            blocks = set()
+            for match in re.finditer(rb'[^\n]*' + re.escape(fragment) + rb'[^\n]*', self._vocabulary):
+                blocks.update(self.postings.get(match.group(), ()))
+            candidates = blocks if candidates is None else candidates & blocks
+            if not candidates:
+                break
+        return sorted(candidates)
+
+
+def search_log(path, query, on_results, cancelled, token_index=None, on_progress=None):
+    """Scans a log for lines matching query, calling on_results(batch) with (offset, line) pairs per chunk.
+
+    Runs on a worker thread over its own memory map; stops early when cancelled
+    is set or MAX_SEARCH_RESULTS lines have been found.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            ranges = [(0, size)]
+            # An index of a file that has since been truncated or replaced cannot be used.
+            if token_index is not None and token_index.size <= size:
+                with token_index.lock:
+                    if token_index.size < size:
+                        if not token_index.extend(mm, size, cancelled, lambda done: on_progress and on_progress('indexing', done / size)):
+                            return
+                        token_index.save(path, mm)
+                    blocks = token_index.candidate_blocks(query.literal_tokens())
+                if blocks is not None:
+                    ranges = [token_index.blocks[b] for b in blocks]
+            found = 0
+            scanned = 0
+            total = sum(end - start for start, end in ranges)
+            for start, end in ranges:
+                position = start
+                while position < end:
+                    if cancelled.is_set():
+                        return
+                    chunk_end = mm.find(b'\n', min(end, position + SEARCH_CHUNK_BYTES) - 1, end)
+                    chunk_end = end if chunk_end < 0 else chunk_end + 1
+                    batch = []
+                    last_line_start = -1
+                    for match in query.pattern.finditer(mm, position, chunk_end):
+                        line_start = mm.rfind(b'\n', 0, match.start()) + 1
+                        # An empty match at chunk_end belongs to the next chunk's first line.
+                        if line_start == last_line_start or match.start() >= chunk_end:
+                            continue
+                        last_line_start = line_start
+                        line_end = mm.find(b'\n', match.start(), size)
+                        line = mm[line_start:line_end if line_end >= 0 else size]
+                        if query.accepts(line):
+                            batch.append((line_start, line.decode('utf-8', errors='replace').rstrip('\r')))
+                            found += 1
+                            if found >= MAX_SEARCH_RESULTS:
+                                on_results(batch)
+                                return
+                    if batch:
+                        on_results(batch)
+                    scanned += chunk_end - position
+                    position = chunk_end
+                    if on_progress:
+                        on_progress('searching', scanned / total)
+
+
+class LogSearchPanel(ttk.Frame):
+    """Search bar and result list for a LogViewer.
+
+    Searches run on a worker thread and stream their matches into the list as
+    they are found; editing the query cancels the running search and starts a
+    new one after a short pause. Clicking a result shows that line in the viewer.
+    """
+
+    def __init__(self, parent, viewer):
+        super().__init__(parent)
+        self.viewer = viewer
+        self.query_text = tk.StringVar(self)
+        self.regex = tk.BooleanVar(self, value=False)
+        self.case_sensitive = tk.BooleanVar(self, value=False)
+        self.use_index = tk.BooleanVar(self, value=False)
+        self.min_level = tk.StringVar(self, value="Any")
+        self.since = tk.StringVar(self)
+        self.until = tk.StringVar(self)
+        self.result_offsets = []
+        self._results = queue.Queue()
+        self._cancel = threading.Event()
+        self._search_id = 0
+        self._debounce_job = None
+        self._poll_job = None
+        self._worker = None
+        self._token_indexes = {}
+        self._token_indexes_lock = threading.Lock()
+
+        query_row = ttk.Frame(self)
+        query_row.pack(fill=tk.X)
+        ttk.Label(query_row, text="Search:").pack(side=tk.LEFT)
+        self.query_entry = ttk.Entry(query_row, textvariable=self.query_text)
+        self.query_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 5))
+        self.query_entry.bind("<Return>", lambda event: self.start_search())
+        ttk.Checkbutton(query_row, text="Regex", variable=self.regex, command=self.schedule_search).pack(side=tk.LEFT)
+        ttk.Checkbutton(query_row, text="Case", variable=self.case_sensitive, command=self.schedule_search).pack(side=tk.LEFT)
+        ttk.Checkbutton(query_row, text="Index", variable=self.use_index, command=self.schedule_search).pack(side=tk.LEFT)
+
+        filter_row = ttk.Frame(self)
+        filter_row.pack(fill=tk.X, pady=(2, 2))
+        ttk.Label(filter_row, text="Level ≥").pack(side=tk.LEFT)
+        level_box = ttk.Combobox(filter_row, textvariable=self.min_level, values=LEVELS, width=9, state='readonly')
+        level_box.pack(side=tk.LEFT, padx=(5, 5))
+        level_box.bind("<<ComboboxSelected>>", lambda event: self.schedule_search())
+        ttk.Label(filter_row, text="From:").pack(side=tk.LEFT)
+        ttk.Entry(filter_row, textvariable=self.since, width=16).pack(side=tk.LEFT, padx=(5, 5))
+        ttk.Label(filter_row, text="To:").pack(side=tk.LEFT)
+        ttk.Entry(filter_row, textvariable=self.until, width=16).pack(side=tk.LEFT, padx=(5, 5))
+        self.status_label = ttk.Label(filter_row, text="", font=("Arial", 8))
+        self.status_label.pack(side=tk.RIGHT)
+
+        results_frame = ttk.Frame(self)
+        results_frame.pack(fill=tk.BOTH, expand=True)
+        self.results_list = tk.Listbox(results_frame, height=6, font=("Courier New", 9), activestyle='none')
+        self.results_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        results_bar = ttk.Scrollbar(results_frame, orient=tk.VERTICAL, command=self.results_list.yview)
+        results_bar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.results_list.config(yscrollcommand=results_bar.set)
+        self.results_list.bind("<<ListboxSelect>>", self.on_result_selected)
+
+        for variable in (self.query_text, self.since, self.until):
+            variable.trace_add('write', lambda *args: self.schedule_search())
+
+    def schedule_search(self):
+        if self._debounce_job is not None:
+            self.after_cancel(self._debounce_job)
+        self._debounce_job = self.after(SEARCH_DEBOUNCE_MS, self.start_search)
+
+    def cancel(self):
+        self._cancel.set()
+        self._search_id += 1
+
+    def reset(self):
+        """Drops the results of a previous file."""
+        self.cancel()
+        self.result_offsets = []
+        self.results_list.delete(0, tk.END)
+        self.status_label.config(text="")
+
+    def start_search(self):
+        self._debounce_job = None
+        self.reset()
+        path = self.viewer.path
+        if not path:
+            return
+        try:
+            query = LogQuery(self.query_text.get(), self.regex.get(), self.case_sensitive.get(),
+                             self.min_level.get(), self.since.get().strip(), self.until.get().strip())
+        except re.error as e:
+            self.status_label.config(text=f"Invalid regex: {e}")
+            return
+        if query.is_empty:
+            return
+        use_index = self.use_index.get()
+        self._cancel = threading.Event()
+        search_id = self._search_id
+        cancelled = self._cancel
+
+        def run():
+            try:
+                token_index = self._token_index_for(path) if use_index else None
+                search_log(path, query, lambda batch: self._results.put((search_id, 'results', batch)), cancelled,
+                           token_index, lambda stage, fraction: self._results.put((search_id, stage, fraction)))
+            except (OSError, ValueError) as e:
+                self._results.put((search_id, 'error', str(e)))
+            self._results.put((search_id, 'done', None))
+
+        self.status_label.config(text="Searching...")
+        self._worker = threading.Thread(target=run, daemon=True)
+        self._worker.start()
+        if self._poll_job is None:
+            self._poll_job = self.after(SEARCH_POLL_MS, self._poll_results)
+
+    def _token_index_for(self, path):
+        """The token index of path, loaded from its cache file on first use (on the worker thread)."""
+        with self._token_indexes_lock:
+            index = self._token_indexes.get(path)
+            if index is None or index.size > os.path.getsize(path):
+                with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    self._token_indexes[path] = TokenIndex.load(path, mm) or TokenIndex()
+            return self._token_indexes[path]
+
+    def _poll_results(self):
+        try:
+            while True:
+                search_id, kind, data = self._results.get_nowait()
+                if search_id != self._search_id:
+                    continue
+                if kind == 'results':
+                    self._add_results(data)
+                elif kind in ('indexing', 'searching'):
+                    self.status_label.config(text=f"{len(self.result_offsets)} matches ({kind} {data:.0%})")
+                elif kind == 'error':
+                    self.status_label.config(text=f"Search failed: {data}")
+                elif kind == 'done':
+                    limit = " (limit reached)" if len(self.result_offsets) >= MAX_SEARCH_RESULTS else ""
+                    self.status_label.config(text=f"{len(self.result_offsets)} matches{limit}")
+        except queue.Empty:
+            pass
+        running = self._worker.is_alive() or not self._results.empty()
+        self._poll_job = self.after(SEARCH_POLL_MS, self._poll_results) if running else None
+
+    def _add_results(self, batch):
+        index = self.viewer.index
+        for offset, line in batch:
+            number = index.line_at(offset) + 1 if offset < index.indexed_bytes else None
+            prefix = f"{number:>8}: " if number is not None else "       ?: "
+            self.results_list.insert(tk.END, prefix + line[:MAX_RESULT_LINE_CHARS])
+            self.result_offsets.append(offset)
+
+    def on_result_selected(self, event=None):
+        selection = self.results_list.curselection()
+        if not selection:
+            return
+        offset = self.result_offsets[selection[0]]
+        index = self.viewer.index
+        if offset < index.indexed_bytes:
+            self.viewer.jump_to_line(index.line_at(offset) + 1, highlight=True)
+        else:
+            self.bell()
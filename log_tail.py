@@ -0,0 +1,124 @@
+import os
+import threading
+import tkinter as tk
+
+# Lines kept in a log pane; older ones are dropped as new ones are appended.
+LOG_MAX_LINES = 10000
+LOG_POLL_INTERVAL_SECONDS = 0.5
+LOG_READ_CHUNK_BYTES = 1024 * 1024
+
+
+def _decode(line):
+    return line.decode('utf-8', errors='replace').rstrip('\r')
+
+
+def read_tail(path, max_lines=LOG_MAX_LINES, include_partial=True, chunk_size=LOG_READ_CHUNK_BYTES):
+    """Last max_lines lines of a file, read backwards in chunks, and the offset reading stopped at.
+
+    With include_partial=False an unterminated last line is left out and the
+    offset points at its start, so a follower picks it up once it is complete.
+    """
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        position = end
+        data = b''
+        while position > 0 and data.count(b'\n') <= max_lines:
+            step = min(chunk_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    if not include_partial and data and not data.endswith(b'\n'):
+        cut = data.rfind(b'\n') + 1
+        end -= len(data) - cut
+        data = data[:cut]
+    lines = data.splitlines()
+    if position > 0 and lines:
+        lines = lines[1:]  # Starts mid-line.
+    return [_decode(line) for line in lines[-max_lines:]], end
+
+
+class LogFollower:
+    """Background thread that reads what gets appended to a log file and hands over complete lines.
+
+    It remembers its offset and polls the file size, so only new bytes are read.
+    When the file is rotated (a new file appears under the same name) the rest of
+    the old file is read before switching to the new one from the start; when it
+    is truncated in place, reading restarts at the beginning.
+    on_lines(lines) is called from the follower thread.
+    """
+
+    def __init__(self, path, offset, on_lines, max_lines=LOG_MAX_LINES, interval=LOG_POLL_INTERVAL_SECONDS):
+        self.path = path
+        self.offset = offset
+        self.on_lines = on_lines
+        self.max_lines = max_lines
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._partial = b''
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        f = None
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    status = os.stat(self.path)
+                except OSError:
+                    continue  # Rotated away and not recreated yet.
+                if f is None:
+                    f = open(self.path, 'rb')
+                elif os.fstat(f.fileno()).st_ino != status.st_ino:
+                    self._read_new(f)
+                    f.close()
+                    f = open(self.path, 'rb')
+                    self.offset = 0
+                    self._partial = b''
+                elif status.st_size < self.offset:
+                    self.offset = 0
+                    self._partial = b''
+                self._read_new(f)
+        finally:
+            if f is not None:
+                f.close()
+
+    def _read_new(self, f):
+        f.seek(self.offset)
+        while not self._stop.is_set():
+            data = f.read(LOG_READ_CHUNK_BYTES)
+            if not data:
+                return
+            self.offset += len(data)
+            data = self._partial + data
+            cut = data.rfind(b'\n') + 1
+            self._partial = data[cut:]
+            if cut:
+                lines = data[:cut].splitlines()[-self.max_lines:]
+                self.on_lines([_decode(line) for line in lines])
+
+
+def append_log_lines(text_widget, lines, max_lines=LOG_MAX_LINES):
+    """Appends lines to a log Text widget, dropping the oldest beyond max_lines.
+
+    The view keeps following the end only if it was already showing it.
+    """
+    if not lines:
+        return
+    at_end = text_widget.yview()[1] >= 1.0
+    text_widget.config(state='normal')
+    if text_widget.compare("end-1c", "!=", "1.0"):
+        text_widget.insert(tk.END, "\n")
+    text_widget.insert(tk.END, "\n".join(lines))
+    line_count = int(text_widget.index("end-1c").split('.')[0])
+    if line_count > max_lines:
+        text_widget.delete("1.0", f"{line_count - max_lines + 1}.0")
+    text_widget.config(state='disabled')
+    if at_end:
+        text_widget.see(tk.END)
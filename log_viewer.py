@@ -0,0 +1,362 @@
+import array
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import sys
+import threading
+import tkinter as tk
+from tkinter import font as tkfont
+from tkinter import ttk
+
+INDEX_SUFFIX = ".lineidx"
+INDEX_VERSION = 1
+INDEX_CHUNK_BYTES = 4 * 1024 * 1024
+# Bytes before the indexed end that must be unchanged for a cached index to be reused.
+INDEX_CHECK_BYTES = 4096
+# Lines longer than this are cut in the view; the file itself is never loaded whole.
+MAX_DISPLAY_LINE_BYTES = 4096
+BUILD_POLL_MS = 200
+FOLLOW_POLL_MS = 500
+
+
+def index_cache_path(path):
+    return path + INDEX_SUFFIX
+
+
+def tail_digest(mm, end):
+    return hashlib.sha1(mm[max(0, end - INDEX_CHECK_BYTES):end]).hexdigest()
+
+
+class LineIndex:
+    """Byte offsets of the line starts of a file, built a chunk at a time.
+
+    Readers on other threads may use it while it grows: offsets are only ever
+    appended, and indexed_bytes moves forward after each chunk.
+    """
+
+    def __init__(self, offsets=None, indexed_bytes=0):
+        self.offsets = offsets if offsets is not None else array.array('Q', [0])
+        self.indexed_bytes = indexed_bytes
+
+    @property
+    def line_count(self):
+        if not self.indexed_bytes:
+            return 0
+        # A final newline leaves a line start at indexed_bytes that has no line yet.
+        return len(self.offsets) - (1 if self.offsets[-1] >= self.indexed_bytes else 0)
+
+    def line_span(self, number):
+        """(start, end) byte offsets of a 0-based line, without its newline."""
+        start = self.offsets[number]
+        if number + 1 < len(self.offsets):
+            return start, self.offsets[number + 1] - 1
+        return start, self.indexed_bytes
+
+    def line_at(self, offset):
+        """0-based number of the line containing a byte offset."""
+        return bisect.bisect_right(self.offsets, offset) - 1
+
+    def scan(self, mm, end, cancelled=None):
+        """Indexes mm from indexed_bytes up to end; returns False if cancelled first."""
+        position = self.indexed_bytes
+        find = mm.find
+        while position < end:
+            if cancelled is not None and cancelled.is_set():
+                return False
+            chunk_end = min(end, position + INDEX_CHUNK_BYTES)
+            starts = array.array('Q')
+            newline = find(b'\n', position, chunk_end)
+            while newline >= 0:
+                starts.append(newline + 1)
+                newline = find(b'\n', newline + 1, chunk_end)
+            self.offsets.extend(starts)
+            position = chunk_end
+            self.indexed_bytes = position
+        return True
+
+
+def load_cached_index(path, mm):
+    """The index cached next to path if it still describes the file (which may have grown since), else None."""
+    try:
+        with open(index_cache_path(path), 'rb') as f:
+            header = json.loads(f.readline())
+            offsets = array.array('Q')
+            offsets.frombytes(f.read())
+    except (OSError, ValueError):
+        return None
+    size = header.get('size', -1)
+    if (header.get('version') != INDEX_VERSION or mm is None or not 0 < size <= len(mm)
+            or header.get('count') != len(offsets) or header.get('check') != tail_digest(mm, size)):
+        return None
+    if header.get('byteorder') != sys.byteorder:
+        offsets.byteswap()
+    return LineIndex(offsets, size)
+
+
+def save_index(path, index, mm):
+    """Writes the index next to the file (write-then-rename); a read-only directory just means no cache."""
+    size = index.indexed_bytes
+    offsets = index.offsets[:]
+    header = {'version': INDEX_VERSION, 'size': size, 'count': len(offsets), 'byteorder': sys.byteorder,
+              'check': tail_digest(mm, size)}
+    tmp_path = index_cache_path(path) + ".tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps(header).encode('utf-8') + b"\n")
+            f.write(offsets.tobytes())
+        os.replace(tmp_path, index_cache_path(path))
+    except OSError as e:
+        print(f"Warning: Could not cache the line index of {path}: {e}")
+
+
+def _build_index(path, index, size, cancelled, save):
+    try:
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            if index.scan(mm, size, cancelled) and save:
+                save_index(path, index, mm)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not index {path}: {e}")
+
+
+class LogViewer(ttk.Frame):
+    """Log pane for files of any size: memory-mapped, line-indexed, rendering only the visible lines.
+
+    The line index is built by a background thread and cached next to the file
+    (<file>.lineidx), so reopening the same log needs no scan at all, and a log
+    that has grown since only has its new bytes indexed. The view sticks to the
+    end of the file until the user scrolls away from it; in follow mode the file
+    is polled and appended lines show up as they are indexed.
+    """
+
+    def __init__(self, parent, font=("Courier New", 9), background="#F8F8F8"):
+        super().__init__(parent)
+        self.path = None
+        self.index = LineIndex()
+        self.top = 0
+        self.follow = False
+        self.highlight_line = None
+        self._file = None
+        self._mm = None
+        self._size = 0
+        self._inode = None
+        self._saved_bytes = 0
+        self._stick_to_end = True
+        self._builder = None
+        self._builder_saves = False
+        self._cancel_build = threading.Event()
+        self._build_job = None
+        self._follow_job = None
+
+        toolbar = ttk.Frame(self)
+        toolbar.grid(row=0, column=0, columnspan=2, sticky=tk.EW, pady=(0, 2))
+        ttk.Label(toolbar, text="Go to line or %:").pack(side=tk.LEFT)
+        self.jump_entry = ttk.Entry(toolbar, width=10)
+        self.jump_entry.pack(side=tk.LEFT, padx=(5, 5))
+        self.jump_entry.bind("<Return>", lambda event: self.jump_from_entry())
+        self.jump_button = ttk.Button(toolbar, text="Go", width=4, command=self.jump_from_entry)
+        self.jump_button.pack(side=tk.LEFT)
+        self.position_label = ttk.Label(toolbar, text="", font=("Arial", 8))
+        self.position_label.pack(side=tk.RIGHT)
+
+        self.text = tk.Text(self, wrap=tk.NONE, state='disabled', font=font, bg=background, height=1)
+        self._linespace = tkfont.Font(font=font).metrics('linespace')
+        self.text.grid(row=1, column=0, sticky=tk.NSEW)
+        self.text.tag_config("highlight_tag", background="#FFF3A0")
+        self.vbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.vbar.grid(row=1, column=1, sticky=tk.NS)
+        self.hbar = ttk.Scrollbar(self, orient=tk.HORIZONTAL, command=self.text.xview)
+        self.hbar.grid(row=2, column=0, sticky=tk.EW)
+        self.text.config(xscrollcommand=self.hbar.set)
+        self.rowconfigure(1, weight=1)
+        self.columnconfigure(0, weight=1)
+
+        self.text.bind("<Configure>", lambda event: self.render())
+        self.text.bind("<MouseWheel>", lambda event: self.scroll(-3 if event.delta > 0 else 3))
+        self.text.bind("<Button-4>", lambda event: self.scroll(-3))
+        self.text.bind("<Button-5>", lambda event: self.scroll(3))
+        self.text.bind("<Prior>", lambda event: self.scroll(-self.visible_rows()))
+        self.text.bind("<Next>", lambda event: self.scroll(self.visible_rows()))
+        self.text.bind("<Control-Home>", lambda event: self.jump_to_line(1))
+        self.text.bind("<Control-End>", lambda event: self.scroll_to_end())
+
+    # --- Opening and closing ---
+
+    def open(self, path):
+        """Maps the file and shows its end; the line index comes from the cache or is built in the background."""
+        self.close()
+        self.path = path
+        self._file = open(path, 'rb')
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._map()
+        self.index = load_cached_index(path, self._mm) or LineIndex()
+        self._saved_bytes = self.index.indexed_bytes
+        self.top = 0
+        self.highlight_line = None
+        self._stick_to_end = True
+        self._index_new_bytes(save=True)
+        self.render()
+        if self.follow:
+            self._schedule_follow()
+
+    def close(self):
+        """Stops indexing and following, caching whatever index was completed since the last save."""
+        self._cancel_build.set()
+        for job in (self._build_job, self._follow_job):
+            if job is not None:
+                self.after_cancel(job)
+        self._build_job = self._follow_job = None
+        building = self._builder is not None and self._builder.is_alive()
+        if self._mm is not None and not building and self.index.indexed_bytes > self._saved_bytes:
+            save_index(self.path, self.index, self._mm)
+        if self._mm is not None:
+            self._mm.close()
+        if self._file is not None:
+            self._file.close()
+        self._mm = self._file = self._builder = None
+        self.path = None
+        self._size = 0
+        self.index = LineIndex()
+        self.render()
+
+    def _map(self):
+        size = os.fstat(self._file.fileno()).st_size
+        if self._mm is not None:
+            self._mm.close()
+        # An empty file cannot be mapped; it simply has no lines yet.
+        self._mm = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ) if size else None
+        self._size = size
+
+    def _index_new_bytes(self, save):
+        if self.index.indexed_bytes >= self._size:
+            return
+        self._cancel_build = threading.Event()
+        self._builder = threading.Thread(target=_build_index, daemon=True,
+                                         args=(self.path, self.index, self._size, self._cancel_build, save))
+        self._builder_saves = save
+        self._builder.start()
+        if self._build_job is None:
+            self._build_job = self.after(BUILD_POLL_MS, self._poll_build)
+
+    def _poll_build(self):
+        building = self._builder is not None and self._builder.is_alive()
+        if not building and self._builder_saves:
+            self._saved_bytes = self.index.indexed_bytes
+        self.render()
+        self._build_job = self.after(BUILD_POLL_MS, self._poll_build) if building else None
+
+    # --- Follow mode ---
+
+    def set_follow(self, enabled):
+        self.follow = enabled
+        if enabled and self.path and self._follow_job is None:
+            self._schedule_follow()
+
+    def _schedule_follow(self):
+        self._follow_job = self.after(FOLLOW_POLL_MS, self._poll_file)
+
+    def _poll_file(self):
+        self._follow_job = None
+        if not self.follow or not self.path:
+            return
+        try:
+            status = os.stat(self.path)
+        except OSError:
+            status = None  # Rotated away and not recreated yet.
+        if status is not None:
+            if status.st_ino != self._inode or status.st_size < self._size:
+                # Rotated or truncated: start over on whatever is there now.
+                self.open(self.path)
+                return
+            building = self._builder is not None and self._builder.is_alive()
+            if status.st_size > self._size and not building:
+                self._map()
+                self._index_new_bytes(save=False)
+        self._schedule_follow()
+
+    # --- Rendering and navigation ---
+
+    @property
+    def line_count(self):
+        return self.index.line_count
+
+    def visible_rows(self):
+        return max(1, self.text.winfo_height() // self._linespace)
+
+    def render(self):
+        rows = self.visible_rows()
+        count = self.line_count
+        if self._stick_to_end:
+            self.top = max(0, count - rows)
+        self.top = max(0, min(self.top, max(0, count - rows)))
+        end = min(count, self.top + rows)
+        lines = []
+        if self._mm is not None:
+            for number in range(self.top, end):
+                start, stop = self.index.line_span(number)
+                lines.append(self._mm[start:min(stop, start + MAX_DISPLAY_LINE_BYTES)].decode('utf-8', errors='replace').rstrip('\r'))
+        self.text.config(state='normal')
+        self.text.delete("1.0", tk.END)
+        self.text.insert(tk.END, "\n".join(lines))
+        if self.highlight_line is not None and self.top <= self.highlight_line < end:
+            row = self.highlight_line - self.top + 1
+            self.text.tag_add("highlight_tag", f"{row}.0", f"{row}.end")
+        self.text.config(state='disabled')
+        if count:
+            self.vbar.set(self.top / count, end / count)
+        else:
+            self.vbar.set(0.0, 1.0)
+        self._update_position_label(end, count)
+
+    def _update_position_label(self, end, count):
+        if not self.path:
+            self.position_label.config(text="")
+            return
+        text = f"Lines {self.top + 1 if count else 0:,}-{end:,} of {count:,}"
+        if self._builder is not None and self._builder.is_alive() and self._size:
+            text += f" (indexing {100 * self.index.indexed_bytes // self._size}%)"
+        elif self.follow:
+            text += " (following)"
+        self.position_label.config(text=text)
+
+    def scroll(self, lines):
+        self.top = max(0, self.top + lines)
+        self._stick_to_end = self.top + self.visible_rows() >= self.line_count
+        self.render()
+        return "break"
+
+    def scroll_to_end(self):
+        self._stick_to_end = True
+        self.render()
+        return "break"
+
+    def jump_to_line(self, number, highlight=False):
+        """Shows a 1-based line at the top of the view, optionally highlighting it."""
+        self.top = max(0, number - 1)
+        self.highlight_line = number - 1 if highlight else None
+        self._stick_to_end = False
+        self.render()
+        return "break"
+
+    def jump_to_fraction(self, fraction):
+        self.jump_to_line(int(self.line_count * max(0.0, min(1.0, fraction))) + 1)
+
+    def jump_from_entry(self):
+        target = self.jump_entry.get().strip()
+        try:
+            if target.endswith('%'):
+                self.jump_to_fraction(float(target[:-1]) / 100.0)
+            else:
+                self.jump_to_line(int(target), highlight=True)
+        except ValueError:
+            self.bell()
+
+    def _on_scrollbar(self, *args):
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * self.line_count)
+            self._stick_to_end = self.top + self.visible_rows() >= self.line_count
+            self.render()
+        elif args[0] == 'scroll':
+            step = int(args[1]) * (self.visible_rows() if args[2] == 'pages' else 1)
+            self.scroll(step)
@@ -0,0 +1,356 @@
+"""Stand-in Ollama server for deterministic performance tests without a GPU.
+
+Speaks enough of the Ollama HTTP API for the GUIs, the batch runner and the
+checker: /api/chat and /api/generate (NDJSON streaming or single response),
+/api/tags, /api/ps, /api/show, /api/embeddings and /api/embed. Token rate,
+first-token delay, model load time, parallelism and error injection are
+configurable, and replies can be scripted with regex rules:
+
+    python3 mock_ollama_server.py --port 11435 --token-rate 80 --first-token-delay 0.3
+    OLLAMA_HOST=http://127.0.0.1:11435 python3 ollama-hello-world-gemini.py
+
+A scripts file is a JSON list of {"match": "<regex on the last user message>",
+"response": "<reply text>", "model": "<optional model name>"}; the first
+matching rule wins.
+"""
+import argparse
+import datetime
+import hashlib
+import http.server
+import json
+import random
+import re
+import sys
+import threading
+import time
+
+from model_registry import keep_alive_seconds
+from response_cache import replay_chunks
+
+DEFAULT_MODELS = ['llama3.1:8b', 'mistral:7b', 'nomic-embed-text:latest']
+EMBEDDING_DIMENSIONS = 64
+
+
+class MockSettings:
+    def __init__(self, models=None, token_rate=50.0, first_token_delay=0.2, load_delay=1.0,
+                 response_tokens=60, error_rate=0.0, midstream_error_rate=0.0, max_parallel=0,
+                 context_length=8192, scripts=None, seed=None):
+        self.models = list(models or DEFAULT_MODELS)
+        self.token_rate = token_rate
+        self.first_token_delay = first_token_delay
+        self.load_delay = load_delay
+        self.response_tokens = response_tokens
+        self.error_rate = error_rate
+        self.midstream_error_rate = midstream_error_rate
+        self.max_parallel = max_parallel
+        self.context_length = context_length
+        self.scripts = [dict(rule, pattern=re.compile(rule.get('match', ''), re.IGNORECASE)) for rule in scripts or []]
+        self.seed = seed
+
+
+def _now_iso():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+class MockOllamaServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, settings):
+        super().__init__(address, MockOllamaHandler)
+        self.settings = settings
+        self.random = random.Random(settings.seed)
+        self.random_lock = threading.Lock()
+        self.loaded = {}  # model -> expiry (monotonic seconds)
+        self.loaded_lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(settings.max_parallel) if settings.max_parallel else None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serves on a daemon thread and returns self, for use from benchmarks and scripts."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def roll(self, probability):
+        if probability <= 0:
+            return False
+        with self.random_lock:
+            return self.random.random() < probability
+
+    def load_model(self, model, keep_alive):
+        """Simulated model load; returns the load time in seconds (0 when already resident)."""
+        with self.loaded_lock:
+            now = time.monotonic()
+            expiry = self.loaded.get(model, 0)
+            was_loaded = expiry > now
+            if keep_alive == 0:
+                self.loaded.pop(model, None)
+                return 0.0
+            self.loaded[model] = now + keep_alive_seconds(keep_alive)
+        if was_loaded:
+            return 0.0
+        time.sleep(self.settings.load_delay)
+        return self.settings.load_delay
+
+    def reply_for(self, model, text):
+        for rule in self.settings.scripts:
+            if rule.get('model') not in (None, model):
+                continue
+            if rule['pattern'].search(text):
+                return rule['response']
+        words = ["mock", "reply", "from", model, "to:"] + text.split()
+        filler = "lorem ipsum dolor sit amet consectetur adipiscing elit".split()
+        while len(words) < self.settings.response_tokens:
+            words.append(filler[len(words) % len(filler)])
+        return " ".join(words[:max(self.settings.response_tokens, 1)]) + "."
+
+
+def embedding_for(text, dimensions=EMBEDDING_DIMENSIONS):
+    """Deterministic unit-length pseudo-embedding built from hashed word features."""
+    vector = [0.0] * dimensions
+    for word in re.findall(r'\w+', text.lower()):
+        digest = hashlib.md5(word.encode('utf-8')).digest()
+        vector[digest[0] % dimensions] += 1.0 if digest[1] % 2 else -1.0
+    norm = sum(v * v for v in vector) ** 0.5 or 1.0
+    return [v / norm for v in vector]
+
+
+class MockOllamaHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'MockOllama/0.1'
+    # Stream chunks are tiny; without TCP_NODELAY, Nagle's algorithm adds ~40 ms to each one.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- Plumbing ---
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        return json.loads(body or b'{}')
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def _send_chunk(self, payload):
+        data = (json.dumps(payload) + "\n").encode('utf-8')
+        self.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _check_model(self, model):
+        if model not in self.server.settings.models:
+            self._send_json({'error': f"model '{model}' not found, try pulling it first"}, status=404)
+            return False
+        return True
+
+    # --- Routes ---
+
+    def do_GET(self):
+        if self.path == '/api/tags':
+            self._send_json({'models': [self._model_entry(m) for m in self.server.settings.models]})
+        elif self.path == '/api/ps':
+            now = time.monotonic()
+            with self.server.loaded_lock:
+                loaded = [m for m, expiry in self.server.loaded.items() if expiry > now]
+            self._send_json({'models': [self._model_entry(m) for m in loaded]})
+        elif self.path == '/api/version':
+            self._send_json({'version': '0.0.0-mock'})
+        elif self.path == '/':
+            body = b"Ollama is running"
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        try:
+            request = self._read_json()
+        except json.JSONDecodeError as e:
+            self._send_json({'error': f"invalid JSON: {e}"}, status=400)
+            return
+        routes = {
+            '/api/chat': self._chat,
+            '/api/generate': self._generate,
+            '/api/show': self._show,
+            '/api/embeddings': self._embeddings,
+            '/api/embed': self._embed,
+        }
+        route = routes.get(self.path)
+        if route is None:
+            self._send_json({'error': 'not found'}, status=404)
+            return
+        try:
+            route(request)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client went away (for example a cancelled generation).
+
+    def _model_entry(self, model):
+        digest = hashlib.sha256(model.encode('utf-8')).hexdigest()
+        return {
+            'name': model, 'model': model, 'modified_at': _now_iso(), 'size': 4_000_000_000, 'digest': digest,
+            'details': {'format': 'gguf', 'family': model.split(':')[0], 'parameter_size': '8B',
+                        'quantization_level': 'Q4_0'},
+        }
+
+    def _show(self, request):
+        model = request.get('model') or request.get('name')
+        if self._check_model(model):
+            family = model.split(':')[0]
+            self._send_json({'details': self._model_entry(model)['details'],
+                             'model_info': {f"{family}.context_length": self.server.settings.context_length}})
+
+    def _embeddings(self, request):
+        if self._check_model(request.get('model')):
+            self._send_json({'embedding': embedding_for(request.get('prompt', ''))})
+
+    def _embed(self, request):
+        if self._check_model(request.get('model')):
+            inputs = request.get('input', '')
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            self._send_json({'model': request['model'], 'embeddings': [embedding_for(t) for t in inputs]})
+
+    def _chat(self, request):
+        messages = request.get('messages') or []
+        last_user = next((m.get('content', '') for m in reversed(messages) if m.get('role') == 'user'), '')
+        prompt_text = "".join(m.get('content', '') for m in messages)
+        self._complete(request, last_user, prompt_text,
+                       lambda token, done: {'message': {'role': 'assistant', 'content': token}})
+
+    def _generate(self, request):
+        prompt = request.get('prompt', '')
+        self._complete(request, prompt, prompt, lambda token, done: {'response': token})
+
+    def _complete(self, request, text, prompt_text, body):
+        model = request.get('model')
+        if not self._check_model(model):
+            return
+        settings = self.server.settings
+        if self.server.roll(settings.error_rate):
+            self._send_json({'error': 'injected failure'}, status=500)
+            return
+        if self.server.slots:
+            self.server.slots.acquire()
+        try:
+            self._run_completion(request, model, text, prompt_text, body)
+        finally:
+            if self.server.slots:
+                self.server.slots.release()
+
+    def _run_completion(self, request, model, text, prompt_text, body):
+        settings = self.server.settings
+        started = time.monotonic()
+        load_time = self.server.load_model(model, request.get('keep_alive'))
+        stream = request.get('stream', True)
+        if not text:
+            # An empty prompt only loads (or, with keep_alive=0, unloads) the model.
+            final = dict(body('', True), model=model, created_at=_now_iso(), done=True,
+                         done_reason='unload' if request.get('keep_alive') == 0 else 'load')
+            self._send_json(final)
+            return
+
+        tokens = replay_chunks(self.server.reply_for(model, text))
+        prompt_eval_count = max(1, len(prompt_text) // 4)
+        time.sleep(settings.first_token_delay)
+        prompt_done = time.monotonic()
+        fail_at = None
+        if self.server.roll(settings.midstream_error_rate):
+            fail_at = len(tokens) // 2
+
+        interval = 1.0 / settings.token_rate if settings.token_rate > 0 else 0.0
+        if stream:
+            self._start_stream()
+        next_at = time.monotonic()
+        for i, token in enumerate(tokens):
+            if i == fail_at:
+                # Drop the connection mid-stream, as a crashed or restarted server would.
+                self.close_connection = True
+                return
+            if stream:
+                self._send_chunk(dict(body(token, False), model=model, created_at=_now_iso(), done=False))
+            next_at += interval
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        finished = time.monotonic()
+        final = dict(body('' if stream else ''.join(tokens), True), model=model, created_at=_now_iso(), done=True,
+                     done_reason='stop',
+                     total_duration=int((finished - started) * 1e9),
+                     load_duration=int(load_time * 1e9),
+                     prompt_eval_count=prompt_eval_count,
+                     prompt_eval_duration=int((prompt_done - started - load_time) * 1e9),
+                     eval_count=len(tokens),
+                     eval_duration=int((finished - prompt_done) * 1e9))
+        if stream:
+            self._send_chunk(final)
+            self._end_stream()
+        else:
+            self._send_json(final)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a mock Ollama server for performance testing.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--models', nargs='+', default=DEFAULT_MODELS)
+    parser.add_argument('--token-rate', type=float, default=50.0, help="tokens per second per stream (0 = no delay)")
+    parser.add_argument('--first-token-delay', type=float, default=0.2, help="simulated prompt eval time in seconds")
+    parser.add_argument('--load-delay', type=float, default=1.0, help="simulated model load time in seconds")
+    parser.add_argument('--response-tokens', type=int, default=60, help="length of unscripted replies in words")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="probability a request fails with HTTP 500")
+    parser.add_argument('--midstream-error-rate', type=float, default=0.0,
+                        help="probability a stream is cut off halfway")
+    parser.add_argument('--max-parallel', type=int, default=0, help="concurrent generations (0 = unlimited)")
+    parser.add_argument('--context-length', type=int, default=8192)
+    parser.add_argument('--scripts', help="JSON file of scripted replies")
+    parser.add_argument('--seed', type=int, default=None, help="seed for error injection")
+    args = parser.parse_args(argv)
+
+    scripts = None
+    if args.scripts:
+        with open(args.scripts, 'r', encoding='utf-8') as f:
+            scripts = json.load(f)
+    settings = MockSettings(models=args.models, token_rate=args.token_rate, first_token_delay=args.first_token_delay,
+                            load_delay=args.load_delay, response_tokens=args.response_tokens,
+                            error_rate=args.error_rate, midstream_error_rate=args.midstream_error_rate,
+                            max_parallel=args.max_parallel, context_length=args.context_length,
+                            scripts=scripts, seed=args.seed)
+    server = MockOllamaServer((args.host, args.port), settings)
+    print(f"Mock Ollama listening on {server.url} (models: {', '.join(settings.models)})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
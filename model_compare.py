@@ -0,0 +1,206 @@
+import itertools
+import queue
+import time
+import tkinter as tk
+from tkinter import messagebox, scrolledtext, ttk
+
+from chat_engine import chat_stream
+from chat_metrics import request_metrics
+from chat_streaming import StreamAccumulator
+
+COMPARE_POLL_MS = 50
+
+
+class ComparePane(ttk.Frame):
+    """One model's answer in the compare window, with its time to first token and speed updated live."""
+
+    def __init__(self, parent, model, host):
+        super().__init__(parent, padding="2")
+        self.model = model
+        ttk.Label(self, text=f"{model} @ {host}", font=("Arial", 10, "bold")).pack(side=tk.TOP, anchor=tk.W)
+        self.stats_label = ttk.Label(self, text="Waiting for its host...", font=("Arial", 8))
+        self.stats_label.pack(side=tk.TOP, anchor=tk.W)
+        self.text = scrolledtext.ScrolledText(self, wrap=tk.WORD, state='disabled', width=40)
+        self.text.pack(fill=tk.BOTH, expand=True)
+        self.started_at = None
+        self.first_token_at = None
+        self.tokens = 0
+        self.finished = False
+
+    def start(self, started_at):
+        self.started_at = started_at
+        self.stats_label.config(text="Waiting for the first token...")
+
+    def append(self, tokens, first_received_at):
+        if self.first_token_at is None:
+            self.first_token_at = first_received_at
+        self.tokens += len(tokens)
+        self.text.config(state='normal')
+        self.text.insert(tk.END, "".join(tokens))
+        self.text.config(state='disabled')
+        self.text.see(tk.END)
+
+    def refresh(self, now):
+        """Live stats while streaming: each streamed chunk is one token."""
+        if self.finished or self.first_token_at is None:
+            return
+        elapsed = now - self.first_token_at
+        rate = f"{self.tokens / elapsed:.1f} tok/s" if elapsed > 0 else "-"
+        self.stats_label.config(text=f"First token {self.first_token_at - self.started_at:.2f} s | {rate} | {self.tokens} tokens")
+
+    def finish(self, metrics):
+        self.finished = True
+        parts = []
+        if metrics.get('time_to_first_token') is not None:
+            parts.append(f"First token {metrics['time_to_first_token']:.2f} s")
+        if metrics.get('eval_tokens_per_sec') is not None:
+            parts.append(f"{metrics['eval_tokens_per_sec']:.1f} tok/s")
+        if metrics.get('eval_count') is not None:
+            parts.append(f"{metrics['eval_count']} tokens")
+        if metrics.get('load_duration'):
+            parts.append(f"load {metrics['load_duration']:.2f} s")
+        self.stats_label.config(text=" | ".join(parts) or "Done.")
+
+    def fail(self, message):
+        self.finished = True
+        self.stats_label.config(text=f"Error: {message}")
+
+
+class ModelCompareWindow(tk.Toplevel):
+    """Sends one prompt to several models at once and streams each answer into its own pane.
+
+    The models are split per host by the endpoint pool's plan(): the models
+    planned for one host run one after another, so they do not fight over its
+    VRAM, while different hosts run in parallel. Each host group is a single
+    request on the chat engine.
+    """
+
+    _runs = itertools.count(1)
+
+    def __init__(self, parent, engine, pool, models, selected=(), prompt="", system_prompt="", temperature=0.7):
+        super().__init__(parent)
+        self.title("Compare Models")
+        self.geometry("1200x700")
+        self.engine = engine
+        self.pool = pool
+        self.models = list(models)
+        self.system_prompt = system_prompt
+        self.temperature = temperature
+        self.panes = {}
+        self.tasks = []
+        self.run_id = None
+        self._events = queue.Queue()
+
+        controls = ttk.Frame(self, padding="5")
+        controls.pack(fill=tk.X)
+        ttk.Label(controls, text="Models:").pack(side=tk.LEFT, anchor=tk.N)
+        self.model_list = tk.Listbox(controls, selectmode=tk.MULTIPLE, exportselection=False, height=5, width=30)
+        self.model_list.pack(side=tk.LEFT, padx=(5, 10))
+        for number, model in enumerate(self.models):
+            self.model_list.insert(tk.END, model)
+            if model in selected:
+                self.model_list.selection_set(number)
+        self.prompt_input = tk.Text(controls, height=5, wrap=tk.WORD)
+        self.prompt_input.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.prompt_input.insert("1.0", prompt)
+        self.run_button = ttk.Button(controls, text="Compare", command=self.run)
+        self.run_button.pack(side=tk.LEFT, padx=(10, 0), anchor=tk.N)
+
+        self.panes_frame = ttk.PanedWindow(self, orient=tk.HORIZONTAL)
+        self.panes_frame.pack(fill=tk.BOTH, expand=True, padx=5)
+        self.status_label = ttk.Label(self, text="Pick the models to compare and press Compare.", anchor=tk.W)
+        self.status_label.pack(fill=tk.X, padx=5, pady=(2, 5))
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        self._poll_job = self.after(COMPARE_POLL_MS, self._poll_events)
+
+    def run(self):
+        models = [self.models[i] for i in self.model_list.curselection()]
+        prompt = self.prompt_input.get("1.0", tk.END).strip()
+        if not models or not prompt:
+            messagebox.showwarning("Compare Models", "Select at least one model and type a prompt.", parent=self)
+            return
+        self.cancel()
+        for pane in self.panes.values():
+            self.panes_frame.forget(pane)
+            pane.destroy()
+        self.panes = {}
+
+        messages = [{'role': 'system', 'content': self.system_prompt}] if self.system_prompt else []
+        messages.append({'role': 'user', 'content': prompt})
+        options = {'temperature': self.temperature}
+        plan = self.pool.plan(models)
+        self.run_id = run_id = next(self._runs)
+        for endpoint, group in plan:
+            for model in group:
+                self.panes[model] = ComparePane(self.panes_frame, model, endpoint.name)
+        for model in models:
+            self.panes_frame.add(self.panes[model], weight=1)
+        for endpoint, group in plan:
+            self.tasks.append(self.engine.submit(
+                f"compare-{run_id}-{endpoint.name}",
+                lambda client, endpoint=endpoint, group=group: self._run_group(
+                    self._client_for(client, endpoint), group, messages, options, run_id)))
+        self.status_label.config(text=f"Comparing {len(models)} models on {len(plan)} host(s)...")
+
+    @staticmethod
+    def _client_for(client, endpoint):
+        # Pool clients can be pinned to the planned host; a cassette client has only one "host".
+        pinned = getattr(client, 'pinned', None)
+        return pinned(endpoint) if pinned is not None else client
+
+    async def _run_group(self, client, models, messages, options, run_id):
+        for model in models:
+            accumulator = StreamAccumulator()
+            self._events.put((run_id, 'start', model, accumulator.started_at))
+            last_chunk = None
+            try:
+                async for chunk in chat_stream(client, model=model, messages=messages, options=options):
+                    last_chunk = chunk
+                    token = chunk['message']['content']
+                    if token:
+                        accumulator.append(token)
+                        self._events.put((run_id, 'token', model, (token, time.monotonic())))
+                self._events.put((run_id, 'done', model, request_metrics(model, last_chunk, accumulator.stats())))
+            except Exception as e:
+                self._events.put((run_id, 'error', model, str(e)))
+
+    def _poll_events(self):
+        # Tokens are gathered per pane and inserted once per tick, however many models are streaming.
+        tokens = {}
+        try:
+            while True:
+                run_id, kind, model, data = self._events.get_nowait()
+                pane = self.panes.get(model)
+                if run_id != self.run_id or pane is None:
+                    continue  # Left over from an earlier run.
+                if kind == 'token':
+                    tokens.setdefault(pane, ([], data[1]))[0].append(data[0])
+                    continue
+                if pane in tokens:
+                    pane.append(*tokens.pop(pane))
+                if kind == 'start':
+                    pane.start(data)
+                elif kind == 'done':
+                    pane.finish(data)
+                elif kind == 'error':
+                    pane.fail(data)
+        except queue.Empty:
+            pass
+        for pane, (texts, first_received_at) in tokens.items():
+            pane.append(texts, first_received_at)
+        now = time.monotonic()
+        for pane in self.panes.values():
+            pane.refresh(now)
+        if self.panes and all(pane.finished for pane in self.panes.values()):
+            self.status_label.config(text=f"Compared {len(self.panes)} models.")
+        self._poll_job = self.after(COMPARE_POLL_MS, self._poll_events)
+
+    def cancel(self):
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+
+    def close(self):
+        self.cancel()
+        self.after_cancel(self._poll_job)
+        self.destroy()
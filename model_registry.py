@@ -0,0 +1,263 @@
+import json
+import threading
+import time
+
+import ollama
+
+from chat_streaming import response_field
+from state_store import shared_state_store
+
+MODEL_CACHE_FILE = "models_cache.json"
+MODEL_CACHE_TTL_SECONDS = 300
+
+# keep_alive values handed to Ollama: frequently used models stay resident longer.
+KEEP_ALIVE_DEFAULT = "5m"
+KEEP_ALIVE_FREQUENT = "30m"
+FREQUENT_USE_COUNT = 5
+# Past uses count for half as much after this long, so a model that stops being used stops being "frequent".
+USAGE_HALF_LIFE_SECONDS = 7 * 24 * 3600
+# A request whose load_duration exceeds this paid for loading the model (a cold start).
+COLD_LOAD_SECONDS = 0.5
+
+
+class ModelRegistry:
+    """Discovers the models installed in Ollama off the UI thread and caches them on disk.
+
+    The cache file holds the last known model list with a timestamp plus per-model
+    metadata (size, family, parameter size, quantization, context length). Metadata
+    is keyed by digest, so `ollama show` is only called for models that are new or
+    were re-pulled since the last refresh. The file is written through the
+    app's StateStore.
+    """
+
+    def __init__(self, path=MODEL_CACHE_FILE, ttl=MODEL_CACHE_TTL_SECONDS, client=ollama, store=None):
+        self.path = path
+        self.ttl = ttl
+        self.client = client
+        self.store = store if store is not None else shared_state_store()
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._data = self._read_cache()
+
+    def _read_cache(self):
+        try:
+            data = self.store.read(self.path)
+            if isinstance(data, dict):
+                return data
+        except (OSError, json.JSONDecodeError):
+            pass
+        return {'fetched_at': 0, 'models': [], 'metadata': {}}
+
+    def cached_names(self):
+        with self._lock:
+            return list(self._data.get('models', []))
+
+    def is_fresh(self):
+        with self._lock:
+            return bool(self._data.get('models')) and time.time() - self._data.get('fetched_at', 0) < self.ttl
+
+    def metadata(self, name):
+        with self._lock:
+            return dict(self._data.get('metadata', {}).get(name, {}))
+
+    def context_length(self, name):
+        return self.metadata(name).get('context_length')
+
+    def refresh(self, on_done):
+        """Fetches the model list on a background thread; on_done(result) is called from that thread.
+
+        result is {'models': [...]} on success or {'models': cached_names, 'error': exception}.
+        """
+        with self._lock:
+            if self._refreshing:
+                return False
+            self._refreshing = True
+        threading.Thread(target=self._refresh, args=(on_done,), daemon=True).start()
+        return True
+
+    def _refresh(self, on_done):
+        try:
+            result = {'models': self._fetch()}
+        except Exception as e:
+            result = {'models': self.cached_names(), 'error': e}
+        finally:
+            with self._lock:
+                self._refreshing = False
+        on_done(result)
+
+    def _fetch(self):
+        models_info = self.client.list()
+        with self._lock:
+            known = dict(self._data.get('metadata', {}))
+        names = []
+        metadata = {}
+        for m in response_field(models_info, 'models', []) or []:
+            name = response_field(m, 'model') or response_field(m, 'name')
+            if not isinstance(name, str):
+                continue
+            names.append(name)
+            digest = response_field(m, 'digest')
+            previous = known.get(name)
+            if previous and previous.get('digest') == digest:
+                metadata[name] = previous
+                continue
+            details = response_field(m, 'details')
+            metadata[name] = {
+                'digest': digest,
+                'size': response_field(m, 'size'),
+                'family': response_field(details, 'family'),
+                'parameter_size': response_field(details, 'parameter_size'),
+                'quantization': response_field(details, 'quantization_level'),
+                'context_length': self._fetch_context_length(name),
+            }
+        data = {'fetched_at': time.time(), 'models': names, 'metadata': metadata}
+        with self._lock:
+            self._data = data
+        self.store.set(self.path, data)
+        return names
+
+    def _fetch_context_length(self, name):
+        try:
+            info = self.client.show(name)
+        except Exception:
+            return None
+        model_info = response_field(info, 'modelinfo') or response_field(info, 'model_info') or {}
+        for key, value in dict(model_info).items():
+            if key.endswith('.context_length'):
+                return value
+        return None
+
+
+def keep_alive_seconds(keep_alive):
+    """Converts an Ollama keep_alive value ("5m", "1h", "30s" or a number of seconds) to seconds.
+
+    None means Ollama's default of five minutes; a negative number keeps the model loaded forever.
+    """
+    if keep_alive is None:
+        return 300.0
+    if isinstance(keep_alive, (int, float)):
+        return float(keep_alive) if keep_alive >= 0 else float('inf')
+    units = {'s': 1, 'm': 60, 'h': 3600}
+    text = str(keep_alive).strip()
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+class ModelWarmer:
+    """Preloads selected models and manages how long Ollama keeps each one resident.
+
+    warm() sends a zero-length generate request so the model is loaded before
+    the first real message. Models used at least FREQUENT_USE_COUNT times get a
+    longer keep_alive; when the selection moves away from a model that is not
+    used often, it is unloaded explicitly with keep_alive=0. Uses are counted
+    with a USAGE_HALF_LIFE_SECONDS decay, so "often" means recently. usage maps
+    each model to its {'score', 'at'} (decayed count and wall-clock time of the
+    last update) and is saved in the app config. Every finished
+    request reports its load_duration through record_request(), which both
+    corrects the cold/warm estimate and keeps separate first-token latency
+    averages for cold and warm requests.
+    """
+
+    def __init__(self, client=ollama, usage=None, half_life=USAGE_HALF_LIFE_SECONDS):
+        self.client = client
+        self.half_life = half_life
+        self.usage = {}
+        self.load_usage(usage or {})
+        self._lock = threading.Lock()
+        self._loading = set()
+        self._warm_until = {}
+        self._first_token = {}  # model -> {'cold': [total, count], 'warm': [total, count]}
+
+    def load_usage(self, usage, now=None):
+        """Takes usage as saved in the config; plain counts from older configs start decaying now."""
+        now = time.time() if now is None else now
+        self.usage = {model: dict(entry) if isinstance(entry, dict) else {'score': float(entry), 'at': now}
+                      for model, entry in usage.items()}
+
+    def usage_score(self, model, now=None):
+        """The model's use count, with each use weighing half as much every half_life seconds."""
+        entry = self.usage.get(model)
+        if not entry:
+            return 0.0
+        now = time.time() if now is None else now
+        elapsed = max(0.0, now - entry['at'])
+        return entry['score'] * 0.5 ** (elapsed / self.half_life)
+
+    def is_frequent(self, model, now=None):
+        return self.usage_score(model, now) >= FREQUENT_USE_COUNT
+
+    def keep_alive_for(self, model):
+        return KEEP_ALIVE_FREQUENT if self.is_frequent(model) else KEEP_ALIVE_DEFAULT
+
+    def state(self, model):
+        with self._lock:
+            if model in self._loading:
+                return 'loading'
+            if self._warm_until.get(model, 0) > time.monotonic():
+                return 'warm'
+            return 'cold'
+
+    def select(self, model, previous=None, on_done=None):
+        """Warms the newly selected model and unloads the previous one unless it is used often."""
+        if previous and previous != model and not self.is_frequent(previous):
+            self.unload(previous)
+        return self.warm(model, on_done)
+
+    def warm(self, model, on_done=None):
+        """Loads model in the background; on_done(result) is called from the worker thread."""
+        if not model or self.state(model) != 'cold':
+            return False
+        with self._lock:
+            self._loading.add(model)
+        threading.Thread(target=self._warm, args=(model, on_done), daemon=True).start()
+        return True
+
+    def _warm(self, model, on_done):
+        keep_alive = self.keep_alive_for(model)
+        started = time.monotonic()
+        result = {'model': model}
+        try:
+            self.client.generate(model=model, prompt="", keep_alive=keep_alive)
+            result['load_time'] = time.monotonic() - started
+            with self._lock:
+                self._warm_until[model] = time.monotonic() + keep_alive_seconds(keep_alive)
+        except Exception as e:
+            result['error'] = e
+        finally:
+            with self._lock:
+                self._loading.discard(model)
+        if on_done is not None:
+            on_done(result)
+
+    def unload(self, model):
+        with self._lock:
+            self._warm_until.pop(model, None)
+        threading.Thread(target=self._unload, args=(model,), daemon=True).start()
+
+    def _unload(self, model):
+        try:
+            self.client.generate(model=model, prompt="", keep_alive=0)
+        except Exception as e:
+            print(f"Warning: Could not unload model {model}: {e}")
+
+    def record_request(self, model, time_to_first_token, load_duration, now=None):
+        """Records a finished request; returns 'cold' or 'warm' depending on whether the model had to load."""
+        kind = 'cold' if (load_duration or 0) > COLD_LOAD_SECONDS else 'warm'
+        now = time.time() if now is None else now
+        keep_alive = self.keep_alive_for(model)
+        with self._lock:
+            self.usage[model] = {'score': self.usage_score(model, now) + 1, 'at': now}
+            self._warm_until[model] = time.monotonic() + keep_alive_seconds(keep_alive)
+            if time_to_first_token is not None:
+                totals = self._first_token.setdefault(model, {'cold': [0.0, 0], 'warm': [0.0, 0]})[kind]
+                totals[0] += time_to_first_token
+                totals[1] += 1
+        return kind
+
+    def first_token_averages(self, model):
+        """Average time-to-first-token in seconds for cold and warm requests (None when not seen yet)."""
+        with self._lock:
+            totals = self._first_token.get(model, {})
+            return {kind: (totals[kind][0] / totals[kind][1] if kind in totals and totals[kind][1] else None)
+                    for kind in ('cold', 'warm')}
@@ -0,0 +1,137 @@
+"""Headless batch runner: sends a JSONL file of chat requests to Ollama concurrently.
+
+Each input line is one request, for example:
+
+    {"id": "q1", "model": "llama3.1:8b", "system_prompt_name": "Code Explainer",
+     "temperature": 0.2, "messages": [{"role": "user", "content": "What does zip() do?"}]}
+
+"prompt" may be given instead of "messages" for a single user turn, and
+"system_prompt" holds literal text instead of a named prompt from
+system_prompts.json / prompts.json. Results are appended to the output JSONL as
+each request finishes; on restart, ids that already have a successful result
+there are skipped. Without --host, requests are spread over the hosts listed
+under "ollama_endpoints" in config.json.
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
+import time
+
+import ollama
+
+from chat_streaming import StreamAccumulator, response_field
+from endpoint_pool import EndpointPool
+from prompt_store import load_prompt_store, resolve_system_prompt
+from stream_cassette import RecordingClient, ReplayClient, cassette_client
+
+DEFAULT_MODEL = "llama3.1:8b"
+DEFAULT_TEMPERATURE = 0.7
+
+
+def read_requests(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            record.setdefault('id', f"line-{line_number}")
+            yield record
+
+
+def completed_ids(path):
+    """Ids that already have a successful result in the output file."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A line cut short by an interrupted run.
+            if 'error' not in result:
+                done.add(str(result.get('id')))
+    return done
+
+
+def build_messages(record, prompts):
+    messages = []
+    system_prompt = resolve_system_prompt(record, prompts)
+    if system_prompt:
+        messages.append({'role': 'system', 'content': system_prompt})
+    if record.get('messages'):
+        messages.extend(m for m in record['messages'] if m.get('role') != 'system' or not system_prompt)
+    elif record.get('prompt'):
+        messages.append({'role': 'user', 'content': record['prompt']})
+    else:
+        raise ValueError("Request has neither 'messages' nor 'prompt'")
+    return messages
+
+
+def run_request(client, record, prompts, default_model):
+    model = record.get('model') or default_model
+    options = dict(record.get('options') or {})
+    options.setdefault('temperature', record.get('temperature', DEFAULT_TEMPERATURE))
+    result = {'id': record['id'], 'model': model}
+    accumulator = StreamAccumulator()
+    try:
+        messages = build_messages(record, prompts)
+        last_chunk = None
+        for chunk in client.chat(model=model, messages=messages, options=options, stream=True):
+            last_chunk = chunk
+            accumulator.append(chunk['message']['content'])
+        result['response'] = accumulator.text()
+        result['stats'] = dict(accumulator.stats(),
+                               eval_count=response_field(last_chunk, 'eval_count'),
+                               prompt_eval_count=response_field(last_chunk, 'prompt_eval_count'))
+    except Exception as e:
+        result['error'] = str(e)
+    result['completed_at'] = time.time()
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a JSONL file of chat requests against Ollama.")
+    parser.add_argument("input", help="JSONL file with one request per line")
+    parser.add_argument("-o", "--output", help="results JSONL (default: <input>.results.jsonl)")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="requests in flight at once")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="model for requests that do not name one")
+    parser.add_argument("--host", default=None, help="Ollama host (default: the config's endpoint pool, else OLLAMA_HOST or localhost)")
+    parser.add_argument("--config", default="config.json", help="config file with the \"ollama_endpoints\" pool")
+    parser.add_argument("--record", help="record every stream with its timing to this cassette file")
+    parser.add_argument("--replay", help="serve requests from this cassette file instead of Ollama")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed factor (0 = no delays)")
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.splitext(args.input)[0] + ".results.jsonl"
+    prompts = load_prompt_store()
+    done = completed_ids(output)
+    pending = [r for r in read_requests(args.input) if str(r['id']) not in done]
+    print(f"{len(done)} already completed, {len(pending)} to run with concurrency {args.concurrency}.", file=sys.stderr)
+
+    client = ollama.Client(host=args.host) if args.host else EndpointPool.from_config(args.config).start()
+    if args.replay:
+        client = ReplayClient(args.replay, speed=args.speed)
+    elif args.record:
+        client = RecordingClient(client, args.record)
+    else:
+        client = cassette_client(client)
+    failures = 0
+    with open(output, 'a', encoding='utf-8') as out, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        futures = [pool.submit(run_request, client, r, prompts, args.model) for r in pending]
+        for finished, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+            result = future.result()
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+            status = f"error: {result['error']}" if 'error' in result else "ok"
+            failures += 'error' in result
+            print(f"[{finished}/{len(pending)}] {result['id']} ({result['model']}): {status}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,98 @@
 import tkinter as tk
 from tkinter import scrolledtext, ttk, messagebox, filedialog
-import ollama
-import threading
+import asyncio
+import itertools
 import queue
-import json
 import os
-
-client = ollama.Client()
+import time
+
+from chat_context import ContextBudget
+from chat_engine import MAX_CONCURRENT_STREAMS, ChatEngine, async_chat_client, chat_stream
+from chat_metrics import METRICS_FILE, PROMETHEUS_METRICS_FILE, MetricsPanel, MetricsRecorder, request_metrics
+from chat_rendering import TranscriptPager
+from chat_streaming import StreamAccumulator
+from endpoint_pool import ENDPOINTS_CONFIG_KEY, EndpointPool
+from log_tail import LOG_MAX_LINES, LogFollower, append_log_lines, read_tail
+from model_compare import ModelCompareWindow
+from prompt_queue import PRIORITY_HIGH, PRIORITY_NORMAL, PromptQueue
+from prompt_store import DEFAULT_CHAT_PROMPTS, PROMPTS_FILE, read_prompts
+from response_cache import ResponseCache, cache_key, replay_stream
+from state_store import shared_state_store
+
+USER_PREFIX = "🧑‍💻 You: "
+ASSISTANT_PREFIX = "🤖 Ollama: "
+
+
+def format_message(message):
+    """Transcript text of one message, as it appears in the chat area and in saved chats."""
+    if message["role"] == "user":
+        return f"{USER_PREFIX}{message['content']}\n"
+    if message["role"] == "assistant":
+        return f"{ASSISTANT_PREFIX}{message['content']}\n"
+    return ""
+
+
+def parse_transcript(text):
+    """Rebuilds the message list from a saved transcript."""
+    messages = []
+    for line in text.splitlines(keepends=True):
+        if line.startswith(USER_PREFIX):
+            messages.append({"role": "user", "content": line[len(USER_PREFIX):]})
+        elif line.startswith(ASSISTANT_PREFIX):
+            messages.append({"role": "assistant", "content": line[len(ASSISTANT_PREFIX):]})
+        elif messages:
+            messages[-1]["content"] += line
+    for message in messages:
+        message["content"] = message["content"].rstrip("\n")
+    return messages
+
+
+class ChatSession:
+    """One conversation tab: its messages, its transcript and the request it has in flight."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, notebook, title=None):
+        self.id = next(self._ids)
+        self.title = title or f"Chat {self.id}"
+        self.notebook = notebook
+        self.frame = tk.Frame(notebook)
+        self.chat_area = scrolledtext.ScrolledText(self.frame, wrap=tk.WORD, state="disabled")
+        self.chat_area.pack(fill=tk.BOTH, expand=True)
+        self.transcript = TranscriptPager(
+            self.chat_area, lambda index, message: self.chat_area.insert(index, format_message(message))
+        )
+        self.messages = []
+        self.task = None
+        self.prompt_estimate = ""  # Estimated size of the prompt in flight, for the status bar.
+        self.queue = PromptQueue()
+        notebook.add(self.frame, text=self.title)
+
+    @property
+    def busy(self):
+        return self.task is not None
+
+    def set_title(self, title=None):
+        if title:
+            self.title = title
+        # Tabs answering in the background are marked so their replies are easy to spot.
+        text = f"{self.title} …" if self.busy else self.title
+        if len(self.queue):
+            text += f" (+{len(self.queue)})"
+        self.notebook.tab(self.frame, text=text)
+
+    def append_text(self, text):
+        self.chat_area.config(state="normal")
+        self.chat_area.insert(tk.END, text)
+        self.chat_area.see(tk.END)
+        self.chat_area.config(state="disabled")
 
 
 class OllamaChatApp:
-    PROMPTS_FILE = "prompts.json"
+    PROMPTS_FILE = PROMPTS_FILE
     CONFIG_FILE = "config.json"
 
-    DEFAULT_PROMPTS = {
-        "Helpful assistant": "You are a helpful assistant.",
-        "Sarcastic friend": "You are a sarcastic, witty companion.",
-        "Technical expert": "You are a technical expert who explains concisely.",
-        "Custom": ""
-    }
+    DEFAULT_PROMPTS = DEFAULT_CHAT_PROMPTS
 
     def __init__(self, root):
         self.root = root
@@ -67,10 +141,14 @@ class OllamaChatApp:
         self.paned_window = tk.PanedWindow(root, orient=tk.VERTICAL, sashwidth=4, sashpad=2)
         self.paned_window.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
 
-        self.chat_area = scrolledtext.ScrolledText(
-            self.paned_window, wrap=tk.WORD, state="disabled"
-        )
-        self.paned_window.add(self.chat_area, minsize=100)
+        chat_frame = tk.Frame(self.paned_window)
+        self.metrics_panel = MetricsPanel(chat_frame)
+        self.metrics_panel.pack(side=tk.RIGHT, fill=tk.Y, padx=(5, 0))
+        self.notebook = ttk.Notebook(chat_frame)
+        self.notebook.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.paned_window.add(chat_frame, minsize=100)
+        self.sessions = {}
+        self.new_session()
 
         self.log_area = scrolledtext.ScrolledText(
             self.paned_window, wrap=tk.WORD, state="disabled", background="#f0f0f0"
@@ -78,6 +156,8 @@ class OllamaChatApp:
         self.paned_window.add(self.log_area, minsize=50)
 
         self.log_visible = True
+        self.log_follower = None
+        self.follow_log_var = tk.BooleanVar(value=False)
 
         # ==== Entry field ====
         entry_frame = tk.Frame(root)
@@ -86,21 +166,45 @@ class OllamaChatApp:
         self.entry = tk.Entry(entry_frame, width=50)
         self.entry.pack(side=tk.LEFT, padx=(10, 0))
         self.entry.bind("<Return>", self.on_send)
+        # Ctrl+Enter puts the prompt ahead of the ones already queued.
+        self.entry.bind("<Control-Return>", lambda event: self.on_send(priority=PRIORITY_HIGH))
 
         tk.Button(entry_frame, text="Send", command=self.on_send).pack(side=tk.LEFT, padx=5)
+        tk.Button(entry_frame, text="New Tab", command=self.new_session).pack(side=tk.LEFT, padx=5)
+        tk.Button(entry_frame, text="Close Tab", command=self.close_session).pack(side=tk.LEFT, padx=5)
+        tk.Button(entry_frame, text="Compare", command=self.compare_models).pack(side=tk.LEFT, padx=5)
         tk.Button(entry_frame, text="Save Chat", command=self.save_chat).pack(side=tk.LEFT, padx=5)
         tk.Button(entry_frame, text="Load Chat", command=self.load_chat).pack(side=tk.LEFT, padx=5)
         tk.Button(entry_frame, text="Load Log", command=self.load_log_file).pack(side=tk.LEFT, padx=5)
 
         self.toggle_log_button = tk.Button(entry_frame, text="Hide Log", command=self.toggle_log_view)
         self.toggle_log_button.pack(side=tk.LEFT, padx=5)
+        tk.Checkbutton(entry_frame, text="Follow Log", variable=self.follow_log_var,
+                       command=self.on_follow_log_toggled).pack(side=tk.LEFT, padx=5)
+
+        self.status_label = tk.Label(root, text="", anchor="w", relief=tk.SUNKEN)
+        self.status_label.pack(side=tk.BOTTOM, fill=tk.X)
 
         # ==== State ====
-        self.messages = []
+        self.last_response_stats = None
+        self.context_budget = ContextBudget()
         self.response_queue = queue.Queue()
-        self.poll_response_queue()
+        self.status_note = ("", 0.0)
         self.load_prompts()
+        self.state_store = shared_state_store()
         self.config = self.load_config()
+        self.response_cache = ResponseCache(max_temperature=self.config.get("response_cache_max_temperature"))
+        metrics_format = self.config.get("metrics_format", "jsonl")
+        self.metrics_recorder = MetricsRecorder(
+            self.config.get("metrics_file", PROMETHEUS_METRICS_FILE if metrics_format == "prometheus" else METRICS_FILE),
+            fmt=metrics_format,
+        )
+        self.endpoint_pool = EndpointPool(self.config.get(ENDPOINTS_CONFIG_KEY)).start()
+        self.engine = ChatEngine(self.config.get("max_concurrent_streams", MAX_CONCURRENT_STREAMS),
+                                 client=async_chat_client(self.endpoint_pool))
+        self.poll_response_queue()
+
+        self.follow_log_var.set(self.config.get("follow_log", False))
 
         # Restore last log and sash
         last_log = self.config.get("last_log_file_path")
@@ -109,76 +213,172 @@ class OllamaChatApp:
         if "sash_position" in self.config:
             self.root.after(100, lambda: self.paned_window.sash_place(0, 0, self.config["sash_position"]))
 
-        # Save sash on resize
+        # Save sash on resize; the store batches the writes while the window is being dragged
         self.root.bind("<Configure>", self.on_resize)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+    # ==== Sessions ====
+
+    @property
+    def session(self):
+        """The conversation in the selected tab."""
+        return self.sessions[self.notebook.select()]
+
+    def new_session(self):
+        session = ChatSession(self.notebook)
+        self.sessions[str(session.frame)] = session
+        self.notebook.select(session.frame)
+        return session
+
+    def close_session(self):
+        session = self.session
+        if session.busy:
+            if not messagebox.askyesno("Close Tab", f"'{session.title}' is still answering. Stop it and close the tab?"):
+                return
+            session.task.cancel()
+        del self.sessions[str(session.frame)]
+        self.notebook.forget(session.frame)
+        session.frame.destroy()
+        if not self.sessions:
+            self.new_session()
+
+    def compare_models(self):
+        ModelCompareWindow(self.root, self.engine, self.endpoint_pool, self.models, selected=[self.model_var.get()],
+                           prompt=self.entry.get().strip(), system_prompt=self.system_prompt_text_var.get().strip(),
+                           temperature=self.temperature_var.get())
 
     # ==== Chat logic ====
 
-    def on_send(self, event=None):
+    def on_send(self, event=None, priority=PRIORITY_NORMAL):
         prompt = self.entry.get().strip()
         if not prompt:
             messagebox.showwarning("Empty input", "Please type a question.")
-            return
+            return "break"
+        session = self.session
         self.entry.delete(0, tk.END)
-        self.append_message(f"🧑‍💻 You: {prompt}\n")
-        self.messages.append({"role": "user", "content": prompt})
-        threading.Thread(target=self.get_response, daemon=True).start()
-
-    def get_response(self):
-        full_response = ""
+        if session.busy:
+            # One reply per tab at a time; the rest wait here and go out in turn.
+            if not session.queue.push(prompt, priority):
+                self.status_note = ("That prompt is already queued.", time.monotonic() + 3)
+            session.set_title()
+            return "break"
+        self.send_prompt(session, prompt)
+        return "break"
+
+    def send_prompt(self, session, prompt):
+        message = {"role": "user", "content": prompt}
+        session.append_text(format_message(message))
+        if not any(m["role"] == "system" for m in session.messages):
+            session.messages.insert(0, {"role": "system", "content": self.system_prompt_text_var.get().strip()})
+        session.messages.append(message)
         model = self.model_var.get()
         temperature = self.temperature_var.get()
-        system_prompt = self.system_prompt_text_var.get().strip()
-
-        if not any(m["role"] == "system" for m in self.messages):
-            self.messages.insert(0, {"role": "system", "content": system_prompt})
+        messages = list(session.messages)
+        session.task = self.engine.submit(
+            session.id, lambda client: self.get_response(session, client, model, temperature, messages)
+        )
+        session.set_title()
 
-        self.response_queue.put("🤖 Ollama: ")
+    async def get_response(self, session, client, model, temperature, messages):
+        """Streams one reply on the chat engine's loop; the UI thread applies it through the response queue."""
+        self.response_queue.put(("text", session, ASSISTANT_PREFIX))
 
+        loop = asyncio.get_running_loop()
+        options = {"temperature": temperature}
+        accumulator = StreamAccumulator()
+        last_chunk = None
         try:
-            stream = client.chat(
-                model=model,
-                messages=self.messages,
-                options={"temperature": temperature},
-                stream=True,
-            )
-
-            for chunk in stream:
+            # Everything that can fail is in here, so the tab always gets its "reply" and stops answering.
+            messages, prompt_tokens, dropped = self.context_budget.fit(messages, model)
+            estimate = f"prompt ~{prompt_tokens}/{self.context_budget.budget_for(model)} tokens"
+            if dropped:
+                estimate += f", {dropped} older messages omitted"
+            self.response_queue.put(("estimate", session, estimate))
+            key = cache_key(model, options, messages) if self.response_cache.enabled_for(options) else None
+            # The cache reads and writes files: keep that off the loop every tab streams on.
+            cached = await loop.run_in_executor(None, self.response_cache.get, key) if key else None
+            if cached is not None:
+                stream = replay_stream(cached["content"])
+            else:
+                stream = chat_stream(
+                    client,
+                    model=model,
+                    messages=messages,
+                    options=options,
+                )
+
+            async for chunk in stream:
+                last_chunk = chunk
                 token = chunk["message"]["content"]
-                full_response += token
-                self.response_queue.put(token)
+                accumulator.append(token)
+                self.response_queue.put(("text", session, token))
+            full_response = accumulator.text()
+            if key and cached is None:
+                await loop.run_in_executor(None, lambda: self.response_cache.put(key, full_response, model=model))
 
         except Exception as e:
             full_response = f"\n⚠️ Error: {e}\n"
-            self.response_queue.put(full_response)
+            self.response_queue.put(("text", session, full_response))
 
-        self.messages.append({"role": "assistant", "content": full_response})
-        self.response_queue.put("\n")
+        self.last_response_stats = accumulator.stats()
+        if last_chunk is not None:
+            self.response_queue.put(("metrics", request_metrics(model, last_chunk, self.last_response_stats)))
+        self.response_queue.put(("text", session, "\n"))
+        self.response_queue.put(("reply", session, {"role": "assistant", "content": full_response}))
 
     def poll_response_queue(self):
         try:
             while True:
-                token = self.response_queue.get_nowait()
-                self.chat_area.config(state="normal")
-                self.chat_area.insert(tk.END, token)
-                self.chat_area.see(tk.END)
-                self.chat_area.config(state="disabled")
+                item = self.response_queue.get_nowait()
+                if item[0] == "metrics":
+                    self.show_metrics(item[1])
+                elif item[0] == "log_lines" and item[1] is self.log_follower:
+                    append_log_lines(self.log_area, item[2], self.config.get("log_max_lines", LOG_MAX_LINES))
+                elif item[0] in ("text", "estimate", "reply") and str(item[1].frame) in self.sessions:
+                    # Tokens go to the tab that asked, whichever one is selected now.
+                    session = item[1]
+                    if item[0] == "text":
+                        session.append_text(item[2])
+                    elif item[0] == "estimate":
+                        session.prompt_estimate = item[2]
+                    else:
+                        session.messages.append(item[2])
+                        session.task = None
+                        session.prompt_estimate = ""
+                        if len(session.queue):
+                            self.send_prompt(session, session.queue.pop()["text"])
+                        session.set_title()
         except queue.Empty:
             pass
+        self.update_status()
         self.root.after(50, self.poll_response_queue)
 
-    def append_message(self, message):
-        self.chat_area.config(state="normal")
-        self.chat_area.insert(tk.END, message)
-        self.chat_area.see(tk.END)
-        self.chat_area.config(state="disabled")
+    def update_status(self):
+        """Queue depth and wait of the selected tab, the size of the prompt it is answering, and how busy the engine is."""
+        if not self.sessions:
+            return
+        session = self.session
+        parts = [f"{session.title}: {'answering' if session.busy else 'idle'}"]
+        if session.busy and session.prompt_estimate:
+            parts.append(session.prompt_estimate)
+        if len(session.queue):
+            parts.append(session.queue.status_text())
+        parts.append(f"{self.engine.active_count} streaming, {self.engine.waiting_count} waiting for a slot")
+        if time.monotonic() < self.status_note[1]:
+            parts.append(self.status_note[0])
+        text = " | ".join(parts)
+        if text != self.status_label.cget("text"):
+            self.status_label.config(text=text)
+
+    def show_metrics(self, metrics):
+        self.metrics_panel.show(metrics)
+        self.metrics_recorder.record(metrics)
 
     # ==== Prompts ====
 
     def load_prompts(self):
         if os.path.exists(self.PROMPTS_FILE):
-            with open(self.PROMPTS_FILE, "r", encoding="utf-8") as f:
-                prompts = json.load(f)
+            prompts = read_prompts(self.PROMPTS_FILE)
         else:
             prompts = self.DEFAULT_PROMPTS.copy()
         self.system_prompts = prompts
@@ -203,20 +403,25 @@ class OllamaChatApp:
         path = filedialog.asksaveasfilename(defaultextension=".txt", filetypes=[("Text files", "*.txt")])
         if not path:
             return
-        with open(path, "w") as f:
-            f.write(self.chat_area.get(1.0, tk.END))
+        # The chat area may only hold the latest page, so the transcript is rebuilt from the messages.
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("".join(format_message(m) for m in self.session.messages))
         messagebox.showinfo("Saved", f"Chat saved to {path}.")
 
     def load_chat(self):
+        session = self.session
+        if session.busy:
+            messagebox.showinfo("Busy", f"'{session.title}' is still answering. Load the chat into another tab.")
+            return
         path = filedialog.askopenfilename(filetypes=[("Text files", "*.txt")])
         if not path:
             return
-        with open(path, "r") as f:
-            content = f.read()
-        self.chat_area.config(state="normal")
-        self.chat_area.delete(1.0, tk.END)
-        self.chat_area.insert(tk.END, content)
-        self.chat_area.config(state="disabled")
+        with open(path, "r", encoding="utf-8") as f:
+            # The system message goes in now so later inserts do not shift the pager's message indexes.
+            session.messages = [{"role": "system", "content": self.system_prompt_text_var.get().strip()}]
+            session.messages.extend(parse_transcript(f.read()))
+        session.transcript.show(session.messages)
+        session.set_title(os.path.splitext(os.path.basename(path))[0])
 
     def load_log_file(self, path=None):
         if path is None:
@@ -226,17 +431,32 @@ class OllamaChatApp:
         if not os.path.exists(path):
             messagebox.showwarning("Log File", f"Log file '{path}' does not exist.")
             return
-        with open(path, "r") as f:
-            lines = f.readlines()
+        if self.log_follower:
+            self.log_follower.stop()
+            self.log_follower = None
+        max_lines = self.config.get("log_max_lines", LOG_MAX_LINES)
+        lines, offset = read_tail(path, max_lines, include_partial=not self.follow_log_var.get())
         self.log_area.config(state="normal")
         self.log_area.delete(1.0, tk.END)
-        self.log_area.insert(tk.END, "\n".join([line.strip() for line in lines]))
         self.log_area.config(state="disabled")
+        append_log_lines(self.log_area, lines, max_lines)
+        if self.follow_log_var.get():
+            follower = LogFollower(path, offset, lambda new_lines: self.response_queue.put(("log_lines", follower, new_lines)),
+                                   max_lines=max_lines)
+            self.log_follower = follower.start()
         self.config["last_log_file_path"] = path
         self.save_config()
         if not self.log_visible:
             self.toggle_log_view()
 
+    def on_follow_log_toggled(self):
+        self.config["follow_log"] = self.follow_log_var.get()
+        last_log = self.config.get("last_log_file_path")
+        if last_log and os.path.exists(last_log):
+            self.load_log_file(last_log)
+        else:
+            self.save_config()
+
     def toggle_log_view(self):
         if self.log_visible:
             self.paned_window.forget(self.log_area)
@@ -249,22 +469,30 @@ class OllamaChatApp:
     def on_resize(self, event=None):
         try:
             pos = self.paned_window.sash_coord(0)[1]
+        except Exception:
+            return
+        if self.config.get("sash_position") != pos:
             self.config["sash_position"] = pos
             self.save_config()
-        except Exception:
-            pass
+
+    def on_closing(self):
+        if self.log_follower:
+            self.log_follower.stop()
+        self.engine.shutdown()
+        self.endpoint_pool.stop()
+        self.metrics_recorder.close()
+        self.state_store.close()
+        self.root.destroy()
 
     # ==== Config ====
 
     def load_config(self):
         if os.path.exists(self.CONFIG_FILE):
-            with open(self.CONFIG_FILE, "r") as f:
-                return json.load(f)
+            return self.state_store.read(self.CONFIG_FILE)
         return {}
 
     def save_config(self):
-        with open(self.CONFIG_FILE, "w") as f:
-            json.dump(self.config, f, indent=4)
+        self.state_store.set(self.CONFIG_FILE, self.config)
 
 
 if __name__ == "__main__":
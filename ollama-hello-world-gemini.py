@@ -1,24 +1,37 @@
 import tkinter as tk
 from tkinter import scrolledtext, messagebox, ttk, filedialog, simpledialog
 import ollama
+import asyncio
 import threading
 import queue
 import datetime
+import itertools
 import json
 import os
+import time
+
+from chat_context import ContextBudget, ConversationCompactor
+from chat_engine import MAX_CONCURRENT_STREAMS, ChatEngine, async_chat_client, chat_stream
+from chat_metrics import METRICS_FILE, PROMETHEUS_METRICS_FILE, MetricsPanel, MetricsRecorder, request_metrics
+from chat_rendering import TokenRenderBuffer, TranscriptPager
+from chat_search import ChatSearchDialog
+from chat_streaming import StreamAccumulator, response_field
+from log_rag import DEFAULT_EMBEDDING_MODEL, RAG_MAX_TOKENS, LogEmbeddingIndex
+from log_search import LogSearchPanel
+from endpoint_pool import ENDPOINTS_CONFIG_KEY, EndpointPool
+from log_viewer import LogViewer
+from model_compare import ModelCompareWindow
+from model_registry import ModelRegistry, ModelWarmer
+from prompt_queue import PRIORITY_HIGH, PRIORITY_NORMAL, PromptQueue
+from prompt_store import DEFAULT_SYSTEM_PROMPTS, SYSTEM_PROMPTS_FILE, read_prompts
+from response_cache import ResponseCache, cache_key, replay_stream
+from session_journal import SESSIONS_DIR, SessionJournal, iter_session, latest_session_id
+from state_store import shared_state_store
 
 # --- Constants ---
-SYSTEM_PROMPTS_FILE = "system_prompts.json"
 APP_CONFIG_FILE = "config.json"
-PREDEFINED_PROMPTS = {
-    "Default": "You are a helpful AI assistant.",
-    "Code Explainer": "You are a senior software engineer. Explain code snippets clearly and concisely. Provide examples where appropriate.",
-    "Creative Writer": "You are a creative writer. Generate imaginative stories, poems, or scripts based on the user's input.",
-    "Fact Checker": "You are a fact-checking AI. Provide accurate information and cite sources if possible.",
-    "Summarizer": "You are a text summarizer. Condense provided text into a brief and informative summary.",
-    "Spanish Translator": "You are an English to Spanish translator. Translate the given text accurately.",
-    "Joke Teller": "You are a comedian. Tell a short, family-friendly joke.",
-}
+# Upper bound on response_queue items moved into the render buffer per Tk tick.
+MAX_QUEUE_ITEMS_PER_TICK = 2000
 
 class OllamaChatGUI:
     def __init__(self, master):
@@ -30,16 +43,47 @@ class OllamaChatGUI:
 
         # --- Application State Variables ---
         self.model_name = tk.StringVar(master)
+        # Read ahead of the rest of the config: every client below goes through the pool.
+        self.endpoint_pool = EndpointPool.from_config(APP_CONFIG_FILE).start()
+        # Config, system prompts and the model cache are all written through it.
+        self.state_store = shared_state_store()
+        self.model_registry = ModelRegistry(client=self.endpoint_pool, store=self.state_store)
+        self.model_warmer = ModelWarmer(client=self.endpoint_pool)
+        self.active_model = ""
         self.system_prompt_name = tk.StringVar(master)
         self.system_prompts = {}
 
-        self.running_thread = None
+        self.engine = ChatEngine(client=async_chat_client(self.endpoint_pool))
+        self.chat_task = None
+        # Reply events carry the id of their request; only the current request's are shown.
+        self._request_ids = itertools.count(1)
+        self.request_id = None
+        # Set from sending a prompt until its 'reply_finished' has been rendered.
+        self.generating = False
+        self.prompt_queue = PromptQueue()
         self.response_queue = queue.Queue()
+        self.render_buffer = TokenRenderBuffer()
+        self.generation_status = ""
+        self.last_response_stats = None
         self.conversation_history = []
+        self.context_budget = ContextBudget()
+        self.compactor = ConversationCompactor(self.endpoint_pool.chat)
+        self.compact_history_enabled = tk.BooleanVar(master, value=False)
+        self.summary_model = ""
+        self.response_cache = ResponseCache()
+        self.metrics_recorder = MetricsRecorder()
+        self.session_journal = SessionJournal()
+        self.auto_recover_session = True
+        self.last_session_id = ""
+        self.chats_directory = ""
 
         self.last_loaded_log_path = tk.StringVar(master)
-        self.log_content = ""
         self.log_view_visible = tk.BooleanVar(master, value=True)
+        self.follow_log = tk.BooleanVar(master, value=False)
+        self.log_rag_enabled = tk.BooleanVar(master, value=False)
+        self.log_rag_index = None
+        self.embedding_model = DEFAULT_EMBEDDING_MODEL
+        self.log_rag_max_tokens = RAG_MAX_TOKENS
 
         # --- GUI Layout ---
         self.top_frame = ttk.Frame(master, padding="10")
@@ -53,7 +97,9 @@ class OllamaChatGUI:
         self.model_dropdown.pack(side=tk.TOP, anchor=tk.W, padx=(0, 10), pady=(0, 5))
         self.model_dropdown.bind("<<ComboboxSelected>>", self.on_model_select)
         self.refresh_models_button = ttk.Button(self.model_temp_frame, text="Refresh Models", command=self.load_models)
-        self.refresh_models_button.pack(side=tk.TOP, anchor=tk.W, pady=(0, 10))
+        self.refresh_models_button.pack(side=tk.TOP, anchor=tk.W, pady=(0, 5))
+        self.compare_models_button = ttk.Button(self.model_temp_frame, text="Compare Models", command=self.compare_models)
+        self.compare_models_button.pack(side=tk.TOP, anchor=tk.W, pady=(0, 10))
         ttk.Label(self.model_temp_frame, text="Temperature:").pack(side=tk.TOP, anchor=tk.W)
         self.temperature_var = tk.DoubleVar(value=0.7)
         self.temperature_scale = ttk.Scale(self.model_temp_frame, from_=0.0, to=2.0, orient=tk.HORIZONTAL, variable=self.temperature_var, command=self.on_temperature_change, length=150)
@@ -85,7 +131,9 @@ class OllamaChatGUI:
         self.load_chat_button = ttk.Button(self.chat_log_mgmt_frame, text="Load Chat", command=self.load_chat)
         self.load_chat_button.pack(side=tk.TOP, anchor=tk.W, pady=(0, 5))
         self.clear_chat_button = ttk.Button(self.chat_log_mgmt_frame, text="Clear Chat", command=self.clear_chat_session)
-        self.clear_chat_button.pack(side=tk.TOP, anchor=tk.W, pady=(0, 10))
+        self.clear_chat_button.pack(side=tk.TOP, anchor=tk.W, pady=(0, 5))
+        self.search_chats_button = ttk.Button(self.chat_log_mgmt_frame, text="Search Chats", command=self.search_chats)
+        self.search_chats_button.pack(side=tk.TOP, anchor=tk.W, pady=(0, 10))
         ttk.Label(self.chat_log_mgmt_frame, text="Log File:").pack(side=tk.TOP, anchor=tk.W)
         self.last_log_path_label = ttk.Label(self.chat_log_mgmt_frame, textvariable=self.last_loaded_log_path, wraplength=180, font=("Arial", 8))
         self.last_log_path_label.pack(side=tk.TOP, anchor=tk.W, pady=(0, 5))
@@ -93,6 +141,12 @@ class OllamaChatGUI:
         self.load_log_button.pack(side=tk.TOP, anchor=tk.W, pady=(0, 5))
         self.toggle_log_button = ttk.Checkbutton(self.chat_log_mgmt_frame, text="Show Log View", variable=self.log_view_visible, command=self.toggle_log_view, onvalue=True, offvalue=False)
         self.toggle_log_button.pack(side=tk.TOP, anchor=tk.W)
+        self.follow_log_button = ttk.Checkbutton(self.chat_log_mgmt_frame, text="Follow Log", variable=self.follow_log, command=self.on_follow_log_toggled, onvalue=True, offvalue=False)
+        self.follow_log_button.pack(side=tk.TOP, anchor=tk.W)
+        self.compact_history_button = ttk.Checkbutton(self.chat_log_mgmt_frame, text="Compact Old Turns", variable=self.compact_history_enabled, onvalue=True, offvalue=False)
+        self.compact_history_button.pack(side=tk.TOP, anchor=tk.W)
+        self.log_rag_button = ttk.Checkbutton(self.chat_log_mgmt_frame, text="Ask About Log", variable=self.log_rag_enabled, command=self._update_log_rag_index, onvalue=True, offvalue=False)
+        self.log_rag_button.pack(side=tk.TOP, anchor=tk.W)
 
         # --- Main Content Area: PanedWindow ---
         self.main_content_frame = ttk.PanedWindow(master, orient=tk.HORIZONTAL)
@@ -104,18 +158,26 @@ class OllamaChatGUI:
         self.system_prompt_input = scrolledtext.ScrolledText(self.left_column_frame, height=4, wrap=tk.WORD, font=("Arial", 10))
         self.system_prompt_input.pack(padx=0, pady=(0,10), fill=tk.X)
         ttk.Label(self.left_column_frame, text="Loaded Log File Content:").pack(padx=0, anchor=tk.W)
-        self.log_display = scrolledtext.ScrolledText(self.left_column_frame, wrap=tk.WORD, state='disabled', font=("Courier New", 9), bg="#F8F8F8")
-        self.log_display.pack(padx=0, pady=(0,10), fill=tk.BOTH, expand=True)
+        self.log_display = LogViewer(self.left_column_frame)
+        self.log_search = LogSearchPanel(self.left_column_frame, self.log_display)
+        self.log_search.pack(side=tk.BOTTOM, padx=0, pady=(0,10), fill=tk.X)
+        self.log_display.pack(padx=0, pady=(0,5), fill=tk.BOTH, expand=True)
 
         # Right Pane
         self.right_column_frame = ttk.Frame(self.main_content_frame)
-        self.chat_history_display = scrolledtext.ScrolledText(self.right_column_frame, wrap=tk.WORD, state='disabled', font=("Arial", 10))
-        self.chat_history_display.pack(padx=0, pady=0, fill=tk.BOTH, expand=True)
+        self.chat_area_frame = ttk.Frame(self.right_column_frame)
+        self.chat_area_frame.pack(fill=tk.BOTH, expand=True)
+        self.metrics_panel = MetricsPanel(self.chat_area_frame)
+        self.metrics_panel.pack(side=tk.RIGHT, fill=tk.Y, padx=(5, 0))
+        self.chat_history_display = scrolledtext.ScrolledText(self.chat_area_frame, wrap=tk.WORD, state='disabled', font=("Arial", 10))
+        self.chat_history_display.pack(side=tk.LEFT, padx=0, pady=0, fill=tk.BOTH, expand=True)
         self.input_frame = ttk.Frame(self.right_column_frame, padding="10")
         self.input_frame.pack(fill=tk.X)
         self.user_input = scrolledtext.ScrolledText(self.input_frame, height=3, wrap=tk.WORD, font=("Arial", 10))
         self.user_input.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 10))
         self.user_input.bind("<Return>", self.send_message_on_enter)
+        self.stop_button = ttk.Button(self.input_frame, text="Stop", command=self.stop_generation, state=tk.DISABLED)
+        self.stop_button.pack(side=tk.RIGHT, padx=(5, 0))
         self.send_button = ttk.Button(self.input_frame, text="Send", command=self.send_message)
         self.send_button.pack(side=tk.RIGHT)
 
@@ -127,11 +189,16 @@ class OllamaChatGUI:
         self.chat_history_display.tag_config("user_tag", foreground="navy", font=("Arial", 10, "bold"))
         self.chat_history_display.tag_config("model_tag", foreground="#006400", font=("Arial", 10, "bold")) # Dark Green
         self.chat_history_display.tag_config("error_tag", foreground="red", font=("Arial", 10, "bold"))
+        self.transcript = TranscriptPager(self.chat_history_display, self._insert_history_message)
 
         # --- Initialization ---
         self.load_app_config()
-        self.load_models()
+        self.load_models(force=False)
         self.load_system_prompts()
+        # A config that never got saved (first run, or a crash before any session switch) names no session.
+        recover_id = self.last_session_id or latest_session_id(SESSIONS_DIR)
+        if self.auto_recover_session and recover_id:
+            self._load_session(SESSIONS_DIR, recover_id, recovered=True)
         self.main_content_frame.add(self.left_column_frame, weight=1)
         self.main_content_frame.add(self.right_column_frame, weight=2)
         self.toggle_log_view()
@@ -147,6 +214,15 @@ class OllamaChatGUI:
     def on_closing(self):
         """Handle window closing event."""
         self.save_app_config()
+        self.log_search.cancel()
+        if self.log_rag_index is not None:
+            self.log_rag_index.cancel()
+        self.log_display.close()
+        self.engine.shutdown()
+        self.endpoint_pool.stop()
+        self.session_journal.close()
+        self.metrics_recorder.close()
+        self.state_store.close()
         self.master.destroy()
 
     # ADDED: New method to calculate and set the window's optimal initial size.
@@ -170,10 +246,27 @@ class OllamaChatGUI:
     def load_app_config(self):
         try:
             if os.path.exists(APP_CONFIG_FILE):
-                with open(APP_CONFIG_FILE, 'r') as f:
-                    config = json.load(f)
-                    self.last_loaded_log_path.set(config.get("last_log_file_path", ""))
-                    self.log_view_visible.set(config.get("log_view_visible", True))
+                config = self.state_store.read(APP_CONFIG_FILE)
+                self.last_loaded_log_path.set(config.get("last_log_file_path", ""))
+                self.log_view_visible.set(config.get("log_view_visible", True))
+                self.follow_log.set(config.get("follow_log", False))
+                self.log_search.use_index.set(config.get("log_search_index", False))
+                self.log_rag_enabled.set(config.get("log_rag", False))
+                self.embedding_model = config.get("embedding_model", DEFAULT_EMBEDDING_MODEL)
+                self.log_rag_max_tokens = config.get("log_rag_max_tokens", RAG_MAX_TOKENS)
+                for model, tokens in config.get("context_sizes", {}).items():
+                    self.context_budget.set_context_size(model, tokens)
+                self.compact_history_enabled.set(config.get("compact_history", False))
+                self.summary_model = config.get("summary_model", "")
+                self.response_cache.max_temperature = config.get("response_cache_max_temperature")
+                self.model_warmer.load_usage(config.get("model_usage", {}))
+                self.metrics_recorder.fmt = config.get("metrics_format", "jsonl")
+                default_metrics_file = PROMETHEUS_METRICS_FILE if self.metrics_recorder.fmt == "prometheus" else METRICS_FILE
+                self.metrics_recorder.path = config.get("metrics_file", default_metrics_file)
+                self.auto_recover_session = config.get("auto_recover_session", True)
+                self.last_session_id = config.get("last_session_id", "")
+                self.chats_directory = config.get("chats_directory", "")
+                self.engine.set_max_concurrent(config.get("max_concurrent_streams", MAX_CONCURRENT_STREAMS))
             else:
                 self.log_view_visible.set(True)
         except (json.JSONDecodeError, IOError) as e:
@@ -182,82 +275,134 @@ class OllamaChatGUI:
     def save_app_config(self):
         config = {
             "last_log_file_path": self.last_loaded_log_path.get(),
-            "log_view_visible": self.log_view_visible.get()
+            "log_view_visible": self.log_view_visible.get(),
+            "follow_log": self.follow_log.get(),
+            "log_search_index": self.log_search.use_index.get(),
+            "log_rag": self.log_rag_enabled.get(),
+            "embedding_model": self.embedding_model,
+            "log_rag_max_tokens": self.log_rag_max_tokens,
+            "context_sizes": self.context_budget.budgets,
+            "compact_history": self.compact_history_enabled.get(),
+            "summary_model": self.summary_model,
+            "response_cache_max_temperature": self.response_cache.max_temperature,
+            "model_usage": self.model_warmer.usage,
+            "metrics_format": self.metrics_recorder.fmt,
+            "metrics_file": self.metrics_recorder.path,
+            "auto_recover_session": self.auto_recover_session,
+            "last_session_id": self.session_journal.session_id,
+            "chats_directory": self.chats_directory,
+            "max_concurrent_streams": self.engine.max_concurrent,
+            ENDPOINTS_CONFIG_KEY: self.endpoint_pool.hosts
         }
-        try:
-            with open(APP_CONFIG_FILE, 'w') as f:
-                json.dump(config, f, indent=4)
-        except IOError as e:
-            print(f"Warning: Could not save config file: {e}")
-
-    def load_models(self):
+        # Merged into the file, so keys written by the other GUI (window layout and such) survive.
+        self.state_store.update(APP_CONFIG_FILE, config)
+
+    def load_models(self, force=True):
+        """Shows the cached model list at once and refreshes it from Ollama in the background."""
+        cached_names = self.model_registry.cached_names()
+        if cached_names:
+            self._apply_model_names(cached_names)
+        if not force and self.model_registry.is_fresh():
+            return
         self.status_bar.config(text="Fetching models from Ollama...")
-        try:
-            models_info = ollama.list()
-            model_names = []
-            if 'models' in models_info and isinstance(models_info['models'], list):
-                for m in models_info['models']:
-                    if 'model' in m and isinstance(m['model'], str):
-                        model_names.append(m['model'])
-
-            if not model_names:
+        self.model_registry.refresh(lambda result: self.response_queue.put(('models_loaded', result)))
+
+    def _on_models_loaded(self, result):
+        error = result.get('error')
+        if error is None:
+            self._apply_model_names(result['models'], warn_if_empty=True)
+        elif result['models']:
+            self.status_bar.config(text=f"Could not reach Ollama ({error}). Using cached model list.")
+        elif isinstance(error, ollama.ResponseError):
+            messagebox.showerror("Ollama Error", f"Failed to connect to Ollama: {error}\nPlease ensure Ollama service is running.", parent=self.master)
+            self.status_bar.config(text="Error connecting to Ollama.")
+        else:
+            messagebox.showerror("Error", f"An unexpected error occurred while loading models: {error}", parent=self.master)
+            self.status_bar.config(text="Error loading models.")
+
+    def _apply_model_names(self, model_names, warn_if_empty=False):
+        if not model_names:
+            if warn_if_empty:
                 messagebox.showwarning("No Models Found", "No Ollama models found. Please pull a model (e.g., 'ollama pull llama3.1:8b') and ensure Ollama is running.", parent=self.master)
-                self.model_dropdown['values'] = []
-                self.model_name.set("")
-                self.status_bar.config(text="No models loaded.")
-                return
+            self.model_dropdown['values'] = []
+            self.model_name.set("")
+            self.status_bar.config(text="No models loaded.")
+            return
 
-            self.model_dropdown['values'] = model_names
-            preferred_models = ['llama3.1:8b', 'llama3:8b']
-            current_selection = self.model_name.get()
-            
-            if current_selection in model_names:
-                return
+        self.model_dropdown['values'] = model_names
+        preferred_models = ['llama3.1:8b', 'llama3:8b']
+        current_selection = self.model_name.get()
 
-            for model in preferred_models:
-                if model in model_names:
-                    self.model_name.set(model)
-                    break
-            else:
-                self.model_name.set(model_names[0])
-            self.status_bar.config(text=f"Models loaded. Current model: {self.model_name.get()}")
-        except ollama.ResponseError as e:
-            messagebox.showerror("Ollama Error", f"Failed to connect to Ollama: {e}\nPlease ensure Ollama service is running.", parent=self.master)
-            self.status_bar.config(text="Error connecting to Ollama.")
-        except Exception as e:
-            messagebox.showerror("Error", f"An unexpected error occurred while loading models: {e}", parent=self.master)
-            self.status_bar.config(text="Error loading models.")
+        if current_selection in model_names:
+            self.status_bar.config(text=f"Models loaded. Current model: {current_selection}")
+            return
+
+        for model in preferred_models:
+            if model in model_names:
+                self.model_name.set(model)
+                break
+        else:
+            self.model_name.set(model_names[0])
+        self.status_bar.config(text=f"Models loaded. Current model: {self.model_name.get()}")
+        self._activate_selected_model()
+
+    def compare_models(self):
+        models = list(self.model_dropdown['values'])
+        if not models:
+            messagebox.showinfo("No Models", "No models are available to compare yet.", parent=self.master)
+            return
+        ModelCompareWindow(self.master, self.engine, self.endpoint_pool, models, selected=[self.model_name.get()],
+                           prompt=self.user_input.get("1.0", tk.END).strip(),
+                           system_prompt=self.system_prompt_input.get("1.0", tk.END).strip(),
+                           temperature=self.temperature_var.get())
 
     def on_model_select(self, event):
-        self.status_bar.config(text=f"Selected model: {self.model_name.get()}. Chat history will be cleared on next message.")
+        self._activate_selected_model()
+        self.status_bar.config(text=f"Selected model: {self.model_name.get()} ({self.model_warmer.state(self.model_name.get())}). Chat history will be cleared on next message.")
         self.conversation_history = []
+        self.compactor.reset()
+        self.session_journal.start_new()
+        self._remember_session()
         self.clear_chat_display()
 
+    def _remember_session(self):
+        """Records the journal's session in the config now, so a crash still recovers this session and not an older one."""
+        self.state_store.update(APP_CONFIG_FILE, {"last_session_id": self.session_journal.session_id})
+
+    def _activate_selected_model(self):
+        """Preloads the selected model in the background and releases the previous one."""
+        model = self.model_name.get()
+        previous, self.active_model = self.active_model, model
+        self.model_warmer.select(model, previous, lambda result: self.response_queue.put(('model_warmed', result)))
+
+    def _on_model_warmed(self, result):
+        if self.generation_status:
+            return
+        if 'error' in result:
+            self.status_bar.config(text=f"Could not preload {result['model']}: {result['error']}")
+        elif result['model'] == self.model_name.get():
+            self.status_bar.config(text=f"Model {result['model']} is warm (loaded in {result['load_time']:.1f}s).")
+
     def on_temperature_change(self, value):
         self.temperature_label.config(text=f"{float(value):.2f}")
 
     def load_system_prompts(self):
         try:
             if os.path.exists(SYSTEM_PROMPTS_FILE):
-                with open(SYSTEM_PROMPTS_FILE, 'r') as f:
-                    self.system_prompts = json.load(f)
+                self.system_prompts = read_prompts(SYSTEM_PROMPTS_FILE)
             else:
-                self.system_prompts = dict(PREDEFINED_PROMPTS)
+                self.system_prompts = dict(DEFAULT_SYSTEM_PROMPTS)
                 self.save_system_prompts()
         except (json.JSONDecodeError, IOError) as e:
             messagebox.showerror("File Error", f"Error reading {SYSTEM_PROMPTS_FILE}: {e}. Restoring defaults.", parent=self.master)
-            self.system_prompts = dict(PREDEFINED_PROMPTS)
+            self.system_prompts = dict(DEFAULT_SYSTEM_PROMPTS)
         self.update_prompt_dropdown()
         if "Default" in self.system_prompts:
             self.system_prompt_name.set("Default")
             self.on_prompt_select(None)
 
     def save_system_prompts(self):
-        try:
-            with open(SYSTEM_PROMPTS_FILE, 'w') as f:
-                json.dump(self.system_prompts, f, indent=4)
-        except IOError as e:
-            messagebox.showerror("Save Error", f"Failed to save system prompts: {e}", parent=self.master)
+        self.state_store.set(SYSTEM_PROMPTS_FILE, self.system_prompts)
 
     def update_prompt_dropdown(self):
         self.prompt_dropdown['values'] = sorted(list(self.system_prompts.keys()))
@@ -316,7 +461,7 @@ class OllamaChatGUI:
 
     def restore_default_prompts(self):
         if messagebox.askyesno("Restore Defaults", "This will replace all current prompts with the application defaults. Are you sure?", parent=self.master):
-            self.system_prompts = dict(PREDEFINED_PROMPTS)
+            self.system_prompts = dict(DEFAULT_SYSTEM_PROMPTS)
             self.save_system_prompts()
             self.update_prompt_dropdown()
             self.system_prompt_name.set("Default")
@@ -325,13 +470,21 @@ class OllamaChatGUI:
 
     def clear_chat_display(self):
         """Clears only the visual chat display."""
-        self.chat_history_display.config(state='normal')
-        self.chat_history_display.delete("1.0", tk.END)
-        self.chat_history_display.config(state='disabled')
+        self.transcript.show([])
+
+    def _insert_history_message(self, index, message):
+        tag = "user_tag" if message['role'] == 'user' else "model_tag"
+        sender = "You" if message['role'] == 'user' else "Model"
+        self.chat_history_display.insert(index, f"{sender}:\n", (tag,))
+        self.chat_history_display.insert(index, f"{message['content']}\n\n")
 
     def clear_chat_session(self):
         if messagebox.askyesno("Clear Chat", "Are you sure you want to clear the current chat history?", parent=self.master):
             self.conversation_history = []
+            self.compactor.reset()
+            self.prompt_queue.clear()
+            self.session_journal.start_new()
+            self._remember_session()
             self.clear_chat_display()
             self.status_bar.config(text="Chat history cleared.")
 
@@ -346,50 +499,108 @@ class OllamaChatGUI:
                     "system_prompt_used": self.system_prompt_input.get("1.0", tk.END).strip(),
                     "model_used": self.model_name.get(),
                     "temperature_used": self.temperature_var.get(),
-                    "conversation_history": self.conversation_history
+                    "conversation_history": self.conversation_history,
+                    "compaction": self.compactor.to_dict()
                 }
                 with open(file_path, 'w', encoding='utf-8') as f:
                     json.dump(data_to_save, f, indent=4, ensure_ascii=False)
+                self.chats_directory = os.path.dirname(file_path)
                 self.status_bar.config(text=f"Chat saved to {os.path.basename(file_path)}")
             except Exception as e:
                 messagebox.showerror("Save Error", f"Failed to save chat: {e}", parent=self.master)
 
     def load_chat(self):
-        file_path = filedialog.askopenfilename(parent=self.master, defaultextension=".json", filetypes=[("JSON files", "*.json")], title="Load Chat")
+        file_path = filedialog.askopenfilename(parent=self.master, defaultextension=".json", filetypes=[("JSON files", "*.json"), ("Session journals", "*.jsonl")], title="Load Chat")
         if file_path:
             try:
                 if self.conversation_history and not messagebox.askyesno("Load Chat", "Loading a new chat will clear the current conversation. Continue?", parent=self.master):
                     return
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    loaded_data = json.load(f)
-                
-                self.conversation_history = loaded_data.get("conversation_history", [])
-                
-                status_parts = []
-                loaded_model = loaded_data.get("model_used")
-                if loaded_model and loaded_model in self.model_dropdown['values']:
-                    self.model_name.set(loaded_model)
-                    status_parts.append(f"Model: {loaded_model}")
-                else:
-                    status_parts.append("Model not found")
+                if file_path.endswith(".jsonl"):
+                    session_id = os.path.splitext(os.path.basename(file_path))[0]
+                    self._load_session(os.path.dirname(file_path), session_id)
+                    return
+                self._load_chat_file(file_path)
+            except Exception as e:
+                messagebox.showerror("Load Error", f"Failed to load chat: {e}", parent=self.master)
 
-                loaded_temp = loaded_data.get("temperature_used")
-                if loaded_temp is not None:
-                    self.temperature_var.set(loaded_temp)
-                    self.on_temperature_change(loaded_temp)
-                    status_parts.append(f"Temp: {loaded_temp:.2f}")
+    def _load_chat_file(self, file_path):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            loaded_data = json.load(f)
+
+        self.conversation_history = loaded_data.get("conversation_history", [])
+        self.compactor.load(loaded_data.get("compaction"))
+        status_parts = self._apply_loaded_settings(loaded_data.get("system_prompt_used", ""), loaded_data.get("model_used"), loaded_data.get("temperature_used"))
+        self.session_journal.start_new(self.conversation_history, meta={
+            "system_prompt": loaded_data.get("system_prompt_used", ""),
+            "model": loaded_data.get("model_used"),
+            "temperature": loaded_data.get("temperature_used")
+        })
+        self._remember_session()
+        self.chats_directory = os.path.dirname(file_path)
+
+        self.transcript.show(self.conversation_history)
+        self.status_bar.config(text=f"Chat loaded from {os.path.basename(file_path)} | " + " | ".join(status_parts) + self._hidden_messages_note())
+
+    def search_chats(self):
+        ChatSearchDialog(self.master, self.chats_directory or os.getcwd(), self._open_chat_at, self.embedding_model, self.endpoint_pool)
+
+    def _open_chat_at(self, file_path, message_index):
+        """Opens a saved chat from the search dialog and scrolls to the matching message."""
+        if self.generating:
+            messagebox.showinfo("Busy", "Wait for the current response to finish before opening another chat.", parent=self.master)
+            return
+        if self.conversation_history and not messagebox.askyesno("Load Chat", "Loading a new chat will clear the current conversation. Continue?", parent=self.master):
+            return
+        try:
+            self._load_chat_file(file_path)
+        except Exception as e:
+            messagebox.showerror("Load Error", f"Failed to load chat: {e}", parent=self.master)
+            return
+        self.transcript.reveal(message_index)
+
+    def _apply_loaded_settings(self, system_prompt, model, temperature):
+        """Restores the model, temperature and system prompt of a loaded chat; returns status bar parts."""
+        status_parts = []
+        if model and model in self.model_dropdown['values']:
+            self.model_name.set(model)
+            status_parts.append(f"Model: {model}")
+        else:
+            status_parts.append("Model not found")
 
-                self.system_prompt_input.delete("1.0", tk.END)
-                self.system_prompt_input.insert(tk.END, loaded_data.get("system_prompt_used", ""))
-                self.system_prompt_name.set("")
+        if temperature is not None:
+            self.temperature_var.set(temperature)
+            self.on_temperature_change(temperature)
+            status_parts.append(f"Temp: {temperature:.2f}")
 
-                self.clear_chat_display()
-                for msg in self.conversation_history:
-                    self.response_queue.put(('history_message', msg))
-                
-                self.status_bar.config(text=f"Chat loaded from {os.path.basename(file_path)} | " + " | ".join(status_parts))
-            except Exception as e:
-                messagebox.showerror("Load Error", f"Failed to load chat: {e}", parent=self.master)
+        self.system_prompt_input.delete("1.0", tk.END)
+        self.system_prompt_input.insert(tk.END, system_prompt or "")
+        self.system_prompt_name.set("")
+        return status_parts
+
+    def _load_session(self, directory, session_id, recovered=False):
+        """Streams a session journal into the chat from a background thread and keeps appending to it."""
+        self.conversation_history = []
+        self.compactor.reset()
+        self.clear_chat_display()
+        self.status_bar.config(text=f"Loading session {session_id}...")
+        self._set_ui_state(tk.DISABLED)
+
+        def read_session():
+            meta = {}
+            count = 0
+            try:
+                for kind, record in iter_session(directory, session_id):
+                    if kind == 'meta':
+                        meta.update(record)
+                        continue
+                    self.response_queue.put(('add_to_history', {'role': record['role'], 'content': record['content']}))
+                    count += 1
+            except OSError as e:
+                self.response_queue.put(('error', f"Failed to load session {session_id}: {e}"))
+            self.response_queue.put(('session_loaded', {'directory': directory, 'session_id': session_id, 'meta': meta,
+                                                        'count': count, 'recovered': recovered}))
+
+        threading.Thread(target=read_session, daemon=True).start()
 
     def load_log_file(self):
         file_path = filedialog.askopenfilename(parent=self.master, title="Select Log File", filetypes=[("Log files", "*.log *.txt"), ("All files", "*.*")])
@@ -400,30 +611,52 @@ class OllamaChatGUI:
         try:
             if not os.path.exists(file_path):
                 messagebox.showwarning("File Not Found", f"The log file '{os.path.basename(file_path)}' was not found.", parent=self.master)
-                self.log_content = ""
+                self.log_display.close()
                 self.last_loaded_log_path.set("")
-                self._update_log_display()
+                self._update_log_path_label()
                 return
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                self.log_content = f.read()
+            # Memory-mapped and indexed in the background: the file is never read into memory whole.
+            self.log_display.set_follow(self.follow_log.get())
+            self.log_display.open(file_path)
+            self.log_search.reset()
+            self._update_log_rag_index()
             self.last_loaded_log_path.set(file_path)
-            self._update_log_display()
+            self._update_log_path_label()
             self.status_bar.config(text=f"Log file loaded: {os.path.basename(file_path)}")
         except Exception as e:
             messagebox.showerror("Log Load Error", f"Failed to load log file: {e}", parent=self.master)
-            self.log_content = ""
+            self.log_display.close()
             self.last_loaded_log_path.set("")
-            self._update_log_display()
-
-    def _update_log_display(self):
-        self.log_display.config(state='normal')
-        self.log_display.delete("1.0", tk.END)
-        self.log_display.insert(tk.END, self.log_content)
-        self.log_display.config(state='disabled')
-        self.log_display.see(tk.END)
+            self._update_log_path_label()
+
+    def _update_log_path_label(self):
         base_name = os.path.basename(self.last_loaded_log_path.get()) if self.last_loaded_log_path.get() else "None"
         self.last_log_path_label.config(text=base_name)
 
+    def _update_log_rag_index(self):
+        """Starts embedding the loaded log when Ask About Log is on, reusing the index if it is for the same file."""
+        path = self.log_display.path
+        if self.log_rag_enabled.get() and path:
+            if self.log_rag_index is None or self.log_rag_index.path != path:
+                if self.log_rag_index is not None:
+                    self.log_rag_index.cancel()
+                self.log_rag_index = LogEmbeddingIndex(path, self.embedding_model, self.endpoint_pool).start(self._on_log_rag_progress)
+        elif self.log_rag_index is not None:
+            self.log_rag_index.cancel()
+            self.log_rag_index = None
+
+    def _on_log_rag_progress(self, log_index):
+        if log_index.error is not None:
+            text = f"Could not embed the log with {log_index.model}: {log_index.error}"
+        elif log_index.ready:
+            text = f"Log ready for questions ({log_index.total} chunks embedded with {log_index.model})."
+        else:
+            text = f"Embedding log: {log_index.embedded}/{log_index.total} chunks..."
+        self.response_queue.put(('log_index_progress', (log_index, text)))
+
+    def on_follow_log_toggled(self):
+        self.log_display.set_follow(self.follow_log.get())
+
     def toggle_log_view(self):
         is_visible = self.log_view_visible.get()
         log_pane_target_width = 350
@@ -431,7 +664,7 @@ class OllamaChatGUI:
             self.main_content_frame.sashpos(0, log_pane_target_width)
             self.master.geometry("1100x900")
             self.toggle_log_button.config(text="Hide Log View")
-            if self.last_loaded_log_path.get() and not self.log_content:
+            if self.last_loaded_log_path.get() and not self.log_display.path:
                 self._load_and_display_log_file(self.last_loaded_log_path.get())
         else:
             self.main_content_frame.sashpos(0, 0)
@@ -440,104 +673,310 @@ class OllamaChatGUI:
 
     def send_message_on_enter(self, event):
         if event.keysym == "Return" and not (event.state & 0x1):
-            self.send_message()
+            # Ctrl+Enter puts the prompt ahead of the ones already queued.
+            self.send_message(PRIORITY_HIGH if event.state & 0x4 else PRIORITY_NORMAL)
             return "break"
         return None
 
-    def _set_ui_state(self, state):
-        """Helper function to enable/disable UI controls."""
-        widgets = [
-            self.send_button, self.user_input, self.model_dropdown, self.temperature_scale,
+    def _set_ui_state(self, state, keep_input=False):
+        """Helper function to enable/disable UI controls.
+
+        With keep_input the prompt box and Send stay usable, so prompts can be queued while a reply streams.
+        """
+        widgets = [] if keep_input else [self.send_button, self.user_input]
+        widgets += [
+            self.model_dropdown, self.temperature_scale,
             self.system_prompt_input, self.add_prompt_button, self.update_prompt_button,
             self.delete_prompt_button, self.restore_defaults_button, self.prompt_dropdown,
-            self.save_chat_button, self.load_chat_button, self.clear_chat_button,
-            self.load_log_button, self.toggle_log_button, self.refresh_models_button
+            self.save_chat_button, self.load_chat_button, self.clear_chat_button, self.search_chats_button,
+            self.load_log_button, self.toggle_log_button, self.follow_log_button, self.refresh_models_button,
+            self.compact_history_button, self.log_rag_button
         ]
         for widget in widgets:
             if isinstance(widget, ttk.Combobox):
                 widget.config(state='readonly' if state == tk.NORMAL else tk.DISABLED)
             else:
                 widget.config(state=state)
+        self.stop_button.config(state=tk.NORMAL if state == tk.DISABLED else tk.DISABLED)
 
-    def send_message(self):
+    def send_message(self, priority=PRIORITY_NORMAL):
         user_text = self.user_input.get("1.0", tk.END).strip()
         if not user_text: return
         current_model = self.model_name.get()
         if not current_model:
             messagebox.showwarning("No Model Selected", "Please select an Ollama model.", parent=self.master)
             return
+        self.user_input.delete("1.0", tk.END)
+        if self.generating or len(self.prompt_queue):
+            queued = self.prompt_queue.push(user_text, priority)
+            self.status_bar.config(text=("Prompt queued: " if queued else "Already queued: ") + self.prompt_queue.status_text())
+            return
+        self._send_prompt(user_text, current_model)
 
+    def _send_next_prompt(self):
+        """Sends the next queued prompt once the previous reply has finished."""
+        if self.generating or not len(self.prompt_queue):
+            return
+        entry = self.prompt_queue.pop()
+        self._send_prompt(entry['text'], self.model_name.get())
+
+    def _send_prompt(self, user_text, current_model):
         self.chat_history_display.config(state='normal')
         self.chat_history_display.insert(tk.END, f"You:\n", ("user_tag",))
         self.chat_history_display.insert(tk.END, f"{user_text}\n\n")
         self.chat_history_display.config(state='disabled')
         self.chat_history_display.see(tk.END)
-        self.user_input.delete("1.0", tk.END)
 
         system_prompt = self.system_prompt_input.get("1.0", tk.END).strip()
         messages_to_send = []
         if system_prompt:
             messages_to_send.append({'role': 'system', 'content': system_prompt})
-        messages_to_send.extend(self.conversation_history)
+        if self.compact_history_enabled.get():
+            messages_to_send.extend(self.compactor.compacted(self.conversation_history))
+        else:
+            messages_to_send.extend(self.conversation_history)
         messages_to_send.append({'role': 'user', 'content': user_text})
-
-        self.status_bar.config(text=f"Generating response from {current_model}...")
-        self._set_ui_state(tk.DISABLED)
-
-        self.running_thread = threading.Thread(target=self._get_llm_response,
-            args=(messages_to_send, current_model, self.temperature_var.get(), user_text))
-        self.running_thread.start()
-
-    def _get_llm_response(self, messages, model, temperature, user_text):
-        current_ai_response = ""
+        messages_to_send, prompt_tokens, dropped = self.context_budget.fit(messages_to_send, current_model)
+        self.session_journal.set_meta(system_prompt=system_prompt, model=current_model, temperature=self.temperature_var.get())
+
+        self.generation_status = f"Generating response from {current_model} [{self.model_warmer.state(current_model)}] (prompt ~{prompt_tokens}/{self.context_budget.budget_for(current_model)} tokens"
+        self.generation_status += f", {dropped} older messages omitted)..." if dropped else ")..."
+        self.status_bar.config(text=self.generation_status)
+        self._set_ui_state(tk.DISABLED, keep_input=True)
+
+        temperature = self.temperature_var.get()
+        # Journaled now rather than with the reply, so a crash mid-generation does not lose the prompt.
+        self.session_journal.append_message({'role': 'user', 'content': user_text}, model=current_model,
+                                            options={'temperature': temperature})
+        keep_alive = self.model_warmer.keep_alive_for(current_model)
+        log_index = self.log_rag_index if self.log_rag_enabled.get() else None
+        self.generating = True
+        self.request_id = request_id = next(self._request_ids)
+        self.chat_task = self.engine.submit(
+            "main",
+            lambda client: self._get_llm_response(
+                client, request_id, messages_to_send, current_model, temperature, user_text, keep_alive, log_index),
+            on_done=lambda: self.response_queue.put(('reply', (request_id, 'reply_finished', None))))
+
+    def stop_generation(self):
+        """Aborts the in-flight request and keeps the partial answer, without waiting for it to wind down.
+
+        Cancelling the task closes the HTTP stream; the UI comes back when the
+        request's 'reply_finished' arrives, which is almost at once.
+        """
+        if not self.generating:
+            return
+        self.chat_task.cancel()
+        self.generation_status = ""
+        self.stop_button.config(state=tk.DISABLED)
+        self.status_bar.config(text="Generation stopped. Partial answer kept in the conversation.")
+
+    async def _get_llm_response(self, client, request_id, messages, model, temperature, user_text, keep_alive, log_index=None):
+        """Streams the reply on the chat engine's loop, handing everything to the UI through the response queue."""
+        def post(task_type, data):
+            self.response_queue.put(('reply', (request_id, task_type, data)))
+
+        accumulator = StreamAccumulator()
+        options = {'temperature': temperature}
+        loop = asyncio.get_running_loop()
+        cached = None
+        completed = False
+        cancelled = False
         try:
-            stream = ollama.chat(model=model, messages=messages, options={'temperature': temperature}, stream=True)
-            self.response_queue.put(('start_response', "Model"))
-            for chunk in stream:
+            if log_index is not None:
+                # Embedding the question is a blocking call; keep it off the loop.
+                messages = await loop.run_in_executor(
+                    None, self._with_log_context, messages, model, user_text, log_index)
+            key = cache_key(model, options, messages) if self.response_cache.enabled_for(options) else None
+            # The cache reads and writes files: keep that off the loop other requests stream on.
+            cached = await loop.run_in_executor(None, self.response_cache.get, key) if key else None
+            if cached is not None:
+                # Replay the cached reply through the same streaming path as a live response.
+                stream = replay_stream(cached['content'])
+            else:
+                stream = chat_stream(client, model=model, messages=messages, options=options, keep_alive=keep_alive)
+            post('start_response', "Model")
+            last_chunk = None
+            async for chunk in stream:
+                last_chunk = chunk
                 token = chunk['message']['content']
                 if token:
-                    self.response_queue.put(('token', token))
-                    current_ai_response += token
-            self.response_queue.put(('add_to_history', {'role': 'user', 'content': user_text}))
-            self.response_queue.put(('add_to_history', {'role': 'assistant', 'content': current_ai_response}))
+                    post('token', (token, time.monotonic()))
+                    accumulator.append(token)
+            completed = True
+            if key and cached is None:
+                text = accumulator.text()
+                await loop.run_in_executor(None, lambda: self.response_cache.put(key, text, model=model))
+            stats = dict(accumulator.stats(), model=model, cached=cached is not None,
+                         load_duration=response_field(last_chunk, 'load_duration', 0) / 1e9,
+                         metrics=request_metrics(model, last_chunk, accumulator.stats()))
+            post('response_stats', stats)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
         except ollama.ResponseError as e:
-            self.response_queue.put(('error', f"Ollama Error: {e}\nCheck if model '{model}' is available and Ollama is running."))
+            post('error', f"Ollama Error: {e}\nCheck if model '{model}' is available and Ollama is running.")
         except Exception as e:
-            self.response_queue.put(('error', f"An unexpected error occurred: {e}"))
+            post('error', f"An unexpected error occurred: {e}")
         finally:
-            self.response_queue.put(('end_response', None))
+            # A stopped reply still becomes part of the conversation, up to the last token received.
+            user_message = {'role': 'user', 'content': user_text}
+            if completed or (cancelled and accumulator.chunk_count):
+                assistant_message = {'role': 'assistant', 'content': accumulator.text()}
+                post('add_to_history', user_message)
+                post('add_to_history', assistant_message)
+                self.session_journal.append_message(assistant_message, model=model, options=options, timing=accumulator.stats(),
+                                                    cached=cached is not None, cancelled=not completed)
+            else:
+                # The prompt was journaled when sent but never joins the history; keep a recovery in step.
+                self.session_journal.abandon_message(user_message)
+            post('end_response', None)
+
+    def _with_log_context(self, messages, model, user_text, log_index):
+        """Adds the log excerpts relevant to the question before it, dropping older turns to make room."""
+        try:
+            context = log_index.context_message(user_text, min(self.log_rag_max_tokens, self.context_budget.budget_for(model) // 4))
+        except Exception as e:
+            self.response_queue.put(('log_index_progress', (log_index, f"Log search failed: {e}")))
+            return messages
+        if context is None:
+            return messages
+        messages, _, _ = self.context_budget.fit(messages[:-1] + [context, messages[-1]], model)
+        return messages
 
     def process_queue(self):
+        # Move whatever the worker produced into the render buffer, then render at most
+        # one frame of it: all pending tokens coalesced into a single insert.
+        self._drain_response_queue(MAX_QUEUE_ITEMS_PER_TICK)
+        self._render_frame(self.render_buffer.next_frame())
+        self._report_render_lag()
+        self.master.after(self.render_buffer.next_interval_ms(), self.process_queue)
+
+    def _drain_response_queue(self, max_items=None):
         try:
-            while True:
+            while max_items is None or max_items > 0:
                 task_type, data = self.response_queue.get_nowait()
-                self.chat_history_display.config(state='normal')
-
-                if task_type == 'start_response':
-                    self.chat_history_display.insert(tk.END, f"{data}:\n", ("model_tag",))
-                elif task_type == 'token':
-                    self.chat_history_display.insert(tk.END, data)
-                elif task_type == 'end_response':
-                    self.chat_history_display.insert(tk.END, "\n\n")
-                    self.status_bar.config(text=f"Response complete.")
-                    self._set_ui_state(tk.NORMAL)
-                elif task_type == 'add_to_history':
-                    self.conversation_history.append(data)
-                elif task_type == 'history_message':
-                    tag = "user_tag" if data['role'] == 'user' else "model_tag"
-                    sender = "You" if data['role'] == 'user' else "Model"
-                    self.chat_history_display.insert(tk.END, f"{sender}:\n", (tag,))
-                    self.chat_history_display.insert(tk.END, f"{data['content']}\n\n")
-                elif task_type == 'error':
-                    self.chat_history_display.insert(tk.END, f"\n\nERROR:\n{data}\n\n", ("error_tag",))
-                    self.status_bar.config(text="Error during generation.")
-                    self._set_ui_state(tk.NORMAL)
-                
-                self.chat_history_display.config(state='disabled')
-                self.chat_history_display.see(tk.END)
+                if max_items is not None:
+                    max_items -= 1
+                if task_type == 'reply':
+                    request_id, task_type, data = data
+                    if request_id != self.request_id:
+                        continue  # From a request that is no longer the one on screen.
+                if task_type == 'token':
+                    self.render_buffer.put(task_type, data[0], now=data[1])
+                else:
+                    self.render_buffer.put(task_type, data)
         except queue.Empty:
             pass
-        self.master.after(100, self.process_queue)
+
+    def _render_frame(self, frame):
+        if not frame:
+            return
+        self.chat_history_display.config(state='normal')
+        for task_type, data in frame:
+            self._render_queue_item(task_type, data)
+        self.chat_history_display.config(state='disabled')
+        self.chat_history_display.see(tk.END)
+
+    def _render_queue_item(self, task_type, data):
+        if task_type == 'text':
+            self.chat_history_display.insert(tk.END, data)
+        elif task_type == 'start_response':
+            self.render_buffer.reset_peak_lag()
+            self.chat_history_display.insert(tk.END, f"{data}:\n", ("model_tag",))
+        elif task_type == 'end_response':
+            self.chat_history_display.insert(tk.END, "\n\n")
+            if self.generation_status:
+                self.status_bar.config(text=f"Response complete.{self._format_response_stats()} Peak render lag: {self.render_buffer.peak_lag} tokens.")
+            self.generation_status = ""
+            self._maybe_compact_history()
+        elif task_type == 'reply_finished':
+            # The request is over however it ended: streamed, failed, or stopped (even before it started).
+            self.generating = False
+            self.chat_task = None
+            self._set_ui_state(tk.NORMAL)
+            # Not from inside the render loop: sending writes to the chat display itself.
+            self.master.after_idle(self._send_next_prompt)
+        elif task_type == 'add_to_history':
+            self.conversation_history.append(data)
+        elif task_type == 'models_loaded':
+            self._on_models_loaded(data)
+        elif task_type == 'model_warmed':
+            self._on_model_warmed(data)
+        elif task_type == 'response_stats':
+            if not data['cached']:
+                data['start_kind'] = self.model_warmer.record_request(data['model'], data['time_to_first_token'], data['load_duration'])
+            self.last_response_stats = data
+            metrics = dict(data['metrics'], peak_render_lag=self.render_buffer.peak_lag, cached=data['cached'])
+            self.metrics_panel.show(metrics)
+            self.metrics_recorder.record(metrics)
+        elif task_type == 'log_index_progress':
+            log_index, text = data
+            if log_index is self.log_rag_index and not self.generation_status:
+                self.status_bar.config(text=text)
+        elif task_type == 'session_loaded':
+            self._on_session_loaded(data)
+        elif task_type == 'compaction_done':
+            if self.compactor.apply(data):
+                self.status_bar.config(text=f"Compacted {data['end'] - data['start']} older messages into the conversation summary.")
+        elif task_type == 'error':
+            self.chat_history_display.insert(tk.END, f"\n\nERROR:\n{data}\n\n", ("error_tag",))
+            self.status_bar.config(text="Error during generation.")
+            self.generation_status = ""
+            self._set_ui_state(tk.NORMAL)
+
+    def _on_session_loaded(self, result):
+        if not result['count'] and result['recovered']:
+            # Nothing worth recovering; the new session starts empty.
+            self.status_bar.config(text="Ready.")
+            self._set_ui_state(tk.NORMAL)
+            return
+        meta = result['meta']
+        status_parts = self._apply_loaded_settings(meta.get('system_prompt', ""), meta.get('model'), meta.get('temperature'))
+        self.session_journal.resume(result['session_id'], meta=meta, directory=result['directory'])
+        self._remember_session()
+        self.transcript.show(self.conversation_history)
+        action = "Recovered last session" if result['recovered'] else "Session loaded"
+        self.status_bar.config(text=f"{action} ({result['count']} messages) | " + " | ".join(status_parts) + self._hidden_messages_note())
+        self._set_ui_state(tk.NORMAL)
+
+    def _hidden_messages_note(self):
+        if not self.transcript.hidden_count:
+            return ""
+        return f" | {self.transcript.hidden_count} older messages load when you scroll up"
+
+    def _maybe_compact_history(self):
+        if not self.compact_history_enabled.get():
+            return
+        model = self.summary_model or self.model_name.get()
+        if model:
+            self.compactor.start(self.conversation_history, model, lambda result: self.response_queue.put(('compaction_done', result)))
+
+    def _format_response_stats(self):
+        stats = self.last_response_stats
+        if not stats or stats['time_to_first_token'] is None:
+            return ""
+        if stats.get('cached'):
+            return " Served from response cache."
+        averages = self.model_warmer.first_token_averages(stats['model'])
+        text = f" First token: {stats['time_to_first_token']:.2f}s ({stats['start_kind']}"
+        for kind in ('warm', 'cold'):
+            if averages[kind] is not None:
+                text += f"; {kind} avg {averages[kind]:.2f}s"
+        text += ")."
+        if stats['mean_inter_token_latency'] is not None:
+            text += f" Inter-token: {stats['mean_inter_token_latency'] * 1000:.0f} ms."
+        return text
+
+    def _report_render_lag(self):
+        """Shows how far the display trails the model while a response is streaming."""
+        if not self.generation_status:
+            return
+        text = f"{self.generation_status} {self.render_buffer.token_rate:.0f} tok/s | Render lag: {self.render_buffer.lag} tokens"
+        if len(self.prompt_queue):
+            text += f" | {self.prompt_queue.status_text()}"
+        if text != self.status_bar.cget("text"):
+            self.status_bar.config(text=text)
 
 if __name__ == "__main__":
     root = tk.Tk()
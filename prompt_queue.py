@@ -0,0 +1,61 @@
+import itertools
+import time
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+
+
+def _normalized(text):
+    return " ".join(text.split())
+
+
+class PromptQueue:
+    """Prompts typed while a reply is still streaming, waiting for their turn.
+
+    pop() hands out the highest priority prompt first and, within a priority,
+    the one queued first. Pushing a prompt identical (ignoring whitespace) to
+    one already waiting does not queue it twice; it only raises the waiting
+    one's priority if the new push asked for a higher one. Used from the Tk
+    thread only.
+    """
+
+    def __init__(self):
+        self._pending = []
+        self._order = itertools.count()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def push(self, text, priority=PRIORITY_NORMAL, now=None):
+        """Queues text; returns False if the same prompt was already waiting."""
+        key = _normalized(text)
+        for entry in self._pending:
+            if entry['key'] == key:
+                entry['priority'] = min(entry['priority'], priority)
+                return False
+        self._pending.append({'text': text, 'key': key, 'priority': priority, 'order': next(self._order),
+                              'queued_at': time.monotonic() if now is None else now})
+        return True
+
+    def pop(self):
+        """The next prompt to send as a dict with text, priority and queued_at, or None when empty."""
+        if not self._pending:
+            return None
+        entry = min(self._pending, key=lambda e: (e['priority'], e['order']))
+        self._pending.remove(entry)
+        return entry
+
+    def clear(self):
+        self._pending = []
+
+    def oldest_wait(self, now=None):
+        if not self._pending:
+            return None
+        now = time.monotonic() if now is None else now
+        return now - min(e['queued_at'] for e in self._pending)
+
+    def status_text(self, now=None):
+        """Queue depth and longest wait for the status bar, or "" when nothing is queued."""
+        if not self._pending:
+            return ""
+        return f"{len(self._pending)} queued, oldest waiting {self.oldest_wait(now):.0f}s"
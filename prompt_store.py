@@ -0,0 +1,63 @@
+import json
+import os
+
+# System prompt files written by the two GUIs; the batch runner reads the same ones.
+SYSTEM_PROMPTS_FILE = "system_prompts.json"
+PROMPTS_FILE = "prompts.json"
+
+# What each GUI starts with when its prompt file does not exist yet.
+DEFAULT_SYSTEM_PROMPTS = {
+    "Default": "You are a helpful AI assistant.",
+    "Code Explainer": "You are a senior software engineer. Explain code snippets clearly and concisely. Provide examples where appropriate.",
+    "Creative Writer": "You are a creative writer. Generate imaginative stories, poems, or scripts based on the user's input.",
+    "Fact Checker": "You are a fact-checking AI. Provide accurate information and cite sources if possible.",
+    "Summarizer": "You are a text summarizer. Condense provided text into a brief and informative summary.",
+    "Spanish Translator": "You are an English to Spanish translator. Translate the given text accurately.",
+    "Joke Teller": "You are a comedian. Tell a short, family-friendly joke.",
+}
+DEFAULT_CHAT_PROMPTS = {
+    "Helpful assistant": "You are a helpful assistant.",
+    "Sarcastic friend": "You are a sarcastic, witty companion.",
+    "Technical expert": "You are a technical expert who explains concisely.",
+    "Custom": ""
+}
+DEFAULT_PROMPTS = {SYSTEM_PROMPTS_FILE: DEFAULT_SYSTEM_PROMPTS, PROMPTS_FILE: DEFAULT_CHAT_PROMPTS}
+
+
+def read_prompts(path):
+    """Reads one prompt file ({name: text}); raises OSError or json.JSONDecodeError like json.load."""
+    with open(path, 'r', encoding='utf-8') as f:
+        prompts = json.load(f)
+    if not isinstance(prompts, dict):
+        raise json.JSONDecodeError("Expected an object of name -> prompt", "", 0)
+    return prompts
+
+
+def load_prompt_store(paths=(SYSTEM_PROMPTS_FILE, PROMPTS_FILE)):
+    """Merges the prompt files; earlier files win on duplicate names.
+
+    A file that is missing or unreadable contributes the defaults its GUI
+    would use instead, so a name that works in the GUI works here too.
+    """
+    merged = {}
+    for path in reversed(paths):
+        prompts = DEFAULT_PROMPTS.get(os.path.basename(path), {})
+        if os.path.exists(path):
+            try:
+                prompts = read_prompts(path)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Warning: Could not read prompts from {path}: {e}. Using the defaults.")
+        merged.update(prompts)
+    return merged
+
+
+def resolve_system_prompt(record, prompts):
+    """System prompt text for a request: an explicit 'system_prompt', else a named one from the store."""
+    if record.get('system_prompt'):
+        return record['system_prompt']
+    name = record.get('system_prompt_name')
+    if name:
+        if name not in prompts:
+            raise KeyError(f"Unknown system prompt '{name}'")
+        return prompts[name]
+    return ""
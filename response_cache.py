@@ -0,0 +1,127 @@
+import collections
+import hashlib
+import json
+import os
+import re
+import threading
+
+RESPONSE_CACHE_DIR = "response_cache"
+
+
+def cache_key(model, options, messages):
+    """Stable hash of everything that determines a reply: model, options and the normalized messages."""
+    normalized = [
+        {'role': m.get('role', ''), 'content': (m.get('content') or '').strip()}
+        for m in messages
+    ]
+    payload = json.dumps({'model': model, 'options': options or {}, 'messages': normalized},
+                         sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def replay_chunks(text):
+    """Splits a cached reply into word-sized pieces so it can be fed through the streaming path."""
+    return re.findall(r'\S+\s*|\s+', text)
+
+
+async def replay_stream(text):
+    """A cached reply as an async stream of chat chunks, for requests running on the chat engine's loop."""
+    for token in replay_chunks(text):
+        yield {'message': {'content': token}}
+
+
+class ResponseCache:
+    """Two-tier cache of complete replies: an in-memory LRU in front of a size-bounded directory.
+
+    Caching is opt-in by temperature: only requests whose temperature is at or
+    below max_temperature are looked up or stored (None disables the cache).
+    Disk entries are one JSON file per key; reads refresh the file's mtime and
+    eviction removes the least recently used files once max_disk_bytes is exceeded.
+    """
+
+    def __init__(self, directory=RESPONSE_CACHE_DIR, max_temperature=None,
+                 memory_entries=128, max_disk_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_temperature = max_temperature
+        self.memory_entries = memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def enabled_for(self, options):
+        if self.max_temperature is None:
+            return False
+        return (options or {}).get('temperature', 0.8) <= self.max_temperature
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (OSError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self._remember(key, entry)
+            self.hits += 1
+        return entry
+
+    def put(self, key, content, **metadata):
+        entry = dict(metadata, content=content)
+        with self._lock:
+            self._remember(key, entry)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = self._path(key) + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+            self._evict()
+        except OSError as e:
+            print(f"Warning: Could not write response cache entry: {e}")
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        files = []
+        total = 0
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith('.json'):
+                    st = entry.stat()
+                    files.append((st.st_mtime, st.st_size, entry.path))
+                    total += st.st_size
+        if total <= self.max_disk_bytes:
+            return
+        for _, size, path in sorted(files):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_disk_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    os.remove(os.path.join(self.directory, name))
@@ -0,0 +1,239 @@
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+
+SESSIONS_DIR = "sessions"
+# Records written between fsync calls, and the longest a written record may wait for one.
+FSYNC_EVERY_RECORDS = 8
+FSYNC_INTERVAL_SECONDS = 1.0
+# Journal records after which the session is compacted into its snapshot.
+SNAPSHOT_EVERY_RECORDS = 200
+
+
+def new_session_id():
+    return datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+
+
+def journal_path(directory, session_id):
+    return os.path.join(directory, f"{session_id}.jsonl")
+
+
+def snapshot_path(directory, session_id):
+    return os.path.join(directory, f"{session_id}.snapshot.json")
+
+
+def _read_snapshot(directory, session_id):
+    try:
+        with open(snapshot_path(directory, session_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {'meta': {}, 'messages': [], 'last_seq': 0}
+
+
+def iter_session(directory, session_id):
+    """Lists a session as ('meta', dict) and ('message', dict) items: the snapshot first, then the journal.
+
+    Journal records already folded into the snapshot are skipped, and so is a
+    final line cut short by a crash. An 'abandoned' record removes the last
+    message with the same role and content, wherever it was read from.
+    """
+    snapshot = _read_snapshot(directory, session_id)
+    last_seq = snapshot.get('last_seq', 0)
+    items = [('meta', snapshot['meta'])] if snapshot.get('meta') else []
+    items.extend(('message', message) for message in snapshot.get('messages', []))
+    try:
+        f = open(journal_path(directory, session_id), 'r', encoding='utf-8')
+    except OSError:
+        return items
+    with f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get('seq', 0) <= last_seq:
+                continue
+            kind = record.pop('type', 'message')
+            record.pop('seq', None)
+            if kind == 'abandoned':
+                _drop_last_message(items, record)
+            else:
+                items.append((kind, record))
+    return items
+
+
+def _drop_last_message(items, abandoned):
+    target = (abandoned.get('role'), abandoned.get('content'))
+    for index in range(len(items) - 1, -1, -1):
+        kind, message = items[index]
+        if kind == 'message' and (message.get('role'), message.get('content')) == target:
+            del items[index]
+            return
+
+
+def latest_session_id(directory=SESSIONS_DIR):
+    """The most recently written session in directory, or None."""
+    latest = None
+    if not os.path.isdir(directory):
+        return None
+    for name in os.listdir(directory):
+        if name.endswith('.jsonl') or name.endswith('.snapshot.json'):
+            path = os.path.join(directory, name)
+            mtime = os.path.getmtime(path)
+            if latest is None or mtime > latest[0]:
+                latest = (mtime, name.split('.')[0])
+    return latest[1] if latest else None
+
+
+def compact_session(directory, session_id):
+    """Folds the journal into the snapshot (write-then-rename) and empties the journal; returns the last seq."""
+    meta = {}
+    messages = []
+    last_seq = _read_snapshot(directory, session_id).get('last_seq', 0)
+    journal = journal_path(directory, session_id)
+    if os.path.exists(journal):
+        with open(journal, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    last_seq = max(last_seq, json.loads(line).get('seq', 0))
+                except json.JSONDecodeError:
+                    continue
+    for kind, record in iter_session(directory, session_id):
+        if kind == 'meta':
+            meta.update(record)
+        else:
+            messages.append(record)
+    if not meta and not messages:
+        return last_seq
+    tmp_path = snapshot_path(directory, session_id) + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'meta': meta, 'messages': messages, 'last_seq': last_seq}, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, snapshot_path(directory, session_id))
+    # A crash before this truncation is harmless: records up to last_seq are skipped on load.
+    open(journal, 'w').close()
+    return last_seq
+
+
+class SessionJournal:
+    """Append-only journal of the current chat session, written by a background thread.
+
+    Every completed message is appended as one JSON line as soon as it is known.
+    Lines are fsynced in batches (every FSYNC_EVERY_RECORDS records or
+    FSYNC_INTERVAL_SECONDS), and once SNAPSHOT_EVERY_RECORDS have accumulated the
+    writer folds the journal into a snapshot file so loading stays fast.
+    """
+
+    def __init__(self, directory=SESSIONS_DIR):
+        self.directory = directory
+        self.session_id = new_session_id()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._file = None
+        self._seq = 0
+        self._since_snapshot = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._meta = {}
+
+    # --- Called from any thread ---
+
+    def append_message(self, message, **details):
+        self._put(('record', dict(message, type='message', time=time.time(), **details)))
+
+    def abandon_message(self, message):
+        """Marks the last journaled copy of message as never answered, so replaying the session leaves it out."""
+        self._put(('record', {'type': 'abandoned', 'role': message['role'], 'content': message['content'],
+                              'time': time.time()}))
+
+    def set_meta(self, **meta):
+        """Records session settings (system prompt, model, ...) when they differ from the last recorded ones."""
+        changed = {k: v for k, v in meta.items() if self._meta.get(k) != v}
+        if changed:
+            self._meta.update(changed)
+            self._put(('record', dict(changed, type='meta')))
+
+    def start_new(self, messages=(), meta=None):
+        """Switches to a fresh session, optionally seeded with messages (for example a loaded chat)."""
+        self.session_id = new_session_id()
+        self._meta = dict(meta or {})
+        self._put(('switch', self.directory, self.session_id, list(messages), dict(self._meta)))
+
+    def resume(self, session_id, meta=None, directory=None):
+        """Continues appending to an existing session, compacting what it already holds first."""
+        self.session_id = session_id
+        self._meta = dict(meta or {})
+        self._put(('resume', directory or self.directory, session_id))
+
+    def close(self, timeout=5.0):
+        if self._thread is not None:
+            self._queue.put(('close',))
+            self._thread.join(timeout)
+
+    def _put(self, item):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._queue.put(item)
+
+    # --- Writer thread ---
+
+    def _run(self):
+        directory, session_id = self.directory, self.session_id
+        while True:
+            try:
+                item = self._queue.get(timeout=FSYNC_INTERVAL_SECONDS)
+            except queue.Empty:
+                self._sync()
+                continue
+            try:
+                if item[0] == 'record':
+                    self._write(directory, session_id, item[1])
+                elif item[0] in ('switch', 'resume'):
+                    self._close_file()
+                    directory, session_id = item[1], item[2]
+                    self._seq = compact_session(directory, session_id) if item[0] == 'resume' else 0
+                    self._since_snapshot = 0
+                    if item[0] == 'switch':
+                        if item[4]:
+                            self._write(directory, session_id, dict(item[4], type='meta'))
+                        for message in item[3]:
+                            self._write(directory, session_id, dict(message, type='message'))
+                elif item[0] == 'close':
+                    self._close_file()
+                    return
+            except OSError as e:
+                print(f"Warning: Could not write session journal: {e}")
+
+    def _write(self, directory, session_id, record):
+        if self._file is None:
+            os.makedirs(directory, exist_ok=True)
+            self._file = open(journal_path(directory, session_id), 'a', encoding='utf-8')
+        self._seq += 1
+        record['seq'] = self._seq
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._unsynced += 1
+        self._since_snapshot += 1
+        if self._unsynced >= FSYNC_EVERY_RECORDS or time.monotonic() - self._last_sync >= FSYNC_INTERVAL_SECONDS:
+            self._sync()
+        if self._since_snapshot >= SNAPSHOT_EVERY_RECORDS:
+            self._close_file()
+            compact_session(directory, session_id)
+            self._since_snapshot = 0
+
+    def _sync(self):
+        if self._file is not None and self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _close_file(self):
+        if self._file is not None:
+            self._sync()
+            self._file.close()
+            self._file = None
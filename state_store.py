@@ -0,0 +1,160 @@
+import atexit
+import copy
+import json
+import os
+import threading
+import time
+
+# A document is written this long after its last change, so a burst of changes costs one write...
+STATE_FLUSH_DELAY_SECONDS = 0.5
+# ...but never later than this after its first unwritten change, even if changes keep coming.
+STATE_FLUSH_MAX_DELAY_SECONDS = 5.0
+
+
+class StateStore:
+    """The JSON files the apps keep their state in (config, prompts, model cache), written off the caller's thread.
+
+    set() and update() only change the in-memory copy of a document and mark it
+    dirty; a background writer writes it out STATE_FLUSH_DELAY_SECONDS after the
+    last change, to a temporary file that is then renamed over the real one, so
+    a crash mid-write never leaves a half-written file. A document whose JSON
+    is the same as what was last written is not written again. The counters in
+    stats() show how many changes came in and how many of them reached the disk.
+    """
+
+    def __init__(self, delay=STATE_FLUSH_DELAY_SECONDS, max_delay=STATE_FLUSH_MAX_DELAY_SECONDS):
+        self.delay = delay
+        self.max_delay = max_delay
+        self._documents = {}  # path -> last known data
+        self._pending = {}  # path -> (JSON text, first change time, last change time)
+        self._written = {}  # path -> JSON text last written
+        self._condition = threading.Condition()
+        self._closed = False
+        self._flushing = False
+        self._in_flight = 0
+        self.changes = 0
+        self.writes = 0
+        self.skipped = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._write_loop, name="state-store", daemon=True)
+        self._thread.start()
+
+    def read(self, path):
+        """The document at path: its pending copy if it has one, else read from disk; raises OSError or ValueError like json.load."""
+        with self._condition:
+            if path in self._documents:
+                return copy.deepcopy(self._documents[path])
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        with self._condition:
+            self._documents.setdefault(path, data)
+            return copy.deepcopy(self._documents[path])
+
+    def set(self, path, data):
+        """Replaces the whole document at path; it is copied, so the caller may keep changing its own."""
+        text = json.dumps(data, indent=4)
+        with self._condition:
+            self._documents[path] = copy.deepcopy(data)
+            self._mark_dirty(path, text)
+
+    def update(self, path, changes):
+        """Merges changes into the top level of an object document, keeping keys other code wrote there."""
+        with self._condition:
+            known = path in self._documents
+        if not known:
+            try:
+                self.read(path)
+            except (OSError, ValueError):
+                pass
+        with self._condition:
+            data = self._documents.get(path)
+            data = dict(data) if isinstance(data, dict) else {}
+            data.update(copy.deepcopy(changes))
+            self._documents[path] = data
+            self._mark_dirty(path, json.dumps(data, indent=4))
+
+    def _mark_dirty(self, path, text):
+        self.changes += 1
+        now = time.monotonic()
+        first_change = self._pending[path][1] if path in self._pending else now
+        self._pending[path] = (text, first_change, now)
+        self._condition.notify_all()
+
+    def _due(self, path):
+        _, first_change, last_change = self._pending[path]
+        return min(last_change + self.delay, first_change + self.max_delay)
+
+    def _write_loop(self):
+        with self._condition:
+            while True:
+                if not self._pending:
+                    self._flushing = False
+                    if self._closed:
+                        return
+                now = time.monotonic()
+                hurry = self._closed or self._flushing
+                due = [path for path in self._pending if hurry or self._due(path) <= now]
+                if not due:
+                    next_due = min((self._due(path) for path in self._pending), default=None)
+                    self._condition.wait(None if next_due is None else next_due - now)
+                    continue
+                for path in due:
+                    text = self._pending.pop(path)[0]
+                    self._in_flight += 1
+                    self._condition.release()
+                    try:
+                        self._write(path, text)
+                    finally:
+                        self._condition.acquire()
+                        self._in_flight -= 1
+                self._condition.notify_all()
+
+    def _write(self, path, text):
+        # Only the writer thread writes, so _written needs no lock of its own.
+        if self._written.get(path) == text:
+            self.skipped += 1
+            return
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.errors += 1
+            print(f"Warning: Could not save {path}: {e}")
+            return
+        self._written[path] = text
+        self.writes += 1
+
+    def flush(self, timeout=None):
+        """Asks the writer to write everything pending now and waits for it; returns False on timeout."""
+        with self._condition:
+            self._flushing = True
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda: not self._pending and not self._in_flight, timeout)
+
+    def close(self, timeout=5.0):
+        """Writes whatever is pending and stops the writer thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._condition:
+            return {'changes': self.changes, 'writes': self.writes, 'skipped': self.skipped,
+                    'errors': self.errors, 'pending': len(self._pending)}
+
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+def shared_state_store():
+    """The process-wide StateStore, created on first use and flushed when the interpreter exits."""
+    global _shared_store
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = StateStore()
+            atexit.register(_shared_store.close)
+        return _shared_store
@@ -0,0 +1,202 @@
+"""Record and replay Ollama chat streams with their original timing.
+
+A cassette is a JSONL file (gzip-compressed when the name ends in .gz) with one
+line per request: the request itself, plus every chunk the server sent with the
+delay since the previous chunk (the first delay is the time to first token).
+
+RecordingClient and ReplayClient wrap the client layer the scripts already use,
+so the GUIs and the batch runner can be driven from a cassette without code
+changes. cassette_client() picks one from the environment:
+
+    OLLAMA_CASSETTE_RECORD=session.jsonl.gz python3 ollama-hello-world-gemini.py
+    OLLAMA_CASSETTE_REPLAY=session.jsonl.gz OLLAMA_CASSETTE_SPEED=4 python3 ollama-hello-world-gemini.py
+
+    python3 stream_cassette.py session.jsonl.gz          # per-request timing summary
+"""
+import argparse
+import collections
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+
+import ollama
+
+from response_cache import cache_key
+
+_write_locks = collections.defaultdict(threading.Lock)
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def _plain(obj):
+    """JSON-ready copy of a chunk, whether it is a dict or one of the ollama client's response models."""
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump(exclude_none=True, mode='json')
+    return obj
+
+
+def read_cassette(path):
+    with _open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class RecordingClient:
+    """Passes calls through to a real client and appends each chat exchange to a cassette."""
+
+    def __init__(self, client, path):
+        self.client = client
+        self.path = path
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def chat(self, model=None, messages=None, options=None, stream=False, **kwargs):
+        request = {'model': model, 'messages': [_plain(m) for m in messages or []], 'options': options or {},
+                   'stream': stream}
+        started = time.monotonic()
+        result = self.client.chat(model=model, messages=messages, options=options, stream=stream, **kwargs)
+        if not stream:
+            self._write(request, [[round(time.monotonic() - started, 6), _plain(result)]], cancelled=False)
+            return result
+        return self._record_stream(request, result, started)
+
+    def _record_stream(self, request, stream, started):
+        chunks = []
+        previous = started
+        cancelled = True
+        try:
+            for chunk in stream:
+                now = time.monotonic()
+                chunks.append([round(now - previous, 6), _plain(chunk)])
+                previous = now
+                yield chunk
+            cancelled = False
+        finally:
+            self._write(request, chunks, cancelled)
+
+    def _write(self, request, chunks, cancelled):
+        entry = {'request': request, 'recorded_at': time.time(), 'cancelled': cancelled, 'chunks': chunks}
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + "\n"
+        with _write_locks[os.path.abspath(self.path)]:
+            with _open(self.path, 'a') as f:
+                f.write(line)
+
+
+class ReplayClient:
+    """Serves chat calls from a cassette, sleeping the recorded delays divided by speed.
+
+    Requests are matched on model, options and messages; when nothing matches
+    (the prompts differ from the recorded session) the next unused recording is
+    replayed instead, unless strict is set, in which case ollama.ResponseError
+    is raised as for an unknown model. speed=0 replays without any delay.
+    """
+
+    def __init__(self, path, speed=1.0, strict=False):
+        self.speed = speed
+        self.strict = strict
+        self.entries = read_cassette(path)
+        self._lock = threading.Lock()
+        self._by_key = collections.defaultdict(collections.deque)
+        self._unused = collections.deque(range(len(self.entries)))
+        for index, entry in enumerate(self.entries):
+            request = entry['request']
+            self._by_key[cache_key(request['model'], request['options'], request['messages'])].append(index)
+
+    def _next_entry(self, model, options, messages):
+        key = cache_key(model, options or {}, [_plain(m) for m in messages or []])
+        with self._lock:
+            matches = self._by_key.get(key)
+            if matches:
+                index = matches[0]
+                matches.rotate(-1)
+            elif not self.strict and self.entries:
+                index = self._unused[0]
+                self._unused.rotate(-1)
+            else:
+                raise ollama.ResponseError(f"no recorded response for model '{model}'", 404)
+        return self.entries[index]
+
+    def _sleep(self, delay):
+        if self.speed > 0 and delay > 0:
+            time.sleep(delay / self.speed)
+
+    def chat(self, model=None, messages=None, options=None, stream=False, **kwargs):
+        entry = self._next_entry(model, options, messages)
+        if not stream:
+            delay = sum(d for d, _ in entry['chunks'])
+            self._sleep(delay)
+            return self._as_response(entry)
+        return self._replay(entry)
+
+    def _replay(self, entry):
+        for delay, chunk in entry['chunks']:
+            self._sleep(delay)
+            yield chunk
+
+    @staticmethod
+    def _as_response(entry):
+        chunks = [c for _, c in entry['chunks']]
+        if len(chunks) == 1:
+            return chunks[0]
+        response = dict(chunks[-1]) if chunks else {'done': True}
+        content = "".join(c.get('message', {}).get('content', '') for c in chunks)
+        response['message'] = {'role': 'assistant', 'content': content}
+        return response
+
+    def list(self):
+        models = sorted({e['request']['model'] for e in self.entries})
+        return {'models': [{'model': m, 'name': m} for m in models]}
+
+    def generate(self, model=None, prompt='', **kwargs):
+        # Only warm-up and unload requests reach here; there is nothing to load during a replay.
+        return {'model': model, 'response': '', 'done': True}
+
+
+def cassette_client(client):
+    """Wraps client for recording or replaying if OLLAMA_CASSETTE_RECORD or OLLAMA_CASSETTE_REPLAY is set."""
+    replay_path = os.environ.get('OLLAMA_CASSETTE_REPLAY')
+    if replay_path:
+        return ReplayClient(replay_path, speed=float(os.environ.get('OLLAMA_CASSETTE_SPEED', '1')))
+    record_path = os.environ.get('OLLAMA_CASSETTE_RECORD')
+    if record_path:
+        return RecordingClient(client, record_path)
+    return client
+
+
+def summarize(entry):
+    delays = [d for d, _ in entry['chunks']]
+    content = "".join((c.get('message') or {}).get('content', '') for _, c in entry['chunks'])
+    return {
+        'model': entry['request']['model'],
+        'chunks': len(delays),
+        'ttft': delays[0] if delays else None,
+        'duration': sum(delays),
+        'max_gap': max(delays[1:]) if len(delays) > 1 else None,
+        'chars': len(content),
+        'cancelled': entry.get('cancelled', False),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the timing of the requests in a cassette file.")
+    parser.add_argument('cassette')
+    args = parser.parse_args(argv)
+    for index, entry in enumerate(read_cassette(args.cassette)):
+        s = summarize(entry)
+        ttft = '-' if s['ttft'] is None else f"{s['ttft']:.3f}s"
+        max_gap = '-' if s['max_gap'] is None else f"{s['max_gap'] * 1000:.0f} ms"
+        note = " (cancelled)" if s['cancelled'] else ""
+        print(f"#{index} {s['model']}: {s['chunks']} chunks, {s['chars']} chars, first token {ttft}, "
+              f"total {s['duration']:.3f}s, max gap {max_gap}{note}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,57 @@
+from chat_context import MESSAGE_OVERHEAD_TOKENS, ContextBudget, estimate_message_tokens, estimate_tokens
+
+
+def message(role, tokens):
+    """A message whose content estimates at exactly tokens tokens."""
+    return {'role': role, 'content': "x" * (tokens * 4)}
+
+
+def test_estimate_is_about_four_characters_per_token():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abc") == 1
+    assert estimate_tokens("x" * 400) == 100
+    assert estimate_message_tokens(message('user', 10)) == 10 + MESSAGE_OVERHEAD_TOKENS
+
+
+def test_everything_fits_in_a_large_budget():
+    budget = ContextBudget(default_budget=10000, reserve=0)
+    messages = [message('system', 10), message('user', 10), message('assistant', 10), message('user', 10)]
+    fitted, used, dropped = budget.fit(messages, "any")
+    assert fitted == messages
+    assert used == 4 * (10 + MESSAGE_OVERHEAD_TOKENS)
+    assert dropped == 0
+
+
+def test_oldest_turns_are_dropped_first_keeping_system_and_newest():
+    cost = 20 + MESSAGE_OVERHEAD_TOKENS
+    budget = ContextBudget(default_budget=3 * cost, reserve=0)
+    messages = [message('system', 20)] + [message('user' if n % 2 == 0 else 'assistant', 20) for n in range(5)]
+    fitted, used, dropped = budget.fit(messages, "any")
+    assert fitted == [messages[0], messages[4], messages[5]]
+    assert (used, dropped) == (3 * cost, 3)
+
+
+def test_system_and_newest_messages_are_kept_even_over_budget():
+    budget = ContextBudget(default_budget=10, reserve=0)
+    messages = [message('system', 50), message('user', 5), message('user', 50)]
+    fitted, used, dropped = budget.fit(messages, "any")
+    assert fitted == [messages[0], messages[2]]
+    assert dropped == 1
+    assert used > 10
+
+
+def test_pinned_messages_are_kept_and_count_against_the_budget():
+    cost = 10 + MESSAGE_OVERHEAD_TOKENS
+    budget = ContextBudget(default_budget=3 * cost, reserve=0)
+    messages = [message('user', 10) for _ in range(5)]
+    fitted, _, _ = budget.fit(messages, "any", pinned=[0])
+    assert fitted == [messages[0], messages[3], messages[4]]
+
+
+def test_budget_is_per_model_minus_the_reply_reserve():
+    budget = ContextBudget(budgets={"big": 8192}, default_budget=2048, reserve=512)
+    assert budget.budget_for("big") == 7680
+    assert budget.budget_for("other") == 1536
+    budget.set_context_size("other", "4096")
+    assert budget.context_size("other") == 4096
+    assert budget.fit([], "big") == ([], 0, 0)
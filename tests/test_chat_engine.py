@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+from chat_engine import ChatEngine
+
+
+class FakeClient:
+    """Never used by the work below; keeps the engine from building an ollama client."""
+
+
+def test_on_done_runs_once_however_the_request_ends():
+    engine = ChatEngine(max_concurrent=1, client=FakeClient())
+    try:
+        finished = []
+        started = threading.Event()
+
+        async def slow(client):
+            started.set()
+            await asyncio.sleep(10)
+
+        async def quick(client):
+            return "ok"
+
+        blocking = engine.submit("a", slow, on_done=lambda: finished.append("a"))
+        assert started.wait(2)
+        waiting = engine.submit("b", slow, on_done=lambda: finished.append("b"))
+        never_started = engine.submit("c", quick, on_done=lambda: finished.append("c"))
+        never_started.cancel()
+        waiting.cancel()
+        blocking.cancel()
+        for task in (blocking, waiting, never_started):
+            assert task.wait(2)
+        assert sorted(finished) == ["a", "b", "c"]
+
+        done = engine.submit("d", quick, on_done=lambda: finished.append("d"))
+        assert done.wait(2)
+        assert finished[-1] == "d"
+    finally:
+        engine.shutdown()
+
+
+def test_requests_beyond_the_limit_wait_for_a_slot():
+    engine = ChatEngine(max_concurrent=2, client=FakeClient())
+    try:
+        release = asyncio.Event()
+        running = []
+
+        async def work(client):
+            running.append(1)
+            await release.wait()
+
+        tasks = [engine.submit(str(n), work) for n in range(3)]
+        for _ in range(100):
+            if engine.active_count == 2 and engine.waiting_count == 1:
+                break
+            threading.Event().wait(0.01)
+        assert (engine.active_count, engine.waiting_count) == (2, 1)
+        for task in tasks:
+            task.cancel()
+            assert task.wait(2)
+        assert engine.active_count == 0
+    finally:
+        engine.shutdown()
@@ -0,0 +1,58 @@
+import json
+
+from chat_metrics import MetricsRecorder, prometheus_label, request_metrics
+
+FINAL_CHUNK = {'done': True, 'total_duration': 3_000_000_000, 'load_duration': 500_000_000,
+               'prompt_eval_count': 20, 'prompt_eval_duration': 200_000_000,
+               'eval_count': 100, 'eval_duration': 2_000_000_000}
+
+
+def test_request_metrics_converts_server_timings_to_seconds():
+    metrics = request_metrics("llama3.1:8b", FINAL_CHUNK, {'time_to_first_token': 0.7, 'total_time': 3.1})
+    assert metrics['total_duration'] == 3.0
+    assert metrics['eval_tokens_per_sec'] == 50.0
+    assert metrics['time_to_first_token'] == 0.7
+    assert request_metrics("m", None)['eval_tokens_per_sec'] is None
+
+
+def test_jsonl_records_are_written_off_the_calling_thread_and_flushed_on_close(tmp_path):
+    path = str(tmp_path / "metrics.jsonl")
+    recorder = MetricsRecorder(path)
+    for n in range(5):
+        recorder.record({'model': "m", 'n': n})
+    recorder.close()
+    with open(path, 'r', encoding='utf-8') as f:
+        assert [json.loads(line)['n'] for line in f] == [0, 1, 2, 3, 4]
+
+
+def test_jsonl_file_rotates_past_max_bytes(tmp_path):
+    path = str(tmp_path / "metrics.jsonl")
+    recorder = MetricsRecorder(path, max_bytes=10)
+    recorder.record({'model': "first"})
+    recorder.close()
+    recorder.record({'model': "second"})
+    recorder.close()
+    assert json.loads(open(path + ".1", encoding='utf-8').read())['model'] == "first"
+    assert json.loads(open(path, encoding='utf-8').read())['model'] == "second"
+
+
+def test_prometheus_file_holds_running_totals_per_model(tmp_path):
+    path = str(tmp_path / "metrics.prom")
+    recorder = MetricsRecorder(path, fmt='prometheus')
+    for _ in range(3):
+        recorder.record(request_metrics("llama3.1:8b", FINAL_CHUNK))
+    recorder.close()
+    text = open(path, encoding='utf-8').read()
+    assert 'ollama_chat_requests_total{model="llama3.1:8b"} 3.0' in text
+    assert 'ollama_chat_generated_tokens_total{model="llama3.1:8b"} 300.0' in text
+    assert 'ollama_chat_load_seconds_sum{model="llama3.1:8b"} 1.5' in text
+    assert not (tmp_path / "metrics.prom.tmp").exists()
+
+
+def test_label_values_are_escaped(tmp_path):
+    assert prometheus_label('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
+    path = str(tmp_path / "metrics.prom")
+    recorder = MetricsRecorder(path, fmt='prometheus')
+    recorder.record(request_metrics('evil"model', FINAL_CHUNK))
+    recorder.close()
+    assert 'ollama_chat_requests_total{model="evil\\"model"} 1.0' in open(path, encoding='utf-8').read()
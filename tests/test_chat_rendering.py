@@ -0,0 +1,69 @@
+from chat_rendering import TokenRenderBuffer
+
+
+def test_consecutive_tokens_render_as_one_insert():
+    buffer = TokenRenderBuffer()
+    for token in ["Hel", "lo", " world"]:
+        buffer.put('token', token, now=0.0)
+    assert buffer.next_frame() == [('text', "Hello world")]
+    assert not buffer.has_pending()
+    assert buffer.lag == 0
+
+
+def test_events_keep_their_place_between_text_runs():
+    buffer = TokenRenderBuffer()
+    buffer.put('start_response', "Model")
+    buffer.put('token', "a", now=0.0)
+    buffer.put('token', "b", now=0.0)
+    buffer.put('end_response', None)
+    assert buffer.next_frame() == [('start_response', "Model"), ('text', "ab"), ('end_response', None)]
+
+
+def test_frame_is_capped_by_characters():
+    buffer = TokenRenderBuffer(max_chars_per_frame=4)
+    for token in ["ab", "cd", "ef"]:
+        buffer.put('token', token, now=0.0)
+    assert buffer.next_frame() == [('text', "abcd")]
+    assert buffer.lag == 1
+    assert buffer.pending_chars == 2
+    assert buffer.next_frame() == [('text', "ef")]
+
+
+def test_frame_is_capped_by_events():
+    buffer = TokenRenderBuffer(max_events_per_frame=2)
+    for n in range(3):
+        buffer.put('add_to_history', n)
+    assert len(buffer.next_frame()) == 2
+    assert buffer.next_frame() == [('add_to_history', 2)]
+
+
+def test_rate_follows_arrival_times_not_drain_times():
+    buffer = TokenRenderBuffer()
+    # 20 tok/s, drained in bursts: only the arrival times passed as now count.
+    for n in range(100):
+        buffer.put('token', "x", now=n * 0.05)
+        if n % 5 == 4:
+            buffer.next_frame()
+    assert 19 < buffer.token_rate < 21
+
+
+def test_interval_adapts_to_the_rate():
+    buffer = TokenRenderBuffer(min_interval_ms=16, max_interval_ms=100, target_tokens_per_frame=8)
+    assert buffer.next_interval_ms(now=0.0) == 100
+    for n in range(100):
+        buffer.put('token', "x", now=n * 0.01)
+    assert buffer.next_interval_ms(now=1.0) == 16  # Tokens still waiting: render at once.
+    buffer.next_frame()
+    # 100 tok/s and 8 tokens per frame: a frame every 80 ms.
+    assert 70 <= buffer.next_interval_ms(now=1.0) <= 90
+    assert buffer.next_interval_ms(now=5.0) == 100  # The stream went quiet.
+
+
+def test_peak_lag_tracks_the_backlog():
+    buffer = TokenRenderBuffer()
+    for n in range(10):
+        buffer.put('token', "x", now=n * 0.01)
+    buffer.next_frame()
+    assert buffer.peak_lag == 10
+    buffer.reset_peak_lag()
+    assert buffer.peak_lag == 0
@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+
+import ollama
+import pytest
+
+from chat_search import ChatIndex
+from mock_ollama_server import MockOllamaServer, MockSettings
+
+MODEL = "nomic-embed-text:latest"
+
+
+class CountingClient:
+    """The mock server's embeddings, counting how many texts were embedded."""
+
+    def __init__(self, host):
+        self.client = ollama.Client(host=host)
+        self.embedded = 0
+
+    def embed(self, model, input):
+        self.embedded += len(input)
+        return self.client.embed(model=model, input=input)
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = MockOllamaServer(('127.0.0.1', 0), MockSettings(load_delay=0)).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def client(server):
+    return CountingClient(server.url)
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    chats = tmp_path / "chats"
+    chats.mkdir()
+    return str(chats), str(tmp_path / "index")
+
+
+def save_chat(chats_dir, name, *contents):
+    path = os.path.join(chats_dir, name)
+    history = [{'role': 'user' if n % 2 == 0 else 'assistant', 'content': c} for n, c in enumerate(contents)]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'conversation_history': history}, f)
+    return os.path.abspath(path)
+
+
+def test_only_new_or_edited_chats_are_embedded(dirs, client):
+    chats_dir, store_dir = dirs
+    save_chat(chats_dir, "a.json", "how do I sort a list", "use sorted()")
+    edited = save_chat(chats_dir, "b.json", "what is a tuple")
+    index = ChatIndex(chats_dir, MODEL, client, store_dir)
+    assert index.update() == 2
+    assert (index.message_count, client.embedded) == (3, 3)
+
+    assert index.update() == 0
+    os.utime(edited, (1, 1))  # Touched but unchanged: only the mtime is refreshed.
+    assert index.update() == 0
+    assert client.embedded == 3
+
+    save_chat(chats_dir, "b.json", "what is a tuple", "an immutable sequence")
+    assert index.update() == 1
+    assert (index.message_count, client.embedded) == (4, 5)
+
+
+def test_removed_chats_leave_the_index(dirs, client):
+    chats_dir, store_dir = dirs
+    save_chat(chats_dir, "a.json", "first")
+    gone = save_chat(chats_dir, "b.json", "second", "third")
+    index = ChatIndex(chats_dir, MODEL, client, store_dir)
+    index.update()
+    os.remove(gone)
+    index.update()
+    assert index.message_count == 1
+    assert gone not in index.files
+
+
+def test_a_new_index_picks_up_where_the_saved_one_left_off(dirs, client):
+    chats_dir, store_dir = dirs
+    path = save_chat(chats_dir, "a.json", "alpha beta", "gamma")
+    ChatIndex(chats_dir, MODEL, client, store_dir).update()
+    reopened = ChatIndex(chats_dir, MODEL, client, store_dir)
+    assert reopened.message_count == 2
+    assert reopened.update() == 0
+    assert client.embedded == 2
+    hits = reopened.search("alpha beta")
+    assert (hits[0]['path'], hits[0]['message_index']) == (path, 0)
+
+
+def test_indexes_over_one_store_take_turns(dirs, client):
+    chats_dir, store_dir = dirs
+    for n in range(6):
+        save_chat(chats_dir, f"{n}.json", f"message {n}")
+    first = ChatIndex(chats_dir, MODEL, client, store_dir)
+    second = ChatIndex(chats_dir, MODEL, client, store_dir)
+    results = []
+    threads = [threading.Thread(target=lambda index=index: results.append(index.update())) for index in (first, second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Whichever ran second started from the first one's saved store and had nothing left to do.
+    assert sorted(results) == [0, 6]
+    assert client.embedded == 6
+    assert ChatIndex(chats_dir, MODEL, client, store_dir).message_count == 6
+
+
+def test_an_index_built_with_another_model_starts_over(dirs, client):
+    chats_dir, store_dir = dirs
+    save_chat(chats_dir, "a.json", "hello")
+    ChatIndex(chats_dir, MODEL, client, store_dir).update()
+    assert ChatIndex(chats_dir, "other-embedder", client, store_dir).message_count == 0
@@ -0,0 +1,183 @@
+import asyncio
+import socket
+
+import pytest
+
+from endpoint_pool import COLD_START_PENALTY, EndpointPool
+from mock_ollama_server import MockOllamaServer, MockSettings
+
+MESSAGES = [{'role': 'user', 'content': "hello"}]
+
+
+def start_server(**settings):
+    settings = dict({'load_delay': 0, 'first_token_delay': 0, 'token_rate': 0, 'response_tokens': 5}, **settings)
+    return MockOllamaServer(('127.0.0.1', 0), MockSettings(**settings)).start()
+
+
+@pytest.fixture
+def server():
+    server = start_server()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def dead_host():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+def test_route_prefers_a_host_with_the_model_loaded():
+    pool = EndpointPool(["http://a", "http://b"])
+    a, b = pool.endpoints
+    b.loaded = {"llama3.1:8b"}
+    assert pool.route("llama3.1:8b") == [b, a]
+
+
+def test_route_sends_to_an_idle_host_rather_than_a_busy_one_with_the_model():
+    pool = EndpointPool(["http://a", "http://b"])
+    a, b = pool.endpoints
+    b.loaded = {"llama3.1:8b"}
+    b.outstanding = COLD_START_PENALTY + 1
+    assert pool.route("llama3.1:8b") == [a, b]
+
+
+def test_route_tries_unhealthy_hosts_and_hosts_without_the_model_last():
+    pool = EndpointPool(["http://a", "http://b", "http://c"])
+    a, b, c = pool.endpoints
+    a.healthy = False
+    b.installed = {"mistral:7b"}
+    c.installed = {"llama3.1:8b"}
+    c.outstanding = 5
+    assert pool.route("llama3.1:8b") == [c, b, a]
+
+
+def test_plan_groups_models_by_host_loaded_ones_first():
+    pool = EndpointPool(["http://a", "http://b"])
+    a, b = pool.endpoints
+    a.loaded = {"mistral:7b"}
+    b.loaded = {"llama3.1:8b"}
+    plan = pool.plan(["llama3.1:8b", "mistral:7b", "phi3:mini", "gemma:2b"])
+    assert [(endpoint, group) for endpoint, group in plan] == [
+        (a, ["mistral:7b", "phi3:mini"]),
+        (b, ["llama3.1:8b", "gemma:2b"]),
+    ]
+
+
+def test_plan_skips_hosts_known_not_to_have_the_model():
+    pool = EndpointPool(["http://a", "http://b"])
+    a, b = pool.endpoints
+    a.installed = {"mistral:7b"}
+    b.installed = {"llama3.1:8b", "mistral:7b"}
+    assert pool.plan(["llama3.1:8b"]) == [(b, ["llama3.1:8b"])]
+
+
+def test_chat_fails_over_past_an_unreachable_host(server, dead_host):
+    pool = EndpointPool([dead_host, server.url])
+    dead, live = pool.endpoints
+    response = pool.chat(model="llama3.1:8b", messages=MESSAGES)
+    assert response['message']['content']
+    assert not dead.healthy
+    assert live.served == 1
+    assert "llama3.1:8b" in live.loaded
+    assert dead.outstanding == live.outstanding == 0
+
+
+def test_streamed_chat_fails_over_before_the_first_chunk(server, dead_host):
+    pool = EndpointPool([dead_host, server.url])
+    chunks = list(pool.chat(model="llama3.1:8b", messages=MESSAGES, stream=True))
+    assert chunks[-1]['done']
+    assert [e.outstanding for e in pool.endpoints] == [0, 0]
+    assert pool.endpoints[1].served == 1
+
+
+def test_chat_fails_over_to_a_host_that_has_the_model(server):
+    other = start_server(models=["mistral:7b"])
+    try:
+        pool = EndpointPool([other.url, server.url])
+        without, with_model = pool.endpoints
+        pool.check_all()
+        without.installed.add("llama3.1:8b")  # Stale list: the host answers 404.
+        pool.chat(model="llama3.1:8b", messages=MESSAGES)
+        assert "llama3.1:8b" not in without.installed
+        assert without.healthy
+        assert with_model.served == 1
+    finally:
+        other.stop()
+
+
+def test_list_merges_models_from_every_reachable_host(server, dead_host):
+    other = start_server(models=["phi3:mini"])
+    try:
+        pool = EndpointPool([server.url, dead_host, other.url])
+        names = {m['model'] for m in pool.list()['models']}
+        assert {"llama3.1:8b", "phi3:mini"} <= names
+    finally:
+        other.stop()
+
+
+def test_async_stream_cancelled_before_the_first_chunk_releases_its_host():
+    slow = start_server(first_token_delay=2.0)
+    try:
+        pool = EndpointPool([slow.url])
+        client = pool.async_client()
+
+        async def consume():
+            async for _ in await client.chat(model="llama3.1:8b", messages=MESSAGES, stream=True):
+                pass
+
+        async def cancel_while_waiting():
+            task = asyncio.create_task(consume())
+            await asyncio.sleep(0.3)
+            assert pool.endpoints[0].outstanding == 1
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_while_waiting())
+        endpoint = pool.endpoints[0]
+        assert endpoint.outstanding == 0
+        assert endpoint.healthy
+        assert endpoint.served == 0
+    finally:
+        slow.stop()
+
+
+def test_async_stream_cancelled_mid_stream_is_not_counted_as_served():
+    slow = start_server(token_rate=5, response_tokens=50)
+    try:
+        pool = EndpointPool([slow.url])
+        client = pool.async_client()
+        first_chunk = asyncio.Event()
+
+        async def consume():
+            async for _ in await client.chat(model="llama3.1:8b", messages=MESSAGES, stream=True):
+                first_chunk.set()
+
+        async def cancel_while_streaming():
+            task = asyncio.create_task(consume())
+            await asyncio.wait_for(first_chunk.wait(), 5)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_while_streaming())
+        endpoint = pool.endpoints[0]
+        assert endpoint.outstanding == 0
+        assert endpoint.served == 0
+    finally:
+        slow.stop()
+
+
+def test_async_stream_streams_through_the_pool(server):
+    pool = EndpointPool([server.url])
+    client = pool.async_client()
+
+    async def collect():
+        return [chunk async for chunk in await client.chat(model="llama3.1:8b", messages=MESSAGES, stream=True)]
+
+    chunks = asyncio.run(collect())
+    assert chunks[-1]['done']
+    assert pool.endpoints[0].outstanding == 0
+    assert pool.endpoints[0].served == 1
@@ -0,0 +1,107 @@
+import mmap
+import threading
+
+import pytest
+
+import log_search
+from log_search import LogQuery, TokenIndex, search_log
+
+LOG_LINES = [
+    "2024-05-01 09:00:00 INFO server started on port 8080",
+    "2024-05-01 09:15:30 DEBUG cache warmed",
+    "2024-05-01 13:30:05 WARNING disk usage at 91%",
+    "2024-05-01 13:45:00 ERROR connection refused by database",
+    "2024-05-02 08:00:00 CRITICAL database unreachable, shutting down",
+    "no timestamp ERROR here",
+]
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    path = tmp_path / "app.log"
+    path.write_text("\n".join(LOG_LINES) + "\n", encoding='utf-8')
+    return str(path)
+
+
+def run_search(path, query, token_index=None):
+    found = []
+    search_log(path, query, found.extend, threading.Event(), token_index)
+    return [line for _, line in found]
+
+
+def test_level_filter_keeps_that_level_and_above():
+    query = LogQuery(min_level="WARNING")
+    accepted = [line for line in LOG_LINES if query.accepts(line.encode())]
+    assert accepted == [LOG_LINES[2], LOG_LINES[3], LOG_LINES[4], LOG_LINES[5]]
+
+
+def test_time_range_compares_timestamp_prefixes():
+    query = LogQuery(since="2024-05-01 13:30", until="2024-05-01")
+    accepted = [line for line in LOG_LINES if query.accepts(line.encode())]
+    assert accepted == [LOG_LINES[2], LOG_LINES[3]]
+    assert not LogQuery(since="2024-05-01").accepts(LOG_LINES[5].encode())
+
+
+def test_literal_tokens_only_for_plain_text_queries():
+    assert LogQuery("Connection refused").literal_tokens() == [b"connection", b"refused"]
+    assert LogQuery("at 91%").literal_tokens() == []
+    assert LogQuery(r"conn\w+", regex=True).literal_tokens() == []
+    assert LogQuery().is_empty and not LogQuery(min_level="ERROR").is_empty
+
+
+def test_search_finds_text_regex_and_filters(log_path):
+    assert run_search(log_path, LogQuery("DATABASE")) == [LOG_LINES[3], LOG_LINES[4]]
+    assert run_search(log_path, LogQuery("DATABASE", case_sensitive=True)) == []
+    assert run_search(log_path, LogQuery(r"port \d+", regex=True)) == [LOG_LINES[0]]
+    assert run_search(log_path, LogQuery(min_level="ERROR")) == [LOG_LINES[3], LOG_LINES[4], LOG_LINES[5]]
+    assert run_search(log_path, LogQuery(until="2024-05-01 09")) == [LOG_LINES[0], LOG_LINES[1]]
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    monkeypatch.setattr(log_search, 'TOKEN_INDEX_BLOCK_BYTES', 16)
+
+
+def test_token_index_narrows_to_blocks_with_every_fragment(log_path, small_blocks):
+    with open(log_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        index = TokenIndex()
+        assert index.extend(mm, len(mm), threading.Event())
+        assert len(index.blocks) == len(LOG_LINES)  # Every line is longer than a block, so each ends one.
+        assert index.candidate_blocks([b"databa"]) == [3, 4]
+        assert index.candidate_blocks([b"database", b"refused"]) == [3]
+        assert index.candidate_blocks([b"nowhere"]) == []
+        assert index.candidate_blocks([]) is None
+
+
+def test_indexed_search_matches_a_full_scan(log_path, small_blocks):
+    for query in (LogQuery("database"), LogQuery("error"), LogQuery("refused by data")):
+        assert run_search(log_path, query, TokenIndex()) == run_search(log_path, query)
+
+
+def test_index_is_saved_reloaded_and_extended_as_the_log_grows(log_path, small_blocks):
+    run_search(log_path, LogQuery("server"), TokenIndex())
+    with open(log_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        index = TokenIndex.load(log_path, mm)
+        size = len(mm)
+    assert index is not None and index.size == size
+
+    with open(log_path, 'a', encoding='utf-8') as f:
+        f.write("2024-05-03 10:00:00 INFO database restored\n")
+    assert run_search(log_path, LogQuery("restored"), index) == ["2024-05-03 10:00:00 INFO database restored"]
+    assert index.candidate_blocks([b"restored"]) == [len(index.blocks) - 1]
+
+
+def test_index_of_a_replaced_log_is_not_loaded(log_path, small_blocks):
+    run_search(log_path, LogQuery("server"), TokenIndex())
+    with open(log_path, 'w', encoding='utf-8') as f:
+        f.write("2024-06-01 00:00:00 INFO a different log, rotated in place\n" * 3)
+    with open(log_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        assert TokenIndex.load(log_path, mm) is None
+
+
+def test_cancelled_search_reports_nothing(log_path):
+    cancelled = threading.Event()
+    cancelled.set()
+    found = []
+    search_log(log_path, LogQuery("database"), found.extend, cancelled)
+    assert found == []
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from model_registry import (FREQUENT_USE_COUNT, KEEP_ALIVE_DEFAULT, KEEP_ALIVE_FREQUENT, USAGE_HALF_LIFE_SECONDS,
+                            ModelWarmer, keep_alive_seconds)
+
+DAY = 24 * 3600
+
+
+class RecordingClient:
+    def __init__(self):
+        self.calls = []
+        self.called = threading.Event()
+
+    def generate(self, **kwargs):
+        self.calls.append(kwargs)
+        self.called.set()
+        return {}
+
+
+@pytest.mark.parametrize("keep_alive, seconds", [
+    (None, 300.0), ("5m", 300.0), ("1h", 3600.0), ("30s", 30.0), (45, 45.0), ("90", 90.0), (-1, float('inf')),
+])
+def test_keep_alive_seconds(keep_alive, seconds):
+    assert keep_alive_seconds(keep_alive) == seconds
+
+
+def test_a_model_becomes_frequent_after_enough_recent_uses():
+    warmer = ModelWarmer(client=RecordingClient())
+    for n in range(FREQUENT_USE_COUNT):
+        assert not warmer.is_frequent("llama3.1:8b", now=DAY)
+        warmer.record_request("llama3.1:8b", 0.1, 0.0, now=DAY)
+    assert warmer.is_frequent("llama3.1:8b", now=DAY)
+    assert not warmer.is_frequent("llama3.1:8b", now=DAY + USAGE_HALF_LIFE_SECONDS)
+
+
+def test_frequent_models_are_kept_loaded_longer():
+    warmer = ModelWarmer(client=RecordingClient())
+    assert warmer.keep_alive_for("llama3.1:8b") == KEEP_ALIVE_DEFAULT
+    warmer.load_usage({"llama3.1:8b": FREQUENT_USE_COUNT + 1})
+    assert warmer.keep_alive_for("llama3.1:8b") == KEEP_ALIVE_FREQUENT
+
+
+def test_usage_decays_even_for_a_model_used_every_hour():
+    warmer = ModelWarmer(client=RecordingClient())
+    uses = 7 * 24 * 60 // 59
+    for n in range(uses):
+        warmer.record_request("llama3.1:8b", 0.1, 0.0, now=n * 59 * 60)
+    assert warmer.usage_score("llama3.1:8b", now=uses * 59 * 60) < 0.75 * uses
+
+
+def test_usage_decays_so_old_favourites_stop_being_frequent():
+    warmer = ModelWarmer(client=RecordingClient())
+    for n in range(FREQUENT_USE_COUNT * 2):
+        warmer.record_request("llama3.1:8b", 0.1, 0.0, now=0.0)
+    assert warmer.usage_score("llama3.1:8b", now=USAGE_HALF_LIFE_SECONDS) == pytest.approx(FREQUENT_USE_COUNT)
+    assert not warmer.is_frequent("llama3.1:8b", now=2 * USAGE_HALF_LIFE_SECONDS)
+
+
+def test_counts_from_older_configs_start_decaying_on_load():
+    warmer = ModelWarmer(client=RecordingClient())
+    warmer.load_usage({"llama3.1:8b": 8, "mistral:7b": {'score': 2.0, 'at': 0.0}}, now=10 * DAY)
+    assert warmer.usage_score("llama3.1:8b", now=10 * DAY) == 8
+    assert warmer.usage_score("mistral:7b", now=10 * DAY) < 2.0
+    assert warmer.usage_score("phi3:mini") == 0.0
+
+
+def test_select_unloads_the_previous_model_only_when_it_is_not_used_often():
+    client = RecordingClient()
+    warmer = ModelWarmer(client=client)
+    warmer.state = lambda model: 'warm'  # Nothing to preload; only unloading is under test.
+    warmer.load_usage({"frequent": {'score': 50.0, 'at': time.time()}})
+    warmer.select("other", previous="frequent")
+    assert not client.called.wait(0.2)
+    warmer.select("frequent", previous="other")
+    assert client.called.wait(2)
+    assert client.calls == [{'model': "other", 'prompt': "", 'keep_alive': 0}]
+
+
+def test_record_request_tells_cold_from_warm_starts():
+    warmer = ModelWarmer(client=RecordingClient())
+    assert warmer.record_request("m", 2.0, 1.5) == 'cold'
+    assert warmer.record_request("m", 0.2, 0.0) == 'warm'
+    assert warmer.first_token_averages("m") == {'cold': 2.0, 'warm': 0.2}
+    assert warmer.keep_alive_for("m") == KEEP_ALIVE_DEFAULT
@@ -0,0 +1,48 @@
+from prompt_queue import PRIORITY_HIGH, PRIORITY_NORMAL, PromptQueue
+
+
+def test_prompts_come_out_in_the_order_they_were_queued():
+    prompts = PromptQueue()
+    for text in ["first", "second", "third"]:
+        prompts.push(text)
+    assert [prompts.pop()['text'] for _ in range(3)] == ["first", "second", "third"]
+    assert prompts.pop() is None
+
+
+def test_high_priority_prompts_jump_the_queue_but_keep_their_own_order():
+    prompts = PromptQueue()
+    prompts.push("normal 1")
+    prompts.push("urgent 1", PRIORITY_HIGH)
+    prompts.push("normal 2")
+    prompts.push("urgent 2", PRIORITY_HIGH)
+    assert [prompts.pop()['text'] for _ in range(4)] == ["urgent 1", "urgent 2", "normal 1", "normal 2"]
+
+
+def test_a_prompt_already_waiting_is_not_queued_twice():
+    prompts = PromptQueue()
+    assert prompts.push("explain   this\ncode")
+    assert not prompts.push("explain this code")
+    assert len(prompts) == 1
+    assert prompts.pop()['text'] == "explain   this\ncode"
+
+
+def test_a_repeated_prompt_can_raise_but_never_lower_the_priority():
+    prompts = PromptQueue()
+    prompts.push("a")
+    prompts.push("b")
+    prompts.push("b", PRIORITY_HIGH)
+    prompts.push("b", PRIORITY_NORMAL)
+    entry = prompts.pop()
+    assert (entry['text'], entry['priority']) == ("b", PRIORITY_HIGH)
+
+
+def test_status_reports_depth_and_oldest_wait():
+    prompts = PromptQueue()
+    assert prompts.status_text() == ""
+    assert prompts.oldest_wait() is None
+    prompts.push("a", now=100.0)
+    prompts.push("b", now=105.0)
+    assert prompts.oldest_wait(now=112.0) == 12.0
+    assert prompts.status_text(now=112.0) == "2 queued, oldest waiting 12s"
+    prompts.clear()
+    assert len(prompts) == 0
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from prompt_store import (DEFAULT_CHAT_PROMPTS, DEFAULT_SYSTEM_PROMPTS, PROMPTS_FILE, SYSTEM_PROMPTS_FILE,
+                          load_prompt_store, resolve_system_prompt)
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def write(path, prompts):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(prompts, f)
+
+
+def test_missing_files_fall_back_to_the_gui_defaults():
+    prompts = load_prompt_store()
+    assert prompts == dict(DEFAULT_CHAT_PROMPTS, **DEFAULT_SYSTEM_PROMPTS)
+    assert resolve_system_prompt({'system_prompt_name': "Default"}, prompts) == DEFAULT_SYSTEM_PROMPTS["Default"]
+
+
+def test_a_saved_file_replaces_its_defaults():
+    write(SYSTEM_PROMPTS_FILE, {"Terse": "Answer in one line."})
+    prompts = load_prompt_store()
+    assert "Default" not in prompts
+    assert prompts["Terse"] == "Answer in one line."
+    assert prompts["Helpful assistant"] == DEFAULT_CHAT_PROMPTS["Helpful assistant"]
+
+
+def test_earlier_files_win_on_duplicate_names():
+    write(SYSTEM_PROMPTS_FILE, {"Shared": "system"})
+    write(PROMPTS_FILE, {"Shared": "chat"})
+    assert load_prompt_store()["Shared"] == "system"
+
+
+def test_unreadable_file_uses_the_defaults(capsys):
+    with open(SYSTEM_PROMPTS_FILE, 'w', encoding='utf-8') as f:
+        f.write("{not json")
+    assert load_prompt_store()["Default"] == DEFAULT_SYSTEM_PROMPTS["Default"]
+    assert "Could not read prompts" in capsys.readouterr().out
+
+
+def test_explicit_system_prompt_wins_and_unknown_names_raise():
+    assert resolve_system_prompt({'system_prompt': "Be brief.", 'system_prompt_name': "Default"}, {}) == "Be brief."
+    assert resolve_system_prompt({}, {}) == ""
+    with pytest.raises(KeyError):
+        resolve_system_prompt({'system_prompt_name': "Missing"}, {})
@@ -0,0 +1,70 @@
+import asyncio
+import os
+
+from response_cache import ResponseCache, cache_key, replay_chunks, replay_stream
+
+MESSAGES = [{'role': 'system', 'content': "Be brief."}, {'role': 'user', 'content': "What is zip()?"}]
+
+
+def test_key_ignores_surrounding_whitespace_but_not_content_or_options():
+    key = cache_key("llama3.1:8b", {'temperature': 0}, MESSAGES)
+    padded = [dict(m, content=f"  {m['content']}\n") for m in MESSAGES]
+    assert cache_key("llama3.1:8b", {'temperature': 0}, padded) == key
+    assert cache_key("mistral:7b", {'temperature': 0}, MESSAGES) != key
+    assert cache_key("llama3.1:8b", {'temperature': 0.1}, MESSAGES) != key
+    assert cache_key("llama3.1:8b", {'temperature': 0}, MESSAGES[1:]) != key
+
+
+def test_cache_is_opt_in_by_temperature():
+    assert not ResponseCache(max_temperature=None).enabled_for({'temperature': 0})
+    cache = ResponseCache(max_temperature=0.2)
+    assert cache.enabled_for({'temperature': 0.2})
+    assert not cache.enabled_for({'temperature': 0.7})
+    assert not cache.enabled_for({})  # Ollama's default temperature is 0.8.
+
+
+def test_replies_survive_a_restart_through_the_disk_tier(tmp_path):
+    directory = str(tmp_path)
+    ResponseCache(directory).put("k", "zip pairs items up.", model="llama3.1:8b")
+    fresh = ResponseCache(directory)
+    assert fresh.get("k") == {'content': "zip pairs items up.", 'model': "llama3.1:8b"}
+    assert fresh.get("missing") is None
+    assert (fresh.hits, fresh.misses) == (1, 1)
+
+
+def test_memory_tier_is_a_bounded_lru(tmp_path):
+    cache = ResponseCache(str(tmp_path), memory_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")
+    cache.put("c", "3")
+    assert list(cache._memory) == ["a", "c"]
+
+
+def test_disk_tier_evicts_least_recently_used_files(tmp_path):
+    directory = str(tmp_path)
+    cache = ResponseCache(directory, max_disk_bytes=250)
+    for n, key in enumerate(["old", "used", "new"]):
+        cache.put(key, "x" * 100)
+        os.utime(os.path.join(directory, f"{key}.json"), (n, n))
+    os.utime(os.path.join(directory, "used.json"))  # As a read from disk does.
+    cache.put("newest", "x" * 100)
+    assert sorted(os.listdir(directory)) == ["newest.json", "used.json"]
+
+
+def test_clear_empties_both_tiers(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put("k", "v")
+    cache.clear()
+    assert cache.get("k") is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_replay_rebuilds_the_reply_chunk_by_chunk():
+    text = "Hello,  world!\nSecond line."
+    assert "".join(replay_chunks(text)) == text
+
+    async def collect():
+        return [chunk['message']['content'] async for chunk in replay_stream(text)]
+
+    assert "".join(asyncio.run(collect())) == text
@@ -0,0 +1,86 @@
+import os
+
+from session_journal import SessionJournal, compact_session, iter_session, journal_path, latest_session_id
+
+
+def messages_of(directory, session_id):
+    return [(m['role'], m['content']) for kind, m in iter_session(directory, session_id) if kind == 'message']
+
+
+def test_journaled_messages_read_back_in_order(tmp_path):
+    directory = str(tmp_path)
+    journal = SessionJournal(directory)
+    journal.set_meta(model="llama3.1:8b")
+    journal.append_message({'role': 'user', 'content': "hi"})
+    journal.append_message({'role': 'assistant', 'content': "hello"})
+    journal.close()
+    assert messages_of(directory, journal.session_id) == [('user', "hi"), ('assistant', "hello")]
+    assert ('meta', {'model': "llama3.1:8b"}) in list(iter_session(directory, journal.session_id))
+
+
+def test_a_line_cut_short_by_a_crash_is_skipped(tmp_path):
+    directory = str(tmp_path)
+    journal = SessionJournal(directory)
+    journal.append_message({'role': 'user', 'content': "kept"})
+    journal.close()
+    with open(journal_path(directory, journal.session_id), 'a', encoding='utf-8') as f:
+        f.write('{"type": "message", "role": "assistant", "cont')
+    assert messages_of(directory, journal.session_id) == [('user', "kept")]
+
+
+def test_compaction_keeps_every_message_once(tmp_path):
+    directory = str(tmp_path)
+    journal = SessionJournal(directory)
+    for n in range(3):
+        journal.append_message({'role': 'user', 'content': str(n)})
+    journal.close()
+    compact_session(directory, journal.session_id)
+    assert os.path.getsize(journal_path(directory, journal.session_id)) == 0
+    resumed = SessionJournal(directory)
+    resumed.resume(journal.session_id)
+    resumed.append_message({'role': 'user', 'content': "3"})
+    resumed.close()
+    assert [c for _, c in messages_of(directory, journal.session_id)] == ["0", "1", "2", "3"]
+
+
+def test_latest_session_is_the_most_recently_written(tmp_path):
+    directory = str(tmp_path)
+    assert latest_session_id(directory) is None
+    assert latest_session_id(str(tmp_path / "missing")) is None
+    ids = []
+    for n in range(2):
+        journal = SessionJournal(directory)
+        journal.append_message({'role': 'user', 'content': str(n)})
+        journal.close()
+        os.utime(journal_path(directory, journal.session_id), (1000 - n * 500, 1000 - n * 500))
+        ids.append(journal.session_id)
+    assert latest_session_id(directory) == ids[0]
+
+
+def test_an_abandoned_prompt_is_left_out_of_a_recovered_session(tmp_path):
+    directory = str(tmp_path)
+    journal = SessionJournal(directory)
+    journal.append_message({'role': 'user', 'content': "hi"})
+    journal.append_message({'role': 'assistant', 'content': "hello"})
+    journal.append_message({'role': 'user', 'content': "hi"})  # Failed, or stopped before the first token.
+    journal.abandon_message({'role': 'user', 'content': "hi"})
+    journal.append_message({'role': 'user', 'content': "again"})
+    journal.append_message({'role': 'assistant', 'content': "answer"})
+    journal.close()
+    expected = [('user', "hi"), ('assistant', "hello"), ('user', "again"), ('assistant', "answer")]
+    assert messages_of(directory, journal.session_id) == expected
+    compact_session(directory, journal.session_id)
+    assert messages_of(directory, journal.session_id) == expected
+
+
+def test_an_abandon_after_compaction_still_removes_the_prompt(tmp_path):
+    directory = str(tmp_path)
+    journal = SessionJournal(directory)
+    journal.append_message({'role': 'user', 'content': "lost"})
+    journal.close()
+    compact_session(directory, journal.session_id)
+    resumed = SessionJournal(directory)
+    resumed.resume(journal.session_id)
+    resumed.abandon_message({'role': 'user', 'content': "lost"})
+    resumed.close()
+    assert messages_of(directory, journal.session_id) == []
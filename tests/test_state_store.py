@@ -0,0 +1,103 @@
+import json
+import os
+import time
+
+import pytest
+
+from state_store import StateStore
+
+
+@pytest.fixture
+def store():
+    store = StateStore(delay=0.05, max_delay=0.3)
+    yield store
+    store.close()
+
+
+def read(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_a_burst_of_changes_costs_one_write(tmp_path):
+    store = StateStore(delay=0.2, max_delay=2.0)
+    path = str(tmp_path / "config.json")
+    for position in range(200):
+        store.set(path, {'sash_position': position})
+    assert store.stats()['writes'] == 0
+    wait_until(lambda: store.stats()['writes'] == 1)
+    store.close()
+    assert store.stats() == {'changes': 200, 'writes': 1, 'skipped': 0, 'errors': 0, 'pending': 0}
+    assert read(path) == {'sash_position': 199}
+
+
+def test_a_steady_stream_of_changes_is_still_written_by_max_delay(tmp_path, store):
+    path = str(tmp_path / "config.json")
+    started = time.monotonic()
+    while store.stats()['writes'] == 0:
+        assert time.monotonic() - started < 1.0, "never written"
+        store.set(path, {'at': time.monotonic()})
+        time.sleep(0.01)
+
+
+def test_unchanged_documents_are_not_rewritten(tmp_path, store):
+    path = str(tmp_path / "prompts.json")
+    store.set(path, {'Default': "Be helpful."})
+    assert store.flush(2)
+    store.set(path, {'Default': "Be helpful."})
+    assert store.flush(2)
+    assert (store.writes, store.skipped) == (1, 1)
+
+
+def test_the_caller_may_keep_changing_its_own_copy(tmp_path, store):
+    path = str(tmp_path / "config.json")
+    config = {'follow_log': False}
+    store.set(path, config)
+    config['follow_log'] = True
+    assert store.read(path) == {'follow_log': False}
+    store.flush(2)
+    assert read(path) == {'follow_log': False}
+
+
+def test_update_keeps_keys_written_by_others(tmp_path, store):
+    path = str(tmp_path / "config.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'sash_position': 300, 'follow_log': False}, f)
+    store.update(path, {'follow_log': True})
+    store.flush(2)
+    assert read(path) == {'sash_position': 300, 'follow_log': True}
+
+
+def test_writes_replace_the_file_and_leave_no_temporary_behind(tmp_path, store):
+    path = str(tmp_path / "models_cache.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("old")
+    store.set(path, {'models': ["llama3.1:8b"]})
+    store.flush(2)
+    assert read(path) == {'models': ["llama3.1:8b"]}
+    assert os.listdir(tmp_path) == ["models_cache.json"]
+
+
+def test_failed_writes_are_counted_and_do_not_stop_the_writer(tmp_path, store, capsys):
+    store.set(str(tmp_path / "missing" / "config.json"), {})
+    good = str(tmp_path / "config.json")
+    store.set(good, {'ok': True})
+    assert store.flush(2)
+    assert (store.errors, store.writes) == (1, 1)
+    assert read(good) == {'ok': True}
+    assert "Could not save" in capsys.readouterr().out
+
+
+def test_close_writes_whatever_is_pending(tmp_path):
+    store = StateStore(delay=60, max_delay=60)
+    path = str(tmp_path / "config.json")
+    store.set(path, {'saved': True})
+    store.close()
+    assert read(path) == {'saved': True}
@@ -0,0 +1,69 @@
+import ollama
+import pytest
+
+from mock_ollama_server import MockOllamaServer, MockSettings
+from stream_cassette import RecordingClient, ReplayClient, cassette_client, read_cassette, summarize
+
+MESSAGES = [{'role': 'user', 'content': "hello"}]
+
+
+@pytest.fixture
+def server():
+    settings = MockSettings(load_delay=0, first_token_delay=0, token_rate=0, response_tokens=8)
+    server = MockOllamaServer(('127.0.0.1', 0), settings).start()
+    yield server
+    server.stop()
+
+
+def record(server, path, messages=MESSAGES):
+    client = RecordingClient(ollama.Client(host=server.url), path)
+    model = server.settings.models[0]
+    return model, "".join(chunk['message']['content'] for chunk in
+                          client.chat(model=model, messages=messages, stream=True))
+
+
+@pytest.mark.parametrize('name', ["session.jsonl", "session.jsonl.gz"])
+def test_a_recorded_stream_replays_the_same_chunks(server, tmp_path, name):
+    path = str(tmp_path / name)
+    model, text = record(server, path)
+    entry, = read_cassette(path)
+    assert entry['request']['model'] == model
+    assert not entry['cancelled']
+    assert entry['chunks'][-1][1]['done']
+
+    replay = ReplayClient(path, speed=0)
+    assert "".join(c['message']['content'] for c in replay.chat(model=model, messages=MESSAGES, stream=True)) == text
+    assert replay.chat(model=model, messages=MESSAGES)['message']['content'] == text
+    assert summarize(entry)['chars'] == len(text)
+
+
+def test_a_stream_closed_early_is_recorded_as_cancelled(server, tmp_path):
+    path = str(tmp_path / "session.jsonl")
+    client = RecordingClient(ollama.Client(host=server.url), path)
+    stream = client.chat(model=server.settings.models[0], messages=MESSAGES, stream=True)
+    next(stream)
+    stream.close()
+    entry, = read_cassette(path)
+    assert entry['cancelled']
+    assert len(entry['chunks']) == 1
+
+
+def test_replay_matches_requests_and_falls_back_unless_strict(server, tmp_path):
+    path = str(tmp_path / "session.jsonl")
+    model, first = record(server, path, [{'role': 'user', 'content': "first"}])
+    _, second = record(server, path, [{'role': 'user', 'content': "second"}])
+
+    replay = ReplayClient(path, speed=0)
+    assert replay.chat(model=model, messages=[{'role': 'user', 'content': "second"}])['message']['content'] == second
+    assert replay.chat(model=model, messages=[{'role': 'user', 'content': "other"}])['message']['content'] == first
+    with pytest.raises(ollama.ResponseError):
+        ReplayClient(path, speed=0, strict=True).chat(model=model, messages=[{'role': 'user', 'content': "other"}])
+
+
+def test_cassette_client_follows_the_environment(tmp_path, monkeypatch):
+    client = object()
+    monkeypatch.delenv('OLLAMA_CASSETTE_REPLAY', raising=False)
+    monkeypatch.delenv('OLLAMA_CASSETTE_RECORD', raising=False)
+    assert cassette_client(client) is client
+    monkeypatch.setenv('OLLAMA_CASSETTE_RECORD', str(tmp_path / "session.jsonl"))
+    assert isinstance(cassette_client(client), RecordingClient)